@@ -0,0 +1,137 @@
+import time
+import threading
+from ramp_scheduler import output_channel
+
+
+def format_abort(report):
+    # One log line per trip, then one per failure
+    lines = [f"🛑 Abort: {report['reason']}; outputs off in {report['time_to_safe_ms']:.1f} ms "
+             f"(worst {report['worst_ms']:.1f} ms)"]
+    lines.extend(f"   ⚠️ {failure}" for failure in report['failures'])
+    return "\n".join(lines)
+
+
+class AbortManager:
+    # Hardware limits plus a software trip: programs OVP/OCP into the supplies, watches telemetry
+    # against the same thresholds, and on a trip fires a prebuilt shutdown burst
+    # (RF OFF, then drains off, then gates off) that preempts every in-flight step.
+    #
+    # targets() returns {'siggen': resource or None, 'drains': [(psu, output)], 'gates': [(psu, output)]}
+    def __init__(self, targets):
+        self.targets = targets
+        self.limits = {}  # (psu name, channel) -> {'ovp': volts, 'ocp': amps}
+        self.burst = None  # [(driver or None, instrument, message)]
+        self.listeners = []  # called after a trip; used to stop schedulers and sequencers
+        self.reporters = []  # callables(report) told the outcome of a trip: the GUI log, the batch log
+        self.failures = []  # what went wrong during the last trip: failed safe-state writes, listeners
+        self.tripped = threading.Event()
+        self.reason = None
+        self.last_ms = None
+        self.worst_ms = 0.0
+        self._trip_lock = threading.Lock()
+
+    def arm(self):
+        # Prebuild one message per instrument so the trip path does no lookups or formatting
+        targets = self.targets()
+        burst = []
+        siggen = targets.get('siggen')
+        if siggen is not None:
+            burst.append((None, siggen, "OUTP OFF"))
+        for role in ('drains', 'gates'):
+            by_psu = {}
+            for psu, output in targets.get(role, []):
+                if psu.driver is not None:
+                    by_psu.setdefault(psu.name, (psu, []))[1].append(output_channel(output))
+            for psu, channels in by_psu.values():
+                burst.append((psu.driver, psu.instrument, psu.driver.output_off_message(sorted(set(channels)))))
+        self.burst = burst
+        return burst
+
+    def program_limits(self, limits):
+        # limits: {(psu, output): {'ovp': volts, 'ocp': amps}}; returns the ones the hardware refused
+        unsupported = []
+        for (psu, output), limit in limits.items():
+            ch = output_channel(output)
+            self.limits[(psu.name, ch)] = limit
+            for kind, setter in (('ovp', psu.driver.set_ovp), ('ocp', psu.driver.set_ocp)):
+                if limit.get(kind) is None:
+                    continue
+                try:
+                    setter(ch, limit[kind])
+                except Exception as e:
+                    # Still covered by the telemetry watch
+                    unsupported.append((psu.name, ch, kind, str(e)))
+        return unsupported
+
+    def check(self, name, row):
+        # Telemetry listener: row is (time, ch1 V, ch1 I, ch2 V, ch2 I)
+        if self.tripped.is_set():
+            return
+        for ch in (1, 2):
+            limit = self.limits.get((name, ch))
+            if not limit:
+                continue
+            volts, amps = row[2 * ch - 1], row[2 * ch]
+            if limit.get('ovp') is not None and abs(volts) > limit['ovp']:
+                self.trigger(f"{name} CH{ch} over-voltage: {volts:.3f} V > {limit['ovp']} V")
+                return
+            if limit.get('ocp') is not None and abs(amps) > limit['ocp']:
+                self.trigger(f"{name} CH{ch} over-current: {amps:.4f} A > {limit['ocp']} A")
+                return
+
+    def trigger(self, reason="Manual abort"):
+        # Returns time-to-safe in milliseconds
+        with self._trip_lock:
+            if self.tripped.is_set():
+                return self.last_ms
+            start = time.perf_counter()
+            self.tripped.set()
+            self.reason = reason
+            self.failures = []
+            burst = self.burst if self.burst is not None else self.arm()
+
+            # Inhibit first so no in-flight ramp step can re-enable an output after the burst
+            for driver, _, _ in burst:
+                if driver is not None:
+                    driver.inhibited = True
+            for driver, instrument, message in burst:
+                try:
+                    if driver is not None:
+                        # Goes ahead of any queued writers; waits for at most the one transaction on the wire
+                        with driver.lock.urgent():
+                            instrument.write(message)
+                            driver.cache.selected = None
+                    else:
+                        instrument.write(message)
+                except Exception as e:
+                    name = getattr(instrument, "resource_name", None) or "instrument"
+                    self.failures.append(f"{name}: {message!r} failed: {e}")
+
+            self.last_ms = (time.perf_counter() - start) * 1000
+            self.worst_ms = max(self.worst_ms, self.last_ms)
+
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                self.failures.append(f"listener {getattr(listener, '__name__', listener)!r} failed: {e}")
+        report = self.report()
+        for reporter in self.reporters:
+            try:
+                reporter(report)
+            except Exception:
+                pass  # a broken display must not hide the trip from the others
+        return self.last_ms
+
+    def report(self):
+        return {"reason": self.reason, "time_to_safe_ms": self.last_ms, "worst_ms": self.worst_ms,
+                "failures": list(self.failures)}
+
+    def clear(self):
+        # Re-enables writes; outputs stay off until something turns them back on
+        burst = self.burst or []
+        for driver, _, _ in burst:
+            if driver is not None:
+                driver.inhibited = False
+        self.tripped.clear()
+        self.reason = None
@@ -9,12 +9,17 @@ from power_supply import PowerSupply
 from power_supply_tab import CombinedPowerSupplyTab
 from device_man_tab import DeviceManagerTab
 from test_seq_tab import TestSequencerTab
+from visa_pool import get_pool
+from abort import AbortManager
+from scpi_trace_tab import ScpiTraceTab
+from discovery import DEFAULT_BENCH, Discovery, bench_config
 
 class App:
 # Function: __init__
     def __init__(self, root):
         self.root = root
         self.root.title("Workbench Automation GUI")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(expand=True, fill="both")
         self.output_settings = {}  # Store voltage and current settings per output
@@ -31,24 +36,29 @@ class App:
         
         ]
 
-        self.power_supplies = [
-            PowerSupply("PS1", "GPIB0::10::INSTR"),
-            PowerSupply("PS2", "GPIB0::11::INSTR"),
-            PowerSupply("PS3", "GPIB0::15::INSTR"),
-            PowerSupply("PS4", "USB0::0x2A8D::0x3402::MY61002290::INSTR"),
-        ]
-        
-            
-    
-    
-        self.devices = {
-            "PSU1": {"address": "GPIB0::10::INSTR", "instance": None, "user":"PS1"},
-            "PSU2": {"address": "GPIB0::11::INSTR", "instance": None, "user":"PS2"},
-            "PSU3": {"address": "GPIB0::15::INSTR", "instance": None, "user":"PS3"},
-            "PSU4": {"address": "USB0::0x2A8D::0x3402::MY61002290::INSTR", "instance": None, "user":"PS4"},
-            "Signal Generator": {"address": "GPIB0::28::INSTR", "instance": None, "user":"Signal Generator"},
-            "Spectrum Analyzer": {"address": "GPIB0::18::INSTR", "instance": None, "user":"Spectrum Analyzer"},
-        }
+        # Addresses come from discovery (cached between launches); DEFAULT_BENCH fills any gap
+        self.discovery = Discovery()
+        try:
+            discovered = self.discovery.discover()
+            print(f"🔍 {len(discovered)} instruments from {self.discovery.source} in {self.discovery.elapsed:.2f} s")
+        except Exception as e:
+            print(f"⚠️ Instrument discovery failed: {e}")
+            discovered = []
+        # Default instruments nobody answered for keep their name and address, so every PSn the
+        # role assignments use exists (it just fails to connect)
+        names = {entry['name'] for entry in discovered if entry['name']}
+        found = bench_config(discovered + [seed for seed in DEFAULT_BENCH if seed['name'] not in names])
+        idns = {entry['address']: entry['idn'] for entry in discovered}
+
+        self.power_supplies = [PowerSupply(name, address, idns.get(address))
+                               for name, address in found['psus'].items()]
+        self.psu_supplies = {psu.name: psu for psu in self.power_supplies}
+
+        self.devices = {}
+        for index, psu in enumerate(self.power_supplies, start=1):
+            self.devices[f"PSU{index}"] = {"address": psu.address, "instance": None, "user": psu.name}
+        self.devices["Signal Generator"] = {"address": found['siggen'], "instance": None, "user": "Signal Generator"}
+        self.devices["Spectrum Analyzer"] = {"address": found['specan'], "instance": None, "user": "Spectrum Analyzer"}
 
 
         self.device_tab = DeviceManagerTab(self.root, self.devices)
@@ -70,11 +80,33 @@ class App:
 # Add new tab to the notebook
         self.notebook.add(self.sa_tab.frame, text="Spectrum Analyzer")
         
-        self.seq_tab = TestSequencerTab(self.notebook, self.devices, self.ps_tab, self.sg_tab, self.sa_tab)
+        self.abort = AbortManager(self.abort_targets)
+        self.ps_tab.telemetry.listeners.append(self.abort.check)
+        self.abort.listeners.append(self.pairing_tab.scheduler.stop)
+
+        self.seq_tab = TestSequencerTab(self.notebook, self.devices, self.ps_tab, self.sg_tab, self.sa_tab, abort=self.abort)
         self.notebook.add(self.seq_tab.get_tab(), text = "Test Sequencer")
+
+        if get_pool().recorder is not None:
+            self.trace_tab = ScpiTraceTab(self.notebook, get_pool().recorder)
+            self.notebook.add(self.trace_tab.get_tab(), text="SCPI Trace")
         
 
 
+    def abort_targets(self):
+        # Drains by assignment; every other output is treated like a gate and goes off last
+        drain_keys = {(a['psu'], a['output']) for a in self.assignment_data if a['role'].lower() == 'drain'}
+        drains, gates = [], []
+        for psu in self.power_supplies:
+            for output in ("Output1", "Output2"):
+                (drains if (psu.name, output) in drain_keys else gates).append((psu, output))
+        return {'siggen': self.devices["Signal Generator"]["instance"], 'drains': drains, 'gates': gates}
+
+    def on_close(self):
+        self.ps_tab.telemetry.stop()
+        get_pool().close_all()
+        self.root.destroy()
+
     def apply_output(self, psu_name, output_name, voltage_entry, current_entry):
         try:
             voltage = float(voltage_entry.get())
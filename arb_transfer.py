@@ -0,0 +1,110 @@
+import os
+import time
+import mmap
+import hashlib
+
+CHUNK_SIZE = 1 << 20  # bytes per write_raw call
+HASH_PREFIX = "WF_"
+
+
+def parse_catalog(response):
+    # MMEM:CAT? -> <used>,<free>,"name,type,size",... ; returns the set of file names
+    parts = response.strip().split('"')
+    names = {entry.split(',')[0].strip() for entry in parts[1::2] if entry.strip()}
+    if not names:
+        # Unquoted listing: name,size pairs after the two header fields
+        fields = [f.strip() for f in response.strip().split(',')[2:]]
+        names = {f for f in fields[0::2] if f}
+    return names
+
+
+class ArbUploader:
+    # Uploads ARB waveform files to a signal generator without re-sending what is already there.
+    # Files are memory-mapped and streamed as one IEEE block split over several write_raw calls,
+    # and stored on the instrument under a name derived from their content hash.
+    def __init__(self, instrument, chunk_size=CHUNK_SIZE):
+        self.instrument = instrument
+        self.chunk_size = chunk_size
+        self.known = None  # names on the instrument, None until the catalog is read
+        self.hashes = {}  # path -> (mtime, size, digest)
+        self.last = None  # result of the most recent upload()
+
+    def invalidate(self):
+        # Call after reconnecting or *RST; the catalog is re-read on the next upload
+        self.known = None
+
+    def catalog(self, refresh=False):
+        if self.known is None or refresh:
+            self.known = parse_catalog(self.instrument.query('MMEM:CAT? "/var/user/Waveforms"'))
+        return self.known
+
+    def digest(self, path):
+        stat = os.stat(path)
+        cached = self.hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            for offset in range(0, len(data), self.chunk_size):
+                sha.update(view[offset:offset + self.chunk_size])
+            view.release()
+        digest = sha.hexdigest()
+        self.hashes[path] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    def name_for(self, path):
+        # Same content -> same name, whatever the local file is called
+        extension = os.path.splitext(path)[1].lower()
+        return f"{HASH_PREFIX}{self.digest(path)[:16]}{extension}"
+
+    def upload(self, path, force=False):
+        # Returns {'name', 'uploaded', 'bytes', 'elapsed', 'mb_per_s'}
+        size = os.path.getsize(path)
+        if size == 0:
+            raise ValueError(f"Waveform file is empty: {path}")
+        name = self.name_for(path)
+        start = time.perf_counter()
+
+        # A cached hit costs nothing; a miss re-reads the catalog once before sending
+        if not force and (name in (self.known or ()) or name in self.catalog(refresh=True)):
+            self.last = {"name": name, "uploaded": False, "bytes": 0,
+                         "elapsed": time.perf_counter() - start, "mb_per_s": None}
+            return self.last
+
+        header = f"MMEM:DATA:LOAD '{name}',#{len(str(size))}{size}".encode('ascii')
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                self._send_block(header, view)
+            finally:
+                view.release()
+
+        elapsed = time.perf_counter() - start
+        self.catalog().add(name)
+        self.last = {"name": name, "uploaded": True, "bytes": size, "elapsed": elapsed,
+                     "mb_per_s": size / elapsed / 1e6 if elapsed else None}
+        return self.last
+
+    def _send_block(self, header, view):
+        # END is only asserted with the last chunk, so the instrument sees a single message
+        instrument = self.instrument
+        send_end = instrument.send_end
+        try:
+            instrument.send_end = False
+            instrument.write_raw(header)
+            for offset in range(0, len(view), self.chunk_size):
+                # Only one chunk is ever copied out of the mapping (VISA layers want bytes)
+                chunk = bytes(view[offset:offset + self.chunk_size])
+                if offset + self.chunk_size >= len(view):
+                    instrument.send_end = send_end
+                instrument.write_raw(chunk)
+        finally:
+            instrument.send_end = send_end
+
+
+def describe(result):
+    if not result["uploaded"]:
+        return f"'{result['name']}' already on instrument, upload skipped"
+    rate = f", {result['mb_per_s']:.2f} MB/s" if result['mb_per_s'] else ""
+    return f"Uploaded '{result['name']}': {result['bytes'] / 1e6:.2f} MB in {result['elapsed']:.2f} s{rate}"
@@ -0,0 +1,112 @@
+import argparse
+import json
+import sys
+from abort import AbortManager, format_abort
+from sequence_engine import SequenceEngine, connect_bench
+from setup_config import load_setup
+from recipe import load_recipe
+from scpi_trace import TraceRecorder, format_summary
+from telemetry import TelemetryPoller
+from visa_pool import get_pool
+
+# Headless entry point: never imports tkinter, so it starts fast and runs without a display.
+#
+#   python batch_runner.py --setup setup.txt --devices bench.json --iterations 10 --output runs.jsonl
+#
+# bench.json:
+#   {"psus": {"PS1": "GPIB0::10::INSTR", ...},
+#    "siggen": "GPIB0::28::INSTR", "specan": "GPIB0::18::INSTR",
+#    "assignments": [{"psu": "PS1", "output": "Output1", "role": "Gate"}, ...],
+#    "delays": {"Sweep": 2.0}}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the test sequence without the GUI.")
+    parser.add_argument("--setup", help="setup file (KEY=value lines); not needed with --resume")
+    parser.add_argument("--devices", required=True, help="JSON device map (addresses, roles, delays)")
+    parser.add_argument("--recipe", help="JSON recipe to run instead of the default six steps")
+    parser.add_argument("--iterations", type=int, default=1, help="runs per DUT")
+    parser.add_argument("--dut", action="append", default=[], help="DUT label; repeat for several DUTs")
+    parser.add_argument("--results", default="results", help="root directory for result stores")
+    parser.add_argument("--output", help="write JSON-lines run summaries here instead of stdout")
+    parser.add_argument("--quiet", action="store_true", help="suppress step logging on stderr")
+    parser.add_argument("--resume", metavar="RUN_DIR",
+                        help="continue a failed or stopped run from its journal instead of starting new ones")
+    parser.add_argument("--trace", help="record every SCPI transaction and export it here (.json summary or .csv)")
+    return parser
+
+
+def run_batch(setup_path, device_map, iterations=1, duts=None, results_root="results", log=None, emit=None,
+              recipe_path=None, resume=None):
+    cfg = load_setup(setup_path) if setup_path else {}  # validated before any bench is touched
+    recipe = load_recipe(recipe_path) if recipe_path else None
+    bench = connect_bench(device_map)
+    abort = AbortManager(bench.abort_targets)
+    poller = TelemetryPoller(list(bench.psus.values()), rate_hz=device_map.get('telemetry_hz', 5.0))
+    poller.listeners.append(abort.check)
+    if log:
+        abort.reporters.append(lambda report: log(format_abort(report)))
+    engine = SequenceEngine(bench, device_map.get('delays'), log=log or (lambda message: None),
+                            results_root=results_root, abort=abort, telemetry=poller)
+
+    summaries = []
+    poller.start()
+    try:
+        if resume:
+            # The journal supplies the setup; one run, under its original id
+            summary = engine.run(dict(cfg), recipe=recipe, resume=resume)
+            summary.update({"resumed_from": resume, "setup": setup_path})
+            summaries.append(summary)
+            if emit:
+                emit(summary)
+            return summaries
+        for dut in duts or ["DUT"]:
+            for iteration in range(1, iterations + 1):
+                summary = engine.run(dict(cfg), run_id=f"{dut}_{iteration:04d}", recipe=recipe)
+                summary.update({"dut": dut, "iteration": iteration, "setup": setup_path})
+                summaries.append(summary)
+                if emit:
+                    emit(summary)
+                if abort.tripped.is_set():
+                    return summaries
+    finally:
+        poller.stop()
+    return summaries
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.setup and not args.resume:
+        parser.error("--setup is required unless --resume is given")
+    with open(args.devices) as f:
+        device_map = json.load(f)
+
+    pool = get_pool()
+    if args.trace and pool.recorder is None:
+        pool.recorder = TraceRecorder()
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr))
+
+    def emit(summary):
+        out.write(json.dumps(summary) + "\n")
+        out.flush()
+
+    try:
+        summaries = run_batch(args.setup, device_map, args.iterations, args.dut, args.results, log, emit,
+                              args.recipe, args.resume)
+    finally:
+        pool.close_all()
+        if out is not sys.stdout:
+            out.close()
+        if args.trace:
+            pool.recorder.export(args.trace)
+            if not args.quiet:
+                print(format_summary(pool.recorder.summary()), file=sys.stderr)
+
+    return 0 if all(s['status'] == "complete" for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
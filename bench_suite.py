@@ -0,0 +1,257 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from abort import AbortManager
+from arb_transfer import ArbUploader
+from connect_engine import ConnectEngine
+from instrument_locks import get_lock_manager
+from power_supply import PowerSupply
+from psu_driver import driver_for_idn
+from ramp_profile import SETPOINT, RampProfile, RampSegment
+from ramp_scheduler import RampScheduler
+from recipe import compile_recipe
+from scpi_trace import TraceRecorder, format_summary
+from trace_analysis import TraceBatch
+from sequence_engine import SequenceEngine, connect_bench
+from sim_backend import SimulatedResourceManager
+from visa_pool import VisaSessionPool
+
+# Hardware-free benchmarks against the simulated bench (sim_backend.py).
+#
+#   python bench_suite.py --latency 2 --repeat 5 --output bench_output.txt
+
+PSU_ADDRESSES = {
+    "PS1": "GPIB0::10::INSTR",
+    "PS2": "GPIB0::11::INSTR",
+    "PS3": "GPIB0::15::INSTR",
+    "PS4": "USB0::0x2A8D::0x3402::MY61002290::INSTR",
+}
+SIGGEN_ADDRESS = "GPIB0::28::INSTR"
+SPECAN_ADDRESS = "GPIB0::18::INSTR"
+
+BENCH_MAP = {
+    "psus": PSU_ADDRESSES,
+    "siggen": SIGGEN_ADDRESS,
+    "specan": SPECAN_ADDRESS,
+    "assignments": [
+        {'psu': 'PS1', 'output': 'Output1', 'role': 'Gate'},
+        {'psu': 'PS2', 'output': 'Output2', 'role': 'Drain'},
+        {'psu': 'PS3', 'output': 'Output1', 'role': 'Gate'},
+        {'psu': 'PS3', 'output': 'Output2', 'role': 'Drain'},
+    ],
+}
+
+TRACE = None  # TraceRecorder shared by every benchmark pool when --trace is given
+
+SETUP = {"VGDRV": -2.5, "VDDRV": 28.0, "IDDRV": 0.5, "LOSWPFREQMZ": 1000, "HISWPFREQMZ": 2000,
+         "LOSWPPWR": -10, "SWPFREQPTS": 11}
+
+
+def make_pool(latency, sweep_time=0.02):
+    return VisaSessionPool(resource_manager=SimulatedResourceManager(latency=latency, sweep_time=sweep_time),
+                           recorder=TRACE)
+
+
+def transactions(pool):
+    return sum(i.transactions for i in pool.resource_manager.instruments.values())
+
+
+def connected_psus(pool):
+    psus = {}
+    for name, address in PSU_ADDRESSES.items():
+        psu = PowerSupply(name, address)
+        psu.connect(pool)
+        psu.driver = driver_for_idn(pool.idn(address))(psu.instrument)
+        psus[name] = psu
+    return psus
+
+
+def bench_connect_all(latency):
+    pool = make_pool(latency)
+    devices = {name: {"address": address} for name, address in PSU_ADDRESSES.items()}
+    devices["Signal Generator"] = {"address": SIGGEN_ADDRESS}
+    devices["Spectrum Analyzer"] = {"address": SPECAN_ADDRESS}
+    start = time.perf_counter()
+    results, _ = ConnectEngine(pool).connect_all(devices)
+    elapsed = time.perf_counter() - start
+    return elapsed, {"connected": sum(r['ok'] for r in results.values()), "transactions": transactions(pool)}
+
+
+def bench_apply_all(latency):
+    pool = make_pool(latency)
+    psus = connected_psus(pool)
+    before = transactions(pool)
+    start = time.perf_counter()
+    for psu in psus.values():
+        for ch in (1, 2):
+            psu.driver.apply_output(ch, 5.0, 0.1)
+    elapsed = time.perf_counter() - start
+    return elapsed, {"transactions": transactions(pool) - before}
+
+
+def bench_pair_activation(latency, dwell=0.01):
+    # Same profile shape as the pairing tab with short dwells; PS2/PS3 run theirs as LIST programs
+    pool = make_pool(latency)
+    psus = connected_psus(pool)
+    pairs = [("PS1", "Output1", "PS2", "Output2"), ("PS3", "Output1", "PS3", "Output2"),
+             ("PS1", "Output2", "PS4", "Output1")]
+    gate_pinch = RampProfile([RampSegment(-6.0, dwell=dwell)])
+    drain_up = RampProfile([RampSegment(0.0, dwell=dwell), RampSegment(10.0, dwell=dwell),
+                            RampSegment(SETPOINT, dwell=dwell)])
+    gate_release = RampProfile([RampSegment(-3.0, dwell=dwell), RampSegment(SETPOINT)])
+    jobs = []
+    for gate_psu, gate_out, drain_psu, drain_out in pairs:
+        jobs.append({"key": (gate_psu, drain_psu), "stages": [
+            (psus[gate_psu], gate_out, gate_pinch.bind(-2.5, 0.01)),
+            (psus[drain_psu], drain_out, drain_up.bind(28.0, 0.5)),
+            (psus[gate_psu], gate_out, gate_release.bind(-2.5, 0.01)),
+        ]})
+    before = transactions(pool)
+    get_lock_manager().reset_stats()
+    results, elapsed = RampScheduler().run(jobs)
+    locks = get_lock_manager().stats()
+    busiest = max(locks, key=lambda name: locks[name]["wait_total"])
+    return elapsed, {"pairs_ok": sum(r['ok'] for r in results), "transactions": transactions(pool) - before,
+                     "busiest": busiest, "busiest_wait_ms": locks[busiest]["wait_total"] * 1000}
+
+
+def bench_arb_upload(latency, size=1 << 22):
+    # First apply streams the file; the second finds it by hash and sends nothing
+    pool = make_pool(latency)
+    uploader = ArbUploader(pool.acquire(SIGGEN_ADDRESS))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.wv")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        first = uploader.upload(path)
+        second = uploader.upload(path)
+    return first['elapsed'], {"MB/s": first['mb_per_s'], "reapply_ms": second['elapsed'] * 1000,
+                              "reuploaded": second['uploaded']}
+
+
+def bench_sequencer_run(latency):
+    pool = make_pool(latency)
+    bench = connect_bench(BENCH_MAP, pool)
+    engine = SequenceEngine(bench, {step: 2.0 for step in ("Bias ON", "RF ON", "Sweep", "Log", "RF OFF", "Bias OFF")},
+                            log=lambda message: None, results_root="results/bench")
+    before = transactions(pool)
+    start = time.perf_counter()
+    summary = engine.run(dict(SETUP))
+    elapsed = time.perf_counter() - start
+    return elapsed, {"status": summary['status'], "points": summary['rows'], "transactions": transactions(pool) - before}
+
+
+def bench_recipe_overlap(latency, size=1 << 20):
+    # Bias ON plus a thermal settle and an ARB upload as parallel recipe branches, against the same steps in sequence
+    elapsed = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in ("sequential", "parallel"):
+            pool = make_pool(latency)
+            bench = connect_bench(BENCH_MAP, pool)
+            engine = SequenceEngine(bench, {step: 2.0 for step in ("Bias ON", "RF ON", "Sweep", "Log", "RF OFF", "Bias OFF")},
+                                    log=lambda message: None, results_root="results/bench")
+            path = os.path.join(folder, f"{mode}.wv")
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+            bias = [{"do": "bias_on"}, {"do": "wait", "id": "thermal settle", "args": {"seconds": 0.5}}]
+            arb = [{"do": "arb_upload", "args": {"file": path}}]
+            steps = [{"parallel": [bias, arb]}] if mode == "parallel" else bias + arb
+            recipe = compile_recipe({"name": mode, "steps": steps + ["rf_on", "sweep", "log", "rf_off", "bias_off"]})
+            summary = engine.run(dict(SETUP), recipe=recipe)
+            elapsed[mode] = summary['elapsed']
+    return elapsed["parallel"], {"sequential_ms": elapsed["sequential"] * 1000,
+                                 "saved_ms": (elapsed["sequential"] - elapsed["parallel"]) * 1000}
+
+
+def bench_trace_measure(latency, traces=1000, points=1001):
+    # Channel power, ACPR and harmonics for a whole sweep's traces in one batch (host only)
+    rng = np.random.default_rng(0)
+    carrier = np.linspace(100e6, 1e9, traces)
+    freqs = np.linspace(10e6, 3e9, points)
+    levels = np.maximum(-90.0 + rng.normal(0.0, 1.0, (traces, points)),
+                        -12.0 * ((freqs - carrier[:, None]) / (freqs[1] - freqs[0])) ** 2)
+    start = time.perf_counter()
+    batch = TraceBatch(levels, freqs[0], freqs[-1])
+    batch.acpr(carrier, 20e6, [30e6, 60e6])
+    batch.harmonics(carrier, 3)
+    elapsed = time.perf_counter() - start
+    return elapsed, {"traces": traces, "traces_per_s": traces / elapsed}
+
+
+def bench_abort(latency):
+    pool = make_pool(latency)
+    bench = connect_bench(BENCH_MAP, pool)
+    bench.bias_on(SETUP)
+    bench.rf_on(SETUP)
+    abort = AbortManager(bench.abort_targets)
+    abort.arm()
+    elapsed_ms = abort.trigger("benchmark")
+    outputs_on = sum(ch["output"] for i in pool.resource_manager.instruments.values() if hasattr(i, "state")
+                     for ch in i.state.values())
+    return elapsed_ms / 1000, {"outputs_on_after": outputs_on, "rf_on_after": pool.get(SIGGEN_ADDRESS).output}
+
+
+BENCHMARKS = {
+    "connect_all": bench_connect_all,
+    "apply_all": bench_apply_all,
+    "pair_activation": bench_pair_activation,
+    "arb_upload": bench_arb_upload,
+    "sequencer_run": bench_sequencer_run,
+    "recipe_overlap": bench_recipe_overlap,
+    "trace_measure": bench_trace_measure,
+    "abort_time_to_safe": bench_abort,
+}
+
+
+def run_benchmarks(names, latency, repeat):
+    rows = []
+    for name in names:
+        times = []
+        extra = {}
+        for _ in range(repeat):
+            elapsed, extra = BENCHMARKS[name](latency)
+            times.append(elapsed * 1000)
+        rows.append((name, statistics.median(times), min(times), max(times), extra))
+    return rows
+
+
+def format_rows(rows, latency, repeat):
+    lines = [f"latency {latency * 1000:.1f} ms/transaction, {repeat} run(s) each",
+             f"{'benchmark':<18}{'median ms':>11}{'min ms':>10}{'max ms':>10}  details"]
+    for name, median, low, high, extra in rows:
+        details = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items())
+        lines.append(f"{name:<18}{median:>11.1f}{low:>10.1f}{high:>10.1f}  {details}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bench operations against simulated instruments.")
+    parser.add_argument("--latency", type=float, default=2.0, help="per-transaction latency in ms")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run just these benchmarks")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--trace", help="trace every SCPI transaction and export it here (.json or .csv)")
+    args = parser.parse_args(argv)
+
+    global TRACE
+    if args.trace:
+        TRACE = TraceRecorder()
+
+    rows = run_benchmarks(args.only or list(BENCHMARKS), args.latency / 1000, args.repeat)
+    report = format_rows(rows, args.latency / 1000, args.repeat)
+    if TRACE is not None:
+        TRACE.export(args.trace)
+        report += "\n\n" + format_summary(TRACE.summary())
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class ConnectEngine:
+    # Opens every device concurrently so one dead address only costs its own timeout
+    def __init__(self, pool, max_workers=8, timeout_ms=3000, retries=1, retry_delay=0.25):
+        self.pool = pool
+        self.max_workers = max_workers
+        self.timeout_ms = timeout_ms
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def connect_one(self, name, info):
+        address = info['address']
+        timeout_ms = info.get('timeout_ms', self.timeout_ms)
+        retries = info.get('retries', self.retries)
+        start = time.perf_counter()
+        error = None
+
+        for attempt in range(1, retries + 2):
+            instrument = None
+            try:
+                instrument = self.pool.acquire(address, open_timeout=timeout_ms)
+                previous_timeout = instrument.timeout
+                instrument.timeout = timeout_ms
+                try:
+                    idn = self.pool.idn(address, refresh=True)
+                finally:
+                    instrument.timeout = previous_timeout
+                return {
+                    "name": name,
+                    "address": address,
+                    "ok": True,
+                    "instance": instrument,
+                    "idn": idn,
+                    "error": None,
+                    "attempts": attempt,
+                    "elapsed": time.perf_counter() - start,
+                }
+            except Exception as e:
+                error = e
+                if instrument is not None:
+                    self.pool.release(address)
+                if attempt <= retries:
+                    time.sleep(self.retry_delay)
+
+        return {
+            "name": name,
+            "address": address,
+            "ok": False,
+            "instance": None,
+            "idn": None,
+            "error": error,
+            "attempts": retries + 1,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def connect_all(self, devices, on_result=None):
+        # Blocks until every device has finished; on_result is called from worker threads
+        start = time.perf_counter()
+        results = {}
+        if not devices:
+            return results, 0.0
+
+        workers = min(self.max_workers, len(devices))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="connect") as pool:
+            futures = [pool.submit(self.connect_one, name, info) for name, info in devices.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['name']] = result
+                if on_result:
+                    on_result(result)
+
+        return results, time.perf_counter() - start
+
+    def start(self, devices, on_result=None, on_done=None):
+        # Runs connect_all on a background thread so the caller's event loop stays free
+        def run():
+            results, elapsed = self.connect_all(devices, on_result)
+            if on_done:
+                on_done(results, elapsed)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
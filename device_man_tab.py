@@ -1,20 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pyvisa
+from connect_engine import ConnectEngine
+from ui_bus import UiEventBus
+from visa_pool import get_pool
 
 class DeviceManagerTab:
     def __init__(self, root, devices):
         self.root = root
         self.frame = ttk.Frame(root)
         self.devices = devices  # Dictionary: name -> {'address': str, 'instance': object}
-        self.rm = pyvisa.ResourceManager()
+        self.pool = get_pool()
         self.status_vars = {}  # name -> tk.StringVar
+        self.engine = ConnectEngine(self.pool)
+        self.connecting = False
 
         self.build_ui()
 
+        # Worker results are shown on the Tk thread; the Treeview updates as each device finishes
+        self.ui = UiEventBus(self.frame)
+        self.ui.subscribe("result", self.show_result)
+        self.ui.subscribe("done", lambda payload: self.finish_connect_all(*payload))
+        self.ui.start()
+
     def build_ui(self):
         # Connect All button
-        ttk.Button(self.frame, text="🔗 Connect All Devices", command=self.connect_all).pack(pady=10)
+        self.connect_all_btn = ttk.Button(self.frame, text="🔗 Connect All Devices", command=self.connect_all)
+        self.connect_all_btn.pack(pady=10)
+        self.summary_label = ttk.Label(self.frame, text="", foreground="gray")
+        self.summary_label.pack()
 
         # Device list
         self.tree = ttk.Treeview(self.frame, columns=("Device", "Status", "Action"), show="headings")
@@ -42,21 +55,52 @@ class DeviceManagerTab:
             self.connect_device(item)
 
     def connect_device(self, name):
-        try:
-            address = self.devices[name]['address']
-            instrument = self.rm.open_resource(address)
-            idn = instrument.query("*IDN?").strip()
-            self.devices[name]['instance'] = instrument
-            self.status_vars[name].set(f"✅ Connected: {idn}")
-            self.tree.item(name, values=(address, self.status_vars[name].get(), "Reconnect"))
-        except Exception as e:
-            self.status_vars[name].set("❌ Connection Failed")
-            self.tree.item(name, values=(address, self.status_vars[name].get(), "Retry"))
-            messagebox.showerror(f"{name} Connection Error", str(e))
+        result = self.engine.connect_one(name, self.devices[name])
+        self.show_result(result)
+        if not result['ok']:
+            messagebox.showerror(f"{name} Connection Error", str(result['error']))
 
     def connect_all(self):
+        if self.connecting:
+            return
+        self.connecting = True
+        self.connect_all_btn.state(["disabled"])
+        self.summary_label.config(text="Connecting...", foreground="gray")
         for name in self.devices:
-            self.connect_device(name)
+            self.status_vars[name].set("⏳ Connecting...")
+            self.tree.item(name, values=(self.devices[name]['address'], self.status_vars[name].get(), ""))
+
+        self.engine.start(
+            self.devices,
+            on_result=lambda result: self.ui.post("result", result),
+            on_done=lambda results, elapsed: self.ui.post("done", (results, elapsed)),
+        )
+
+    def show_result(self, result):
+        name = result['name']
+        address = result['address']
+        if result['ok']:
+            # The pool hands back the same session on reconnect; drop the ref held from last time
+            if self.devices[name]['instance'] is not None:
+                self.pool.release(address)
+            self.devices[name]['instance'] = result['instance']
+            self.status_vars[name].set(f"✅ Connected: {result['idn']} ({result['elapsed']:.2f} s)")
+            self.tree.item(name, values=(address, self.status_vars[name].get(), "Reconnect"))
+        else:
+            self.status_vars[name].set(f"❌ Connection Failed after {result['attempts']} attempt(s)")
+            self.tree.item(name, values=(address, self.status_vars[name].get(), "Retry"))
+
+    def finish_connect_all(self, results, elapsed):
+        self.connecting = False
+        self.connect_all_btn.state(["!disabled"])
+        connected = sum(1 for r in results.values() if r['ok'])
+        color = "green" if connected == len(results) else "red"
+        self.summary_label.config(text=f"Connected {connected}/{len(results)} devices in {elapsed:.2f} s", foreground=color)
+
+        failed = [r for r in results.values() if not r['ok']]
+        if failed:
+            details = "\n".join(f"{r['name']} ({r['address']}): {r['error']}" for r in failed)
+            messagebox.showerror("Connection Errors", details)
 
     def get_tab(self):
         return self.frame
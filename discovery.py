@@ -0,0 +1,231 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from psu_driver import DRIVER_MAP
+from sweep_engine import LIST_MODE_MODELS
+from visa_pool import get_pool
+
+# Instrument auto-discovery. Every VISA interface is listed in parallel, every address found is
+# opened and asked *IDN? concurrently with a short timeout, and each IDN is resolved through one
+# precompiled model index to a kind (psu/siggen/specan) and, for supplies, a driver. The result is
+# saved to a JSON cache; later startups only re-check the cached addresses (one concurrent *IDN?
+# pass) and fall back to a full discovery when anything moved, disappeared or changed identity.
+# Instruments added since the cache was written appear after `python discovery.py --refresh`.
+#
+#   python discovery.py             # cached or fresh bench, as the GUI would see it
+#   python discovery.py --refresh   # full re-probe
+
+INTERFACES = ("GPIB", "USB", "TCPIP")  # serial ports are never probed: *IDN? is not safe on every ASRL device
+# Next to this module, so the GUI and the CLI share one cache whatever directory they start from
+CACHE_FILE = os.environ.get("DISCOVERY_CACHE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery_cache.json"))
+CACHE_VERSION = 1
+
+SIGGEN_MODELS = LIST_MODE_MODELS + ("E4428C", "N5173B", "N5183B", "SMB100A", "SMBV100A", "SMW200A")
+SPECAN_MODELS = ("N9000A", "N9010A", "N9020A", "N9030A", "N9040B", "E4440A", "E4445A", "FSU", "FSV", "FSW")
+ROLE_NAMES = {"siggen": "Signal Generator", "specan": "Spectrum Analyzer"}
+
+# The bench's usual instruments: names that role assignments refer to, and the addresses used
+# when discovery finds nothing (no VISA library, everything powered off). A seed's name always
+# goes to its address, whatever an earlier cache called that address.
+DEFAULT_BENCH = [
+    {"address": "GPIB0::10::INSTR", "kind": "psu", "name": "PS1"},
+    {"address": "GPIB0::11::INSTR", "kind": "psu", "name": "PS2"},
+    {"address": "GPIB0::15::INSTR", "kind": "psu", "name": "PS3"},
+    {"address": "USB0::0x2A8D::0x3402::MY61002290::INSTR", "kind": "psu", "name": "PS4"},
+    {"address": "GPIB0::28::INSTR", "kind": "siggen", "name": "Signal Generator"},
+    {"address": "GPIB0::18::INSTR", "kind": "specan", "name": "Spectrum Analyzer"},
+]
+
+# model -> (kind, driver class name or None)
+MODEL_INDEX = {model: ("siggen", None) for model in SIGGEN_MODELS}
+MODEL_INDEX.update({model: ("specan", None) for model in SPECAN_MODELS})
+MODEL_INDEX.update({model: ("psu", driver.__name__) for model, driver in DRIVER_MAP.items()})
+MODEL_PATTERN = re.compile("|".join(re.escape(model) for model in sorted(MODEL_INDEX, key=len, reverse=True)))
+
+
+def resolve(idn):
+    # (kind, model, driver name); the IDN model field is looked up directly, the whole string
+    # searched only when that misses (firmware suffixes, vendors that pad the field)
+    fields = idn.split(",")
+    model = fields[1].strip() if len(fields) > 1 else ""
+    if model not in MODEL_INDEX:
+        match = MODEL_PATTERN.search(idn)
+        if match is None:
+            return None, None, None
+        model = match.group(0)
+    kind, driver = MODEL_INDEX[model]
+    return kind, model, driver
+
+
+def bench_config(entries):
+    # Discovered instruments in connect_bench()'s device_map form
+    config = {"psus": {}, "siggen": None, "specan": None}
+    for entry in entries:
+        if entry["kind"] == "psu" and entry["name"]:
+            config["psus"][entry["name"]] = entry["address"]
+        elif entry["kind"] in ROLE_NAMES and entry["name"] == ROLE_NAMES[entry["kind"]]:
+            config[entry["kind"]] = entry["address"]
+    config["psus"] = dict(sorted(config["psus"].items(), key=lambda item: _psu_number(item[0])))
+    return config
+
+
+def _psu_number(name):
+    digits = name[2:]
+    return int(digits) if name.startswith("PS") and digits.isdigit() else sys.maxsize
+
+
+class Discovery:
+    def __init__(self, pool=None, cache_path=CACHE_FILE, interfaces=INTERFACES, timeout_ms=1000, max_workers=16):
+        self.pool = pool or get_pool()
+        self.cache_path = cache_path
+        self.interfaces = interfaces
+        self.timeout_ms = timeout_ms
+        self.max_workers = max_workers
+        self.source = None  # "cache" or "probe" after discover()
+        self.elapsed = 0.0
+
+    def list_resources(self):
+        # One list_resources() per interface, all at once; an interface with no driver installed
+        # raises and is skipped
+        rm = self.pool.resource_manager
+        with ThreadPoolExecutor(max_workers=len(self.interfaces), thread_name_prefix="visa-list") as executor:
+            futures = [executor.submit(rm.list_resources, f"{interface}?*::INSTR") for interface in self.interfaces]
+        addresses = set()
+        for future in futures:
+            try:
+                addresses.update(future.result())
+            except Exception:
+                continue
+        return sorted(addresses)
+
+    def probe(self, address):
+        # *IDN? under a short open and I/O timeout; None when nothing answers
+        instrument = None
+        try:
+            instrument = self.pool.acquire(address, open_timeout=self.timeout_ms)
+            previous_timeout = instrument.timeout
+            instrument.timeout = self.timeout_ms
+            try:
+                return self.pool.idn(address, refresh=True)
+            finally:
+                instrument.timeout = previous_timeout
+        except Exception:
+            return None
+        finally:
+            if instrument is not None:
+                self.pool.release(address)
+
+    def probe_all(self, addresses):
+        if not addresses:
+            return {}
+        workers = min(self.max_workers, len(addresses))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="visa-idn") as executor:
+            return dict(zip(addresses, executor.map(self.probe, addresses)))
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if cache.get("version") != CACHE_VERSION:
+            return []
+        return cache.get("instruments", [])
+
+    def save_cache(self, entries):
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": CACHE_VERSION, "saved": time.time(), "instruments": entries}, f, indent=2)
+        os.replace(tmp, self.cache_path)
+
+    def verify(self, entries):
+        # True when every cached address still answers with the same IDN
+        idns = self.probe_all([entry["address"] for entry in entries])
+        return all(idns[entry["address"]] == entry["idn"] for entry in entries)
+
+    def discover(self, refresh=False, seeds=DEFAULT_BENCH):
+        # [{'address', 'idn', 'kind', 'model', 'driver', 'name'}], names stable across startups.
+        # seeds: [{'address', 'kind', 'name'}] naming the bench's usual instruments, so role
+        # assignments written against those names still apply
+        start = time.perf_counter()
+        cached = self.load_cache()
+        if cached and not refresh and self.verify(cached):
+            entries = [dict(entry, name=None) for entry in cached]
+            self.assign_names(entries, cached, seeds)
+            if entries != cached:
+                self.save_cache(entries)
+            self.source, self.elapsed = "cache", time.perf_counter() - start
+            return entries
+
+        entries = []
+        for address, idn in self.probe_all(self.list_resources()).items():
+            if idn is None:
+                continue
+            kind, model, driver = resolve(idn)
+            entries.append({"address": address, "idn": idn, "kind": kind, "model": model, "driver": driver, "name": None})
+        self.assign_names(entries, cached, seeds)
+        self.save_cache(entries)
+        self.source, self.elapsed = "probe", time.perf_counter() - start
+        return entries
+
+    def assign_names(self, entries, previous, seeds=()):
+        # Seeded addresses take their seed's name; other addresses keep the name they had in the
+        # last cache unless a seed holds it; new supplies get the next free PSn, and the first
+        # generator/analyzer found takes the role name if nobody holds it. Seeded supply names
+        # are reserved even when their address is missing, so roles written against PS3 never
+        # land on another supply.
+        taken = set()
+        seeded = {(entry["address"], entry["kind"]) for entry in seeds}
+        reserved = {entry["name"] for entry in seeds if entry["kind"] == "psu" and entry.get("name")}
+        for source in (seeds, previous):
+            names = {(entry["address"], entry["kind"]): entry["name"] for entry in source if entry.get("name")}
+            for entry in entries:
+                name = names.get((entry["address"], entry["kind"]))
+                if source is previous and name in reserved and (entry["address"], entry["kind"]) not in seeded:
+                    continue
+                if name and not entry["name"] and name not in taken:
+                    entry["name"] = name
+                    taken.add(name)
+        taken |= reserved
+        number = 1
+        for entry in entries:
+            if entry["name"] or entry["kind"] is None:
+                continue
+            if entry["kind"] == "psu":
+                while f"PS{number}" in taken:
+                    number += 1
+                entry["name"] = f"PS{number}"
+            elif ROLE_NAMES[entry["kind"]] not in taken:
+                entry["name"] = ROLE_NAMES[entry["kind"]]
+            else:
+                continue
+            taken.add(entry["name"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the instruments on every VISA interface.")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cache and probe every interface")
+    parser.add_argument("--cache", default=CACHE_FILE, help="address/IDN/driver cache file")
+    parser.add_argument("--timeout-ms", type=int, default=1000, help="open and *IDN? timeout per address")
+    args = parser.parse_args(argv)
+
+    pool = get_pool()
+    discovery = Discovery(pool, args.cache, timeout_ms=args.timeout_ms)
+    try:
+        entries = discovery.discover(refresh=args.refresh)
+    finally:
+        pool.close_all()
+    for entry in entries:
+        print(f"{entry['name'] or '-':<18} {entry['address']:<42} {entry['kind'] or '?':<7} {entry['driver'] or ''}")
+        print(f"{'':<18} {entry['idn']}")
+    print(f"{len(entries)} instruments from {discovery.source} in {discovery.elapsed:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class FairLock:
+    # Re-entrant lock granted in arrival order, so a busy ramp cannot starve a manual "Set" or the
+    # telemetry poller. urgent() jumps the queue (abort path). Records how long callers waited.
+    def __init__(self, name):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._waiters = deque()
+        self._owner = None
+        self._depth = 0
+        self._acquired_at = 0.0
+        self.stats = {
+            "acquisitions": 0,
+            "contended": 0,
+            "timeouts": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "hold_total": 0.0,
+            "max_queue": 0,
+        }
+
+    def acquire(self, blocking=True, timeout=None, urgent=False):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return True
+            start = time.perf_counter()
+            if self._owner is not None or self._waiters:
+                if not blocking:
+                    return False
+                token = object()
+                if urgent:
+                    self._waiters.appendleft(token)
+                else:
+                    self._waiters.append(token)
+                self.stats["contended"] += 1
+                self.stats["max_queue"] = max(self.stats["max_queue"], len(self._waiters))
+                granted = self._cond.wait_for(lambda: self._owner is None and self._waiters[0] is token, timeout)
+                if not granted:
+                    self._waiters.remove(token)
+                    self.stats["timeouts"] += 1
+                    self._cond.notify_all()
+                    return False
+                self._waiters.popleft()
+            waited = time.perf_counter() - start
+            self._owner = me
+            self._depth = 1
+            self._acquired_at = time.perf_counter()
+            self.stats["acquisitions"] += 1
+            self.stats["wait_total"] += waited
+            self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+            return True
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError(f"{self.name}: release by a thread that does not hold the lock")
+            self._depth -= 1
+            if self._depth:
+                return
+            self.stats["hold_total"] += time.perf_counter() - self._acquired_at
+            self._owner = None
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    @contextmanager
+    def urgent(self):
+        self.acquire(urgent=True)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def snapshot(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queued"] = len(self._waiters)
+        stats["wait_avg"] = stats["wait_total"] / stats["acquisitions"] if stats["acquisitions"] else 0.0
+        return stats
+
+
+class LockManager:
+    # One FairLock per instrument session, keyed by VISA address; anything that writes to an
+    # instrument from more than one thread takes lock_for(instrument) around its transaction(s)
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def lock(self, key):
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = FairLock(key)
+            return self._locks[key]
+
+    def lock_for(self, instrument):
+        key = getattr(instrument, "resource_name", None) or f"session-{id(instrument):x}"
+        return self.lock(key)
+
+    def stats(self):
+        with self._guard:
+            locks = list(self._locks.values())
+        return {lock.name: lock.snapshot() for lock in locks}
+
+    def reset_stats(self):
+        with self._guard:
+            for lock in self._locks.values():
+                with lock._cond:
+                    for key in lock.stats:
+                        lock.stats[key] = 0.0 if isinstance(lock.stats[key], float) else 0
+
+    def report(self):
+        # Busiest instrument first
+        rows = sorted(self.stats().items(), key=lambda item: item[1]["wait_total"], reverse=True)
+        lines = [f"{'instrument':<42}{'acq':>6}{'contended':>11}{'wait ms':>10}{'max ms':>9}{'held ms':>10}{'queue':>7}"]
+        for name, s in rows:
+            lines.append(f"{name:<42}{s['acquisitions']:>6}{s['contended']:>11}{s['wait_total'] * 1000:>10.1f}"
+                         f"{s['wait_max'] * 1000:>9.1f}{s['hold_total'] * 1000:>10.1f}{s['max_queue']:>7}")
+        return "\n".join(lines)
+
+
+_manager = LockManager()
+
+
+def get_lock_manager():
+    return _manager
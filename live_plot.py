@@ -0,0 +1,197 @@
+import time
+import numpy as np
+import tkinter as tk
+
+# Live plots on a plain Tk Canvas. Before drawing, each series is reduced to a min and a max per
+# pixel column, so a 40k-point trace or hours of telemetry cost about two points per pixel.
+# Existing line items are moved with coords() rather than deleted and recreated, and the axes
+# are redrawn only when the ranges, the series or the canvas size change. Redraws are capped at
+# max_fps and back off when they get slow, so plotting never takes more than `budget` of the
+# Tk loop's time.
+
+COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#17becf")
+MARGIN = (56, 18, 10, 22)  # left, top, right, bottom (px)
+TICKS = 5
+
+
+def decimate_minmax(x, y, width, lo=None, hi=None):
+    # x increasing; keeps the points in [lo, hi] and returns at most 2 * width of them
+    lo = x[0] if lo is None else lo
+    hi = x[-1] if hi is None else hi
+    first, last = np.searchsorted(x, lo, side="left"), np.searchsorted(x, hi, side="right")
+    x, y = x[first:last], y[first:last]
+    keep = ~np.isnan(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    if len(y) <= 2 * width:
+        return x, y
+    edges = np.unique(np.searchsorted(x, np.linspace(lo, hi, width, endpoint=False)))
+    edges = edges[edges < len(y)]
+    xs = np.repeat(x[edges], 2)
+    ys = np.empty(len(xs))
+    ys[0::2] = np.minimum.reduceat(y, edges)
+    ys[1::2] = np.maximum.reduceat(y, edges)
+    return xs, ys
+
+
+def nice_range(lo, hi):
+    # Padded range whose ends sit on tick-friendly values
+    if not np.isfinite(lo) or not np.isfinite(hi):
+        return 0.0, 1.0
+    if hi - lo < 1e-12:
+        pad = abs(lo) * 0.05 or 0.5
+        lo, hi = lo - pad, hi + pad
+    step = 10 ** np.floor(np.log10((hi - lo) / TICKS))
+    for factor in (1, 2, 5, 10):
+        if (hi - lo) / (step * factor) <= TICKS:
+            step *= factor
+            break
+    return float(np.floor(lo / step) * step), float(np.ceil(hi / step) * step)
+
+
+class LivePlot:
+    def __init__(self, parent, width=600, height=200, x_label="", y_label="", max_fps=10, budget=0.25):
+        self.canvas = tk.Canvas(parent, width=width, height=height, background="white", highlightthickness=0)
+        self.x_label = x_label
+        self.y_label = y_label
+        self.frame_ms = max(int(1000 / max_fps), 1)
+        self.budget = budget
+        self.series = {}  # name -> [x, y, line item]
+        self.x_range = None  # (lo, hi), or None to follow the data
+        self.y_range = None
+        self.transform = None  # (x_lo, x_scale, y_hi, y_scale) of the last draw, for the cursor readout
+        self.dirty = False
+        self.draw_ms = 0.0  # cost of the last redraw
+        self._axes_key = None
+        self._delay = self.frame_ms
+        self._readout = self.canvas.create_text(MARGIN[0] + 4, 2, anchor="nw", font=("Arial", 8), fill="gray30")
+        self.canvas.bind("<Configure>", lambda event: self.invalidate())
+        self.canvas.bind("<Motion>", self.show_cursor)
+        self.canvas.bind("<Leave>", lambda event: self.canvas.itemconfigure(self._readout, text=""))
+        self.canvas.after(self.frame_ms, self._tick)
+
+    def set_series(self, name, x, y):
+        # Tk thread only; worker threads go through the owning tab's UiEventBus
+        if name not in self.series:
+            color = COLORS[len(self.series) % len(COLORS)]
+            self.series[name] = [None, None, self.canvas.create_line(0, 0, 0, 0, fill=color, state="hidden")]
+            self._axes_key = None  # legend changes
+        entry = self.series[name]
+        entry[0], entry[1] = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        self.dirty = True
+
+    def retain(self, names):
+        for name in [name for name in self.series if name not in names]:
+            self.canvas.delete(self.series.pop(name)[2])
+            self._axes_key = None
+            self.dirty = True
+
+    def clear(self):
+        self.retain(())
+
+    def set_x_range(self, lo, hi):
+        self.x_range = None if lo is None else (lo, hi)
+        self.dirty = True
+
+    def invalidate(self):
+        self._axes_key = None
+        self.dirty = True
+
+    def visible(self):
+        try:
+            return bool(self.canvas.winfo_viewable())
+        except tk.TclError:
+            return False
+
+    def _tick(self):
+        try:
+            if self.dirty and self.visible():
+                start = time.perf_counter()
+                self.redraw()
+                self.draw_ms = (time.perf_counter() - start) * 1000
+                self._delay = max(self.frame_ms, int(self.draw_ms / self.budget))
+            self.canvas.after(self._delay, self._tick)
+        except tk.TclError:
+            pass  # canvas destroyed
+
+    def redraw(self):
+        self.dirty = False
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        left, top, right, bottom = MARGIN
+        plot_w, plot_h = width - left - right, height - top - bottom
+        series = [(name, x, y, item) for name, (x, y, item) in self.series.items() if x is not None and len(x)]
+        if plot_w < 10 or plot_h < 10 or not series:
+            for *_, item in series:
+                self.canvas.itemconfigure(item, state="hidden")
+            return
+
+        if self.x_range is not None:
+            x_lo, x_hi = self.x_range
+        else:
+            x_lo = min(x[0] for _, x, _, _ in series)
+            x_hi = max(x[-1] for _, x, _, _ in series)
+        if x_hi <= x_lo:
+            x_hi = x_lo + 1.0
+        reduced = [(item, *decimate_minmax(x, y, plot_w, x_lo, x_hi)) for _, x, y, item in series]
+
+        levels = [y for _, _, y in reduced if len(y)]
+        if levels:
+            y_lo = min(float(y.min()) for y in levels)
+            y_hi = max(float(y.max()) for y in levels)
+            # Keep the current scale while the data fits and still uses a fair part of it
+            if (self.y_range is None or y_lo < self.y_range[0] or y_hi > self.y_range[1]
+                    or (y_hi - y_lo) < 0.3 * (self.y_range[1] - self.y_range[0])):
+                self.y_range = nice_range(y_lo, y_hi)
+        y_lo, y_hi = self.y_range or (0.0, 1.0)
+
+        key = (width, height, x_lo, x_hi, y_lo, y_hi, tuple(self.series))
+        if key != self._axes_key:
+            self._axes_key = key
+            self.draw_axes(width, height, x_lo, x_hi, y_lo, y_hi)
+
+        x_scale = plot_w / (x_hi - x_lo)
+        y_scale = plot_h / (y_hi - y_lo)
+        self.transform = (x_lo, x_scale, y_hi, y_scale)
+        for item, x, y in reduced:
+            if not len(x):
+                self.canvas.itemconfigure(item, state="hidden")
+                continue
+            if len(x) == 1:
+                x, y = np.repeat(x, 2), np.repeat(y, 2)
+            coords = np.empty(2 * len(x))
+            coords[0::2] = left + (x - x_lo) * x_scale
+            coords[1::2] = top + (y_hi - y) * y_scale
+            self.canvas.coords(item, coords.tolist())
+            self.canvas.itemconfigure(item, state="normal")
+
+    def draw_axes(self, width, height, x_lo, x_hi, y_lo, y_hi):
+        left, top, right, bottom = MARGIN
+        canvas = self.canvas
+        canvas.delete("axes")
+        canvas.create_rectangle(left, top, width - right, height - bottom, outline="gray60", tags="axes")
+        for i in range(TICKS + 1):
+            fraction = i / TICKS
+            x = left + fraction * (width - left - right)
+            y = height - bottom - fraction * (height - top - bottom)
+            canvas.create_line(x, top, x, height - bottom, fill="gray90", tags="axes")
+            canvas.create_line(left, y, width - right, y, fill="gray90", tags="axes")
+            canvas.create_text(x, height - bottom + 2, anchor="n", font=("Arial", 8), tags="axes",
+                               text=f"{x_lo + fraction * (x_hi - x_lo):.4g}")
+            canvas.create_text(left - 3, y, anchor="e", font=("Arial", 8), tags="axes",
+                               text=f"{y_lo + fraction * (y_hi - y_lo):.4g}")
+        canvas.create_text(width - right, height - 1, anchor="se", font=("Arial", 8), text=self.x_label, tags="axes")
+        canvas.create_text(2, 2, anchor="nw", font=("Arial", 8), text=self.y_label, tags="axes")
+        legend_x = width - right - 4
+        for name, (_, _, item) in reversed(list(self.series.items())):
+            label = canvas.create_text(legend_x, 2, anchor="ne", font=("Arial", 8), text=name, tags="axes",
+                                       fill=canvas.itemcget(item, "fill"))
+            legend_x = canvas.bbox(label)[0] - 8
+        canvas.tag_lower("axes")
+
+    def show_cursor(self, event):
+        if self.transform is None:
+            return
+        x_lo, x_scale, y_hi, y_scale = self.transform
+        x = x_lo + (event.x - MARGIN[0]) / x_scale
+        y = y_hi - (event.y - MARGIN[1]) / y_scale
+        self.canvas.itemconfigure(self._readout, text=f"{x:.6g} {self.x_label}, {y:.4g} {self.y_label}")
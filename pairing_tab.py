@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import time
+from instrument_locks import get_lock_manager
+from ramp_profile import PAIR_ACTIVATE, PAIR_DEACTIVATE
+from ramp_scheduler import RampScheduler
+from ui_bus import UiEventBus
 
 
 class PairingTab:
@@ -9,6 +12,12 @@ class PairingTab:
         self.assignments = assignments
         self.pairings = []
         self.frame = ttk.Frame(parent)
+        self.scheduler = RampScheduler()
+        self.busy = False
+        self.ui = UiEventBus(self.frame)
+        self.ui.subscribe("result", lambda payload: self.show_result(*payload))
+        self.ui.subscribe("done", lambda payload: self.finish_ramps(*payload))
+        self.ui.start()
 
         self.gates = [a for a in assignments if a['role'].lower() == 'gate']
         self.drains = [a for a in assignments if a['role'].lower() == 'drain']
@@ -21,6 +30,10 @@ class PairingTab:
 
         ttk.Button(self.frame, text="Deactivate All Pairs", command=self.deactivate_all_pairs).grid(row=6, column=0, columnspan=2, pady=5)
 
+        self.status_label = ttk.Label(self.frame, text="", foreground="gray")
+        self.status_label.grid(row=7, column=0, columnspan=2, sticky="w", padx=10)
+        ttk.Button(self.frame, text="Lock Report", command=self.show_lock_report).grid(row=8, column=0, columnspan=2, pady=5)
+
         ttk.Label(self.frame, text="Gate Outputs").grid(row=0, column=0, padx=10, pady=5, sticky="w")
         self.gate_frame = ttk.Frame(self.frame)
         self.gate_frame.grid(row=1, column=0, padx=10, sticky="nw")
@@ -119,14 +132,21 @@ class PairingTab:
                 self.populate_checkboxes()
                 return
 
-    def ramp_voltage(self, psu, output, sequence):
-        for voltage, current, delay in sequence:
-            print(f"[DEBUG] Applying to {psu.name} output {output}: {voltage}V @ {current}A (delay {delay}s)")
-            psu.driver.apply_output(output, voltage, current)
-            time.sleep(delay)
+    def pair_text(self, gate, drain):
+        return f"{gate['psu']} {gate['output']} ⟶ {drain['psu']} {drain['output']}"
 
-    def activate_all_pairs(self):
-        for i, (gate, drain) in enumerate(self.pairings):
+    def set_pair_mark(self, key, mark):
+        gate, drain = key
+        text = self.pair_text(gate, drain)
+        for index, line in enumerate(self.pair_listbox.get(0, tk.END)):
+            if line.endswith(text) and line.startswith("["):
+                self.pair_listbox.delete(index)
+                self.pair_listbox.insert(index, f"[{mark}] {text}")
+                return
+
+    def build_jobs(self, activate):
+        jobs = []
+        for gate, drain in self.pairings:
             gate_key = f"{gate['psu']} {gate['output']}"
             drain_key = f"{drain['psu']} {drain['output']}"
 
@@ -134,56 +154,76 @@ class PairingTab:
             drain_settings = self.controller.output_settings.get(drain_key)
 
             if not gate_settings or not drain_settings:
-                error_msg = f"[X] Missing settings for {gate_key} or {drain_key}"
-                self.pair_listbox.insert(tk.END, error_msg)
+                self.pair_listbox.insert(tk.END, f"[X] Missing settings for {gate_key} or {drain_key}")
                 continue
 
             gate_psu = self.controller.psu_supplies[gate['psu']]
             drain_psu = self.controller.psu_supplies[drain['psu']]
-            gate_output = gate['output']
-            drain_output = drain['output']
-
-            try:
-                self.ramp_voltage(gate_psu, gate_output, [(-6.0, gate_settings['current'], 0.5)])
-                self.ramp_voltage(drain_psu, drain_output, [
-                    (0.0, drain_settings['current'], 0.5),
-                    (10.0, drain_settings['current'], 0.5),
-                    (drain_settings['voltage'], drain_settings['current'], 0.5)
-                ])
-                self.ramp_voltage(gate_psu, gate_output, [
-                    (-3.0, gate_settings['current'], 0.5),
-                    (gate_settings['voltage'], gate_settings['current'], 0.0)
-                ])
-
-                line = self.pair_listbox.get(i)
-                self.pair_listbox.delete(i)
-                self.pair_listbox.insert(i, line.replace("[ ]", "[✓]"))
-
-            except Exception as e:
-                self.pair_listbox.insert(tk.END, f"[X] Activation failed: {gate_key} -> {drain_key}: {str(e)}")
-
-    def deactivate_all_pairs(self):
-        for gate, drain in self.pairings:
-            gate_key = f"{gate['psu']} {gate['output']}"
-            drain_key = f"{drain['psu']} {drain['output']}"
+            gate_current = gate_settings['current']
+            drain_current = drain_settings['current']
+
+            # Safety ordering within a pair: gate pinched off before drain moves, drain down before gate releases
+            gate_v, drain_v = gate_settings['voltage'], drain_settings['voltage']
+            if activate:
+                stages = [
+                    (gate_psu, gate['output'], PAIR_ACTIVATE["gate_pinch"].bind(gate_v, gate_current)),
+                    (drain_psu, drain['output'], PAIR_ACTIVATE["drain_up"].bind(drain_v, drain_current)),
+                    (gate_psu, gate['output'], PAIR_ACTIVATE["gate_release"].bind(gate_v, gate_current)),
+                ]
+            else:
+                stages = [
+                    (gate_psu, gate['output'], PAIR_DEACTIVATE["gate_pinch"].bind(gate_v, gate_current)),
+                    (drain_psu, drain['output'], PAIR_DEACTIVATE["drain_down"].bind(drain_v, drain_current)),
+                ]
+            jobs.append({"key": (gate, drain), "stages": stages})
+        return jobs
+
+    def start_ramps(self, activate):
+        if self.busy:
+            return
+        jobs = self.build_jobs(activate)
+        if not jobs:
+            return
 
-            gate_settings = self.controller.output_settings.get(gate_key)
-            drain_settings = self.controller.output_settings.get(drain_key)
+        self.busy = True
+        self.activate_button.state(["disabled"])
+        for job in jobs:
+            self.set_pair_mark(job['key'], "~")
+
+        self.scheduler.start(
+            jobs,
+            on_result=lambda result: self.ui.post("result", (result, activate)),
+            on_done=lambda results, elapsed: self.ui.post("done", (results, elapsed)),
+        )
+
+    def show_result(self, result, activate):
+        gate, drain = result['key']
+        if result['ok']:
+            self.set_pair_mark(result['key'], "✓" if activate else " ")
+        else:
+            self.set_pair_mark(result['key'], "X")
+            action = "Activation" if activate else "Deactivation"
+            self.pair_listbox.insert(tk.END, f"[X] {action} failed: {gate['psu']} {gate['output']} -> {drain['psu']} {drain['output']}: {str(result['error'])}")
+
+    def finish_ramps(self, results, elapsed):
+        self.busy = False
+        self.activate_button.state(["!disabled"])
+        done = sum(1 for r in results if r['ok'])
+        text = f"{done}/{len(results)} pairs ramped in {elapsed:.2f} s"
+        # Busiest supply lock so far; the full table is under "Lock Report"
+        stats = get_lock_manager().stats()
+        if stats:
+            name, busiest = max(stats.items(), key=lambda item: item[1]["wait_total"])
+            if busiest["contended"]:
+                text += (f"; most contended: {name} ({busiest['contended']} waits, "
+                         f"max {busiest['wait_max'] * 1000:.1f} ms)")
+        self.status_label.config(text=text)
+
+    def show_lock_report(self):
+        messagebox.showinfo("Instrument Lock Report", get_lock_manager().report())
 
-            gate_psu = self.controller.psu_controllers[gate['psu']]
-            drain_psu = self.controller.psu_controllers[drain['psu']]
-            gate_output = gate['output']
-            drain_output = drain['output']
-
-            try:
-                self.ramp_voltage(gate_psu, gate_output, [
-                    (-3.0, gate_settings['current'], 0.5),
-                    (-6.0, gate_settings['current'], 0.5)
-                ])
-                self.ramp_voltage(drain_psu, drain_output, [
-                    (10.0, drain_settings['current'], 0.5),
-                    (0.0, drain_settings['current'], 0.0)
-                ])
-            except Exception as e:
-                self.pair_listbox.insert(tk.END, f"[X] Deactivation failed: {gate_key} -> {drain_key}: {str(e)}")
+    def activate_all_pairs(self):
+        self.start_ramps(activate=True)
 
+    def deactivate_all_pairs(self):
+        self.start_ramps(activate=False)
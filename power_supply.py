@@ -1,10 +1,21 @@
-import tkinter as tk
-from tkinter import ttk
-import pyvisa
+from visa_pool import get_pool
 
 class PowerSupply:
-    def __init__(self, name, address):
+    def __init__(self, name, address, idn=None):
         self.name = name
         self.address = address
+        self.idn = idn  # from discovery, so connecting does not have to ask again
         self.instrument = None
-        
\ No newline at end of file
+        self.driver = None
+
+    def connect(self, pool=None):
+        # Borrows the shared session; a second connect reuses the one already held
+        if self.instrument is None:
+            self.instrument = (pool or get_pool()).acquire(self.address)
+        return self.instrument
+
+    def disconnect(self, pool=None):
+        if self.instrument is not None:
+            (pool or get_pool()).release(self.address)
+        self.instrument = None
+        self.driver = None
@@ -1,19 +1,22 @@
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pyvisa
-from psu_driver import (
-    AgilentE3648ADriver,
-    KeysightU2044XADriver,
-    KeysightE36312ADriver,
-    KeysightE36232ADriver,
-    KeysightE36234ADriver,
-)
+from visa_pool import get_pool
+from psu_driver import driver_for_idn
+from telemetry import TelemetryPoller
+from setup_config import load_roles
+from live_plot import LivePlot
+from sequence_engine import bias_limits
+
+# Plot window label -> seconds of history (None: everything in the telemetry buffer)
+PLOT_WINDOWS = {"1 min": 60, "10 min": 600, "1 h": 3600, "All": None}
 
 class CombinedPowerSupplyTab:
     def __init__(self, master, power_supplies, controller):
         self.master = master
         self.power_supplies = power_supplies
         self.controller = controller
+        self.telemetry = TelemetryPoller(power_supplies)
         self.frame = ttk.Frame(master)
         self.canvas = tk.Canvas(self.frame)
         self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.canvas.yview)
@@ -29,6 +32,7 @@ class CombinedPowerSupplyTab:
         self.output_roles = {}
         self.output_voltages = {}
         self.output_currents = {}
+        self.readback_labels = {}
 
         row = 0
         for psu in self.power_supplies:
@@ -59,6 +63,10 @@ class CombinedPowerSupplyTab:
                 disable_btn = ttk.Button(self.scrollable_frame, text="Disable", command=lambda p=psu, ch=i+1: self.disable_output(p, ch))
                 disable_btn.grid(row=row, column=8)
 
+                readback = ttk.Label(self.scrollable_frame, text="— V / — mA", width=20, foreground="gray")
+                readback.grid(row=row, column=9, padx=5)
+                self.readback_labels[(psu.name, i+1)] = readback
+
                 self.output_roles[(psu.name, i+1)] = role
                 self.output_voltages[(psu.name, i+1)] = volt_entry
                 self.output_currents[(psu.name, i+1)] = curr_entry
@@ -74,30 +82,92 @@ class CombinedPowerSupplyTab:
         self.load_btn = ttk.Button(self.scrollable_frame, text="Load Defaults from File", command=self.load_defaults_from_file)
         self.load_btn.grid(row=row+1, column=0, columnspan=9, pady=5)
 
+        monitor_frame = ttk.Frame(self.scrollable_frame)
+        monitor_frame.grid(row=row+2, column=0, columnspan=9, pady=5)
+        self.monitor_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(monitor_frame, text="Live Readback", variable=self.monitor_var, command=self.toggle_monitor).pack(side='left')
+        ttk.Label(monitor_frame, text="Rate (Hz):").pack(side='left', padx=(10, 2))
+        self.monitor_rate_var = tk.StringVar(value=str(self.telemetry.rate_hz))
+        ttk.Entry(monitor_frame, textvariable=self.monitor_rate_var, width=5).pack(side='left')
+
+        plot_frame = ttk.LabelFrame(self.scrollable_frame, text="Live Plot")
+        plot_frame.grid(row=row+3, column=0, columnspan=10, sticky="ew", padx=5, pady=5)
+        plot_controls = ttk.Frame(plot_frame)
+        plot_controls.pack(fill='x')
+        ttk.Label(plot_controls, text="PSU:").pack(side='left', padx=(5, 2))
+        self.plot_psu_var = tk.StringVar(value="All")
+        ttk.Combobox(plot_controls, textvariable=self.plot_psu_var, state="readonly", width=8,
+                     values=["All"] + [psu.name for psu in self.power_supplies]).pack(side='left')
+        ttk.Label(plot_controls, text="Window:").pack(side='left', padx=(10, 2))
+        self.plot_window_var = tk.StringVar(value="10 min")
+        ttk.Combobox(plot_controls, textvariable=self.plot_window_var, state="readonly", width=8,
+                     values=list(PLOT_WINDOWS)).pack(side='left')
+        self.voltage_plot = LivePlot(plot_frame, width=700, height=160, x_label="s", y_label="V")
+        self.voltage_plot.canvas.pack(fill='x', padx=5, pady=2)
+        self.current_plot = LivePlot(plot_frame, width=700, height=160, x_label="s", y_label="mA")
+        self.current_plot.canvas.pack(fill='x', padx=5, pady=2)
+        self._plot_key = None
+
+    def toggle_monitor(self):
+        if self.monitor_var.get():
+            try:
+                self.telemetry.rate_hz = max(float(self.monitor_rate_var.get()), 0.1)
+            except ValueError:
+                messagebox.showerror("Readback Error", "Rate must be a number")
+                self.monitor_var.set(False)
+                return
+            self.telemetry.start()
+            self.refresh_readback()
+        else:
+            self.telemetry.stop()
+
+    def refresh_readback(self):
+        # Reads the telemetry ring buffers only; never touches the bus
+        if not self.monitor_var.get():
+            return
+        for (name, ch), label in self.readback_labels.items():
+            row = self.telemetry.latest(name)
+            if row is None or row[2 * ch - 1] != row[2 * ch - 1]:  # no sample yet / NaN
+                continue
+            label.config(text=f"{row[2 * ch - 1]:.3f} V / {row[2 * ch] * 1000:.1f} mA", foreground="black")
+        self.update_plots()
+        self.frame.after(200, self.refresh_readback)
+
+    def update_plots(self):
+        # Copies only the plotted window, and only while the plots are on screen and have new rows
+        if not self.voltage_plot.visible():
+            return
+        selected = self.plot_psu_var.get()
+        names = [psu.name for psu in self.power_supplies if selected in ("All", psu.name)]
+        window = PLOT_WINDOWS.get(self.plot_window_var.get())
+        key = (tuple(names), window, tuple(self.telemetry.buffers[name].total for name in names))
+        if key == self._plot_key:
+            return
+        self._plot_key = key
+
+        now = time.time()
+        shown = []
+        for name in names:
+            buffer = self.telemetry.buffers[name]
+            rows = buffer.tail(int(window * self.telemetry.rate_hz * 1.5) + 2 if window else buffer.capacity)
+            if not len(rows):
+                continue
+            seconds = rows[:, 0] - now
+            for ch in (1, 2):
+                label = f"{name} CH{ch}"
+                self.voltage_plot.set_series(label, seconds, rows[:, 2 * ch - 1])
+                self.current_plot.set_series(label, seconds, rows[:, 2 * ch] * 1000)
+                shown.append(label)
+        for plot in (self.voltage_plot, self.current_plot):
+            plot.retain(shown)
+            plot.set_x_range(-window if window else None, 0.0)
+
     def connect_psu(self, psu):
         try:
-            rm = pyvisa.ResourceManager()
-            psu.instrument = rm.open_resource(psu.address)
-            idn = psu.instrument.query("*IDN?")
-
-            driver_map = {
-                "E36484": AgilentE3648ADriver,
-                "E3648A": AgilentE3648ADriver,
-                "U2044XA": KeysightU2044XADriver,
-                "E36312A": KeysightE36312ADriver,
-                "E36232A": KeysightE36232ADriver,
-                "E36234A": KeysightE36234ADriver,
-            }
-
-            matched_driver = None
-            for model, driver_cls in driver_map.items():
-                if model in idn:
-                    matched_driver = driver_cls
-                    break
-
-            if not matched_driver:
-                raise Exception(f"Unknown PSU model in IDN string: {idn}")
+            psu.connect()
+            idn = psu.idn or get_pool().idn(psu.address)
 
+            matched_driver = driver_for_idn(idn)
             psu.driver = matched_driver(psu.instrument)
             messagebox.showinfo("Connected", f"{psu.name} connected and driver {matched_driver.__name__} assigned.")
 
@@ -112,11 +182,13 @@ class CombinedPowerSupplyTab:
             c_mA = float(c_raw)
             c = c_mA / 1000
 
-            if not hasattr(psu, 'driver'):
+            if psu.driver is None:
                 raise Exception(f"No driver assigned to {psu.name}")
 
-            psu.driver.set_voltage(channel, v)
-            psu.driver.set_current(channel, c)
+            # Held across both writes so a ramp or poll cannot re-select the channel in between
+            with psu.driver.lock:
+                psu.driver.set_voltage(channel, v)
+                psu.driver.set_current(channel, c)
 
             key = f"{psu.name} Output{channel}"
             self.controller.output_settings[key] = {
@@ -129,21 +201,12 @@ class CombinedPowerSupplyTab:
         except Exception as e:
             messagebox.showerror("Set Error", str(e))
 
-    def  (self, psu, channel):
+    def enable_output(self, psu, channel):
         try:
-            if not hasattr(psu, 'driver'):
+            if psu.driver is None:
                 raise Exception(f"No driver assigned to {psu.name}")
 
-            voltage = float(voltage_entry.get())
-            milliamps = float(current_entry.get())
-            current = milliamps / 1000.0  # Convert mA to A
-            key = f"{psu_name} {output_name}"
-
-            self.output_settings[key] = {"voltage": voltage, "current": current}
-            print(f"[{key}] V={voltage}V, I={current}A (from {milliamps}mA)")
-
-            self.psu_supplies[psu_name].set_voltage(output_name, voltage)
-            self.psu_supplies[psu_name].set_current(output_name, current)
+            psu.driver.enable_output(channel)
             messagebox.showinfo("Output Enabled", f"{psu.name} Output {channel} is now ON")
 
         except Exception as e:
@@ -151,7 +214,7 @@ class CombinedPowerSupplyTab:
 
     def disable_output(self, psu, channel):
         try:
-            if not hasattr(psu, 'driver'):
+            if psu.driver is None:
                 raise Exception(f"No driver assigned to {psu.name}")
 
             psu.driver.disable_output(channel)
@@ -170,6 +233,10 @@ class CombinedPowerSupplyTab:
                     print(f"Failed to apply settings for {psu.name} Output {i+1}: {e}")
 
 
+    def snapshot(self):
+        # (volts, mA) text of every output entry, read on the Tk thread for the sequencer
+        return {key: (entry.get(), self.output_currents[key].get()) for key, entry in self.output_voltages.items()}
+
     def apply_bias_settings(self, cfg):
 
         try:
@@ -177,7 +244,7 @@ class CombinedPowerSupplyTab:
                 for output in psu.outputs:
                     if output.role == 'Gate':
                         voltage = cfg.get("VGDRV", 0)
-                        current = cfg.get("IDDRV", 0)
+                        current = bias_limits(cfg)[0]
                     elif output.role == 'Drain':
                         voltage = cfg.get("VDDRV", 0)
                         current = cfg.get("IDDRV", 0)
@@ -192,15 +259,9 @@ class CombinedPowerSupplyTab:
         if not filepath:
             return
         try:
-            with open(filepath, "r") as f:
-                lines = f.readlines()
-            for line in lines:
-                parts = line.strip().split("_")
-                if len(parts) == 3:
-                    psu, output, role = parts
-                    output_num = 1 if output.lower() == "output1" else 2
-                    key = (psu, output_num)
-                    if key in self.output_roles:
-                        self.output_roles[key].set(role)
+            for entry in load_roles(filepath):
+                key = (entry['psu'], int(entry['output'][-1]))
+                if key in self.output_roles:
+                    self.output_roles[key].set(entry['role'])
         except Exception as e:
             messagebox.showerror("File Error", str(e))
@@ -1,117 +1,243 @@
+import re
+import functools
+from instrument_locks import get_lock_manager
+from scpi_cache import ScpiWriteCache, join_scpi
+
+
 class BasePSUDriver:
+    select_command = None  # e.g. "INST:SEL OUT{ch}"; None for single-output supplies
+    voltage_command = "VOLT {}"
+    current_command = "CURR {}"
+    output_on_command = "OUTP ON"
+    output_off_command = "OUTP OFF"
+    ovp_commands = ("VOLT:PROT {}", "VOLT:PROT:STAT ON")
+    ocp_commands = ("CURR:PROT:STAT ON",)  # OCP trips when the output reaches its current limit
+    clear_protection_command = "OUTP:PROT:CLE"
+    channels = (1, 2)
+    channel_list = False  # True if MEAS/OUTP accept a (@1,2) channel list
+    list_ramp = False  # True if the supply runs LIST voltage sequences (with VOLT:SLEW) itself
+
     def __init__(self, instrument):
         self.instrument = instrument
+        self.cache = ScpiWriteCache()
+        # Shared by everything that talks to this session; keeps select-then-write/query sequences together
+        self.lock = get_lock_manager().lock_for(instrument)
+        self.inhibited = False  # set by the abort path; only output-off commands get through
 
     def select_channel(self, ch):
-        pass
+        self.write_settings(ch, [])
 
     def set_voltage(self, ch, voltage):
-        pass
+        self.write_settings(ch, [("VOLT", voltage, self.voltage_command)])
 
     def set_current(self, ch, current):
-        pass
+        if self.current_command:
+            self.write_settings(ch, [("CURR", current, self.current_command)])
 
     def enable_output(self, ch):
-        pass
+        self.write_settings(ch, [(None, True, self.output_on_command)])
 
     def disable_output(self, ch):
-        pass
+        self.write_settings(ch, [(None, False, self.output_off_command)])
 
     def apply_output(self, ch, voltage, current):
-        self.set_voltage(ch, voltage)
-        self.set_current(ch, current)
-        self.enable_output(ch)
+        settings = [("VOLT", voltage, self.voltage_command)]
+        if self.current_command:
+            settings.append(("CURR", current, self.current_command))
+        settings.append((None, True, self.output_on_command))
+        self.write_settings(ch, settings)
+
+    def set_ovp(self, ch, voltage):
+        if not self.ovp_commands:
+            raise Exception(f"{type(self).__name__} has no hardware over-voltage protection")
+        settings = [("VOLT:PROT", voltage, self.ovp_commands[0])]
+        settings.extend((None, None, command) for command in self.ovp_commands[1:])
+        self.write_settings(ch, settings)
+
+    def set_ocp(self, ch, current):
+        # The current limit becomes the OCP threshold
+        if not self.ocp_commands or not self.current_command:
+            raise Exception(f"{type(self).__name__} has no hardware over-current protection")
+        settings = [("CURR", current, self.current_command)]
+        settings.extend((None, None, command) for command in self.ocp_commands)
+        self.write_settings(ch, settings)
+
+    def clear_protection(self, ch):
+        self.write_settings(ch, [(None, None, self.clear_protection_command)])
+
+    def start_list(self, ch, voltages, dwells, current, slew=None):
+        # Loads a voltage list on one channel and runs it from a single *TRG, all in one message.
+        # The output holds the last point when the list ends; call finish_list() afterwards.
+        if not self.list_ramp:
+            raise Exception(f"{type(self).__name__} does not support list ramps")
+        chan = f"(@{ch})"
+        commands = [
+            f"VOLT:SLEW {slew if slew else 'MAX'},{chan}",
+            f"LIST:VOLT {','.join(f'{v:g}' for v in voltages)},{chan}",
+            f"LIST:CURR {current:g},{chan}",
+            f"LIST:DWEL {','.join(f'{d:g}' for d in dwells)},{chan}",
+            f"LIST:COUN 1,{chan}",
+            f"LIST:STEP AUTO,{chan}",
+            f"LIST:TERM:LAST ON,{chan}",
+            f"VOLT:MODE LIST,{chan}",
+            f"CURR:MODE LIST,{chan}",
+            f"TRIG:TRAN:SOUR BUS,{chan}",
+            f"INIT:TRAN {chan}",
+        ]
+        settings = [(None, None, command) for command in commands]
+        settings += [(None, True, self.output_on_command), (None, None, "*TRG")]
+        self.write_settings(ch, settings)
+
+    def finish_list(self, ch, voltage, current):
+        # Back to fixed mode at the list's last level; VOLT must go out before FIX or the output
+        # would return to the level it had before the list
+        chan = f"(@{ch})"
+        with self.lock:
+            self.cache.forget(ch, "VOLT")
+            self.cache.forget(ch, "CURR")
+            self.write_settings(ch, [
+                ("VOLT", voltage, self.voltage_command),
+                ("CURR", current, self.current_command),
+                (None, None, f"VOLT:MODE FIX,{chan}"),
+                (None, None, f"CURR:MODE FIX,{chan}"),
+            ])
+
+    def abort_list(self, ch):
+        # Stops a running list; allowed while inhibited, like output-off
+        chan = f"(@{ch})"
+        with self.lock.urgent():
+            self.instrument.write(join_scpi([f"ABOR:TRAN {chan}", f"VOLT:MODE FIX,{chan}", f"CURR:MODE FIX,{chan}"]))
+            self.cache.forget(ch, "VOLT")
+            self.cache.forget(ch, "CURR")
+
+    def output_off_message(self, channels):
+        # Single message that turns every given channel off; prebuilt by the abort path
+        if self.channel_list:
+            return f"{self.output_off_command},(@{','.join(str(ch) for ch in channels)})"
+        commands = []
+        for ch in channels:
+            if self.select_command:
+                commands.append(self.select_command.format(ch=ch))
+            commands.append(self.output_off_command)
+        return join_scpi(commands)
+
+    def reset(self):
+        with self.lock:
+            self.instrument.write("*RST")
+            self.cache.invalidate()
+
+    def measure_all(self):
+        # Voltage and current of every channel in a single query: {ch: (volts, amps)}
+        with self.lock:
+            if self.channel_list:
+                chans = ",".join(str(ch) for ch in self.channels)
+                response = self.instrument.query(join_scpi([f"MEAS:VOLT? (@{chans})", f"MEAS:CURR? (@{chans})"]))
+                volts, currents = (part.split(",") for part in response.strip().split(";"))
+                values = list(zip(volts, currents))
+            else:
+                commands = []
+                for ch in self.channels:
+                    if self.select_command:
+                        commands.append(self.select_command.format(ch=ch))
+                    commands.extend(["MEAS:VOLT?", "MEAS:CURR?"])
+                response = self.instrument.query(join_scpi(commands)).strip().split(";")
+                values = list(zip(response[0::2], response[1::2]))
+                if self.select_command:
+                    self.cache.selected = self.channels[-1]
+            self.cache.stats["transactions"] += 1
+        return {ch: (float(v), float(i)) for ch, (v, i) in zip(self.channels, values)}
+
+    def measure(self, ch):
+        return self.measure_all()[ch]
+
+    def write_settings(self, ch, settings):
+        # settings: [(key, value, command template)]; unchanged values are dropped, the rest
+        # go out as one ";:"-joined message behind a single channel select. Output state can
+        # change behind our back (protection trips, front panel), so key None is always sent.
+        with self.lock:
+            self._write_settings(ch, settings)
+
+    def _write_settings(self, ch, settings):
+        if self.inhibited and any(command != self.output_off_command for _, _, command in settings):
+            raise Exception("Outputs inhibited by abort; clear the abort first")
+        select = self.select_command.format(ch=ch) if self.select_command else None
+        pending = [(key, value, command.format(value)) for key, value, command in settings
+                   if key is None or not self.cache.is_current(ch, key, value)]
+
+        commands = [command for _, _, command in pending]
+        if select and self.cache.selected != ch and (commands or not settings):
+            commands.insert(0, select)
+
+        baseline = []
+        for _, value, command in settings:
+            baseline.extend([select, command.format(value)] if select else [command.format(value)])
+        if select and not settings:
+            baseline.append(select)
+        sent = [join_scpi(commands)] if commands else []
+
+        if sent:
+            try:
+                self.instrument.write(sent[0])
+            except Exception:
+                self.cache.invalidate()
+                raise
+
+        if select:
+            self.cache.selected = ch
+        for key, value, _ in pending:
+            if key is not None:
+                self.cache.store(ch, key, value)
+        self.cache.account(baseline, sent, dropped=len(settings) - len(pending))
 
 
 class AgilentE3648ADriver(BasePSUDriver):
-    def select_channel(self, ch):
-        self.instrument.write(f"INST:SEL OUT{ch}")
-
-    def set_voltage(self, ch, voltage):
-        self.select_channel(ch)
-        self.instrument.write(f"VOLT {voltage}")
-
-    def set_current(self, ch, current):
-        self.select_channel(ch)
-        self.instrument.write(f"CURR {current}")
-
-    def enable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP ON")
-
-    def disable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP OFF")
+    select_command = "INST:SEL OUT{ch}"
+    ocp_commands = None
 
 
 class KeysightU2044XADriver(BasePSUDriver):
-    def select_channel(self, ch):
-        pass
-
-    def set_voltage(self, ch, voltage):
-        self.instrument.write(f"SOUR:VOLT {voltage}")
-
-    def set_current(self, ch, current):
-        self.instrument.write(f"SOUR:CURR {current}")
-
-    def enable_output(self, ch):
-        self.instrument.write("OUTP ON")
-
-    def disable_output(self, ch):
-        self.instrument.write("OUTP OFF")
+    channels = (1,)
+    voltage_command = "SOUR:VOLT {}"
+    current_command = "SOUR:CURR {}"
 
 
 class KeysightE36312ADriver(BasePSUDriver):
-    def select_channel(self, ch):
-        self.instrument.write(f"INST:SEL CH{ch}")
-
-    def set_voltage(self, ch, voltage):
-        self.select_channel(ch)
-        self.instrument.write(f"VOLT {voltage}")
-
-    def set_current(self, ch, current):
-        self.select_channel(ch)
-        self.instrument.write(f"CURR {current}")
-
-    def enable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP ON")
-
-    def disable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP OFF")
+    select_command = "INST:SEL CH{ch}"
+    channel_list = True
+    list_ramp = True
 
 
 class KeysightE36232ADriver(BasePSUDriver):
-    def set_voltage(self, ch, voltage):
-        self.instrument.write(f"APPL {voltage}, 0")  # default current to 0
+    voltage_command = "APPL {}, 0"  # default current to 0
+    current_command = None  # No separate current set supported by this command?
+    output_on_command = "OUTP 1"
+    output_off_command = "OUTP 0"
+    channels = (1,)
 
-    def set_current(self, ch, current):
-        pass  # No separate current set supported by this command?
 
-    def enable_output(self, ch):
-        self.instrument.write("OUTP 1")
-
-    def disable_output(self, ch):
-        self.instrument.write("OUTP 0")
+class KeysightE36234ADriver(BasePSUDriver):
+    select_command = "INST:SEL CH{ch}"
+    channel_list = True
+    list_ramp = True
 
 
-class KeysightE36234ADriver(BasePSUDriver):
-    def select_channel(self, ch):
-        self.instrument.write(f"INST:SEL CH{ch}")
+DRIVER_MAP = {
+    "E36484": AgilentE3648ADriver,
+    "E3648A": AgilentE3648ADriver,
+    "U2044XA": KeysightU2044XADriver,
+    "E36312A": KeysightE36312ADriver,
+    "E36232A": KeysightE36232ADriver,
+    "E36234A": KeysightE36234ADriver,
+}
 
-    def set_voltage(self, ch, voltage):
-        self.select_channel(ch)
-        self.instrument.write(f"VOLT {voltage}")
 
-    def set_current(self, ch, current):
-        self.select_channel(ch)
-        self.instrument.write(f"CURR {current}")
+# One regex over every model, longest first so a model is never shadowed by a shorter one it contains
+MODEL_PATTERN = re.compile("|".join(re.escape(model) for model in sorted(DRIVER_MAP, key=len, reverse=True)))
 
-    def enable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP ON")
 
-    def disable_output(self, ch):
-        self.select_channel(ch)
-        self.instrument.write("OUTP OFF")
+@functools.lru_cache(maxsize=64)
+def driver_for_idn(idn):
+    match = MODEL_PATTERN.search(idn)
+    if match is None:
+        raise Exception(f"Unknown PSU model in IDN string: {idn}")
+    return DRIVER_MAP[match.group(0)]
@@ -0,0 +1,98 @@
+import math
+from collections import namedtuple
+
+# Declarative ramps. A profile is a list of segments, each moving the output to `target`
+# (volts, or SETPOINT for the output's configured voltage) either in one step, in `steps` equal
+# steps, or at `slew` V/s, then holding it for `dwell` seconds (per step when steps > 1).
+# Profiles compile to host-timed (V, I, dwell) steps for RampScheduler, or to one LIST program
+# on supplies that run voltage lists themselves (driver.list_ramp).
+
+SETPOINT = "setpoint"
+HOST_STEP_S = 0.05  # host-timed slew resolution
+MIN_LIST_DWELL = 0.001
+
+RampSegment = namedtuple("RampSegment", "target slew steps dwell", defaults=(None, 1, 0.0))
+
+
+class RampProfile:
+    def __init__(self, segments):
+        self.segments = list(segments)
+
+    def bind(self, setpoint, current):
+        return BoundRamp(self, setpoint, current)
+
+
+class BoundRamp:
+    # A profile with the output's setpoint and current limit filled in; what a ramp stage carries
+    def __init__(self, profile, setpoint, current):
+        self.profile = profile
+        self.setpoint = setpoint
+        self.current = current
+
+    def target(self, segment):
+        return self.setpoint if segment.target == SETPOINT else segment.target
+
+    def host_steps(self, start):
+        # [(V, I, dwell)]; start is the output's present voltage, None if unknown (no interpolation)
+        steps = []
+        for segment in self.profile.segments:
+            target = self.target(segment)
+            if start is not None and segment.slew:
+                duration = abs(target - start) / segment.slew
+                count = max(1, math.ceil(duration / HOST_STEP_S))
+                steps.extend((start + (target - start) * i / count, self.current, duration / count)
+                             for i in range(1, count + 1))
+                steps[-1] = (target, self.current, steps[-1][2] + segment.dwell)
+            elif start is not None and segment.steps > 1:
+                steps.extend((start + (target - start) * i / segment.steps, self.current, segment.dwell)
+                             for i in range(1, segment.steps + 1))
+            else:
+                steps.append((target, self.current, segment.dwell))
+            start = target
+        return steps
+
+    def list_program(self, start):
+        # One LIST run with a single slew rate; None if segments ask for different slew rates
+        slews = {segment.slew for segment in self.profile.segments if segment.slew}
+        if len(slews) > 1:
+            return None
+        slew = slews.pop() if slews else None
+        voltages, dwells = [], []
+        level = 0.0 if start is None else start  # only used to time slewed segments
+        for segment in self.profile.segments:
+            target = self.target(segment)
+            if slew and segment.slew:
+                voltages.append(target)
+                dwells.append(abs(target - level) / slew + segment.dwell)
+            elif segment.steps > 1:
+                voltages.extend(level + (target - level) * i / segment.steps for i in range(1, segment.steps + 1))
+                dwells.extend([segment.dwell] * segment.steps)
+            else:
+                voltages.append(target)
+                dwells.append(segment.dwell)
+            level = target
+        dwells = [max(dwell, MIN_LIST_DWELL) for dwell in dwells]
+        return {"voltages": voltages, "dwells": dwells, "slew": slew, "current": self.current,
+                "duration": sum(dwells)}
+
+    def compile(self, driver, ch, use_list=True):
+        # ("list", program) when the supply can run it, else ("host", steps)
+        start = driver.cache.setpoints.get((ch, "VOLT"))
+        if use_list and driver.list_ramp:
+            program = self.list_program(start)
+            if program is not None:
+                return "list", program
+        return "host", self.host_steps(start)
+
+
+# Pair bring-up: gate pinched off before the drain moves, drain down before the gate releases
+PAIR_ACTIVATE = {
+    "gate_pinch": RampProfile([RampSegment(-6.0, dwell=0.5)]),
+    "drain_up": RampProfile([RampSegment(0.0, dwell=0.5), RampSegment(10.0, dwell=0.5), RampSegment(SETPOINT, dwell=0.5)]),
+    "gate_release": RampProfile([RampSegment(-3.0, dwell=0.5), RampSegment(SETPOINT)]),
+}
+
+PAIR_DEACTIVATE = {
+    "gate_pinch": RampProfile([RampSegment(-3.0, dwell=0.5), RampSegment(-6.0, dwell=0.5)]),
+    "drain_down": RampProfile([RampSegment(10.0, dwell=0.5), RampSegment(0.0)]),
+}
@@ -0,0 +1,91 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def output_channel(output):
+    # 'Output1' -> 1, 'Output 2' -> 2, 1 -> 1
+    if isinstance(output, int):
+        return output
+    return int(str(output).strip()[-1])
+
+
+class RampScheduler:
+    # Runs each pair's ramp stages in order, with different pairs running side by side.
+    # Access to a PSU shared by several pairs is serialized per apply (the driver's instrument
+    # lock), not per pair.
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.stop_event = threading.Event()
+
+    def ramp(self, psu, output, sequence):
+        # sequence: [(V, I, dwell)] host-timed steps, or a BoundRamp (ramp_profile.py)
+        if psu.driver is None:
+            raise Exception(f"No driver assigned to {psu.name}")
+        ch = output_channel(output)
+        if hasattr(sequence, "compile"):
+            mode, sequence = sequence.compile(psu.driver, ch)
+            if mode == "list":
+                self.run_list(psu, ch, sequence)
+                return
+        for voltage, current, delay in sequence:
+            if self.stop_event.is_set():
+                raise Exception("Ramp stopped")
+            psu.driver.apply_output(ch, voltage, current)
+            if delay:
+                self.stop_event.wait(delay)
+
+    def run_list(self, psu, ch, program):
+        # The supply times the steps itself; the host only waits out the program
+        psu.driver.start_list(ch, program['voltages'], program['dwells'], program['current'], program['slew'])
+        self.stop_event.wait(program['duration'])
+        if self.stop_event.is_set():
+            # The job's error says whether the supply is still stepping on its own
+            try:
+                psu.driver.abort_list(ch)
+            except Exception as e:
+                raise Exception(f"Ramp stopped, but {psu.name} CH{ch} may still be running its list: {e}") from e
+            raise Exception("Ramp stopped")
+        psu.driver.finish_list(ch, program['voltages'][-1], program['current'])
+
+    def run_job(self, job):
+        # job: {'key': ..., 'stages': [(psu, output, [(V, I, dwell), ...]), ...]}
+        start = time.perf_counter()
+        try:
+            for psu, output, sequence in job['stages']:
+                self.ramp(psu, output, sequence)
+            return {"key": job['key'], "ok": True, "error": None, "elapsed": time.perf_counter() - start}
+        except Exception as e:
+            return {"key": job['key'], "ok": False, "error": e, "elapsed": time.perf_counter() - start}
+
+    def run(self, jobs, on_result=None):
+        start = time.perf_counter()
+        results = []
+        if not jobs:
+            return results, 0.0
+
+        workers = min(self.max_workers, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ramp") as pool:
+            futures = [pool.submit(self.run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+        return results, time.perf_counter() - start
+
+    def start(self, jobs, on_result=None, on_done=None):
+        self.stop_event.clear()
+
+        def run():
+            results, elapsed = self.run(jobs, on_result)
+            if on_done:
+                on_done(results, elapsed)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,431 @@
+import itertools
+import json
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+from arb_transfer import ArbUploader
+from scpi_cache import shadow_for
+from result_store import read_run
+from setup_config import apply_overrides, SetupError
+from trace_analysis import analyze_run
+
+# Test recipes. A recipe is JSON:
+#
+#   {"name": "bias+arb",
+#    "recipes": {"rf_point": [{"do": "rf_on"}, {"do": "sweep"}, {"do": "rf_off"}]},
+#    "steps": [
+#      {"parallel": [[{"do": "bias_on", "timeout": 30}], [{"do": "arb_upload", "args": {"file": "burst.wfm"}}]]},
+#      "claim_analyzer",
+#      {"for": "LOSWPPWR", "values": [-20, -10, 0], "steps": [{"call": "rf_point"}]},
+#      {"do": "log"},
+#      "release_analyzer"],
+#    "finally": ["rf_off", "bias_off"]}
+#
+# Steps run in order unless grouped under "parallel". "repeat": N and "for": KEY / "values" unroll
+# their steps ("for" overrides that setup key in each pass), "call" inlines a named sub-recipe
+# ("with" overrides setup keys inside it). A step may set "id", "timeout" (s), "settle" (a Step
+# Delays name or seconds), "args" and "uses" (instruments it needs). "finally" steps run after
+# the main steps whether they completed, stopped or failed, unless an abort already made the
+# bench safe.
+#
+# compile_recipe turns this into a dependency graph. RecipeExecutor starts each node as soon as
+# its dependencies are done and none of the instruments it uses is busy, so setup on different
+# instruments overlaps while commands to one instrument never interleave.
+
+STEP_NAMES = ["Bias ON", "RF ON", "Sweep", "Log", "RF OFF", "Bias OFF"]
+LIMIT_KEYS = ("OVPDRV", "OCPDRV")  # programmed once per run, so no step may override them
+RESOURCES = ("psu", "siggen", "specan")
+MAX_UNROLLED = 10_000
+
+# run(engine, node, cfg); uses: instruments held while it runs; settle: default Step Delays entry;
+# wait_on: instruments whose completion ends the settle wait (none: the settle is a plain sleep),
+# or a callable(engine, node, cfg, budget) that does the waiting; status: status-bar text
+Action = namedtuple("Action", "run uses settle wait_on status quiet", defaults=((), None, (), None, False))
+
+
+class RecipeError(Exception):
+    pass
+
+
+class Node:
+    def __init__(self, node_id, action, args, deps, uses, timeout=None, settle=None, overrides=None):
+        self.id = node_id
+        self.action = action
+        self.args = args
+        self.deps = deps  # ids of nodes that must finish first
+        self.uses = uses  # frozenset of RESOURCES
+        self.timeout = timeout
+        self.settle = settle
+        self.overrides = overrides or {}
+
+    def __repr__(self):
+        return f"Node({self.id!r}, {self.action!r}, after={sorted(self.deps)})"
+
+
+class Recipe:
+    def __init__(self, name, nodes, final):
+        self.name = name
+        self.nodes = nodes  # [Node] in topological order
+        self.final = final
+
+    def check(self, cfg):
+        # Each for/with override set merged into the run's setup must pass the same checks as
+        # the setup file (VDDRV below OVPDRV, sweep range); compile time only saw them alone
+        problems, seen = [], set()
+        for node in self.nodes + self.final:
+            key = tuple(sorted(node.overrides.items()))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            for name in LIMIT_KEYS:
+                if name in node.overrides and node.overrides[name] != cfg.get(name):
+                    problems.append(f"{node.id}: {name} is programmed once per run and cannot be overridden")
+            try:
+                apply_overrides(cfg, node.overrides, node.id)
+            except SetupError as e:
+                problems.extend(f"{node.id}: {message}" for _, _, message in e.problems)
+        if problems:
+            raise RecipeError("; ".join(problems))
+
+    def describe(self):
+        lines = [f"Recipe {self.name}: {len(self.nodes)} steps" + (f" + {len(self.final)} cleanup" if self.final else "")]
+        for node in self.nodes + self.final:
+            after = f"  after {', '.join(sorted(node.deps))}" if node.deps else ""
+            lines.append(f"  {node.id} [{node.action}]{after}")
+        return "\n".join(lines)
+
+
+# --- actions -------------------------------------------------------------------------------
+
+_uploaders = weakref.WeakKeyDictionary()  # siggen -> ArbUploader, so catalogs survive between runs
+
+
+def _sweep(engine, node, cfg):
+    engine.bench.start_sweep()
+    if cfg:
+        engine.run_sweep(cfg, node.id)
+    else:
+        engine.wait_step(node.id, [engine.bench.specan], engine.delays.get("Sweep", 1.0))
+
+
+def _log(engine, node, cfg):
+    bench = engine.bench
+    if not engine.store.rows and bench.trace_reader is not None:
+        freqs, levels = bench.trace_reader.acquire()
+        engine.record_point({"freqs": freqs, "levels": levels})
+    engine.store.flush()
+    engine.log(f"   {engine.store.rows} records in {engine.store.path}")
+
+
+def _analyze(engine, node, cfg):
+    # Host-side measurements over every trace logged so far; per-point results go to analysis.json
+    engine.store.flush()
+    start = time.perf_counter()
+    points, summary = analyze_run(read_run(engine.store.path), **node.args)
+    with open(os.path.join(engine.store.path, "analysis.json"), "w") as f:
+        json.dump({"summary": summary, "points": {name: values.tolist() for name, values in points.items()}}, f)
+    engine.analysis = summary
+    engine.log(f"   Analyzed {summary['traces']} traces in {(time.perf_counter() - start) * 1000:.1f} ms: "
+               + ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in summary.items() if key != "traces"))
+
+
+def _wait(engine, node, cfg):
+    end = time.perf_counter() + float(node.args.get("seconds", 0))
+    while engine.running and time.perf_counter() < end:
+        time.sleep(min(0.05, max(end - time.perf_counter(), 0)))
+
+
+def _arb_upload(engine, node, cfg):
+    siggen = engine.bench.siggen
+    uploader = _uploaders.get(siggen)
+    if uploader is None:
+        uploader = _uploaders[siggen] = ArbUploader(siggen)
+    result = uploader.upload(node.args["file"])
+    note = f"{result['bytes'] / 1e6:.1f} MB in {result['elapsed']:.2f} s" if result['uploaded'] else "already on instrument"
+    engine.log(f"   ARB {result['name']}: {note}")
+    shadow_for(siggen).apply(siggen, [("SOUR:ARB:WAV", f"'{result['name']}'"), ("FUNC", "ARB")])
+
+
+def _scpi(engine, node, cfg):
+    instrument = getattr(engine.bench, node.args["instrument"])
+    settings = list(node.args.get("settings", {}).items())
+    shadow_for(instrument).apply(instrument, settings, node.args.get("commands", []))
+
+
+ACTIONS = {
+    "bias_on": Action(lambda engine, node, cfg: engine.bias_on(cfg), ("psu",), "Bias ON",
+                      lambda engine, node, cfg, budget: engine.wait_bias(node.id, cfg, budget), "Biasing..."),
+    "rf_on": Action(lambda engine, node, cfg: engine.bench.rf_on(cfg), ("siggen",), "RF ON", ("siggen",), "Enabling RF..."),
+    "sweep": Action(_sweep, ("siggen", "specan"), None, (), "Triggering Sweep..."),
+    "log": Action(_log, ("specan",), "Log", (), "Logging..."),
+    "rf_off": Action(lambda engine, node, cfg: engine.bench.rf_off(cfg), ("siggen",), "RF OFF", ("siggen",), "Disabling RF..."),
+    "bias_off": Action(lambda engine, node, cfg: engine.bench.bias_off(cfg), ("psu",), "Bias OFF", ("psu",), "Powering Down..."),
+    "arb_upload": Action(_arb_upload, ("siggen",), None, (), "Uploading ARB..."),
+    "scpi": Action(_scpi),
+    "analyze": Action(_analyze, status="Analyzing..."),
+    "wait": Action(_wait),
+    "claim_analyzer": Action(lambda engine, node, cfg: engine.claim_analyzer(), quiet=True),
+    "release_analyzer": Action(lambda engine, node, cfg: engine.release_analyzer(), quiet=True),
+}
+
+DEFAULT_RECIPE = {
+    "name": "default",
+    "steps": [
+        {"do": "bias_on", "id": "Bias ON"},
+        "claim_analyzer",
+        {"do": "rf_on", "id": "RF ON"},
+        {"do": "sweep", "id": "Sweep"},
+        {"do": "log", "id": "Log"},
+        {"do": "rf_off", "id": "RF OFF"},
+        "release_analyzer",
+        {"do": "bias_off", "id": "Bias OFF"},
+    ],
+}
+
+
+# --- compiler ------------------------------------------------------------------------------
+
+class _Compiler:
+    def __init__(self, spec):
+        self.recipes = spec.get("recipes", {})
+        self.nodes = []
+        self.ids = set()
+
+    def sequence(self, steps, deps, where, prefix, overrides, stack):
+        if not isinstance(steps, list):
+            raise RecipeError(f"{where}: expected a list of steps")
+        for i, step in enumerate(steps):
+            deps = self.step(step, deps, f"{where}[{i}]", prefix, overrides, stack)
+        return deps
+
+    def step(self, step, deps, where, prefix, overrides, stack):
+        if isinstance(step, str):
+            step = {"do": step}
+        if not isinstance(step, dict):
+            raise RecipeError(f"{where}: expected a step object or action name, got {step!r}")
+
+        if "parallel" in step:
+            exits = set()
+            for i, branch in enumerate(step["parallel"]):
+                branch = branch if isinstance(branch, list) else [branch]
+                exits |= self.sequence(branch, deps, f"{where}.parallel[{i}]", prefix, overrides, stack)
+            return exits or deps
+
+        if "repeat" in step:
+            count = step["repeat"]
+            if not isinstance(count, int) or count < 1:
+                raise RecipeError(f"{where}: repeat must be a positive integer")
+            for i in range(count):
+                deps = self.sequence(step.get("steps", []), deps, f"{where}.steps", prefix + [f"{i + 1}"],
+                                     overrides, stack)
+            return deps
+
+        if "for" in step:
+            key = str(step["for"]).upper()
+            values = step.get("values")
+            if not isinstance(values, list) or not values:
+                raise RecipeError(f"{where}: 'for' needs a non-empty 'values' list")
+            for value in values:
+                scoped = self.overrides(overrides, {key: value}, where)
+                deps = self.sequence(step.get("steps", []), deps, f"{where}.steps",
+                                     prefix + [f"{key}={scoped[key]:g}"], scoped, stack)
+            return deps
+
+        if "call" in step:
+            name = step["call"]
+            if name not in self.recipes:
+                raise RecipeError(f"{where}: unknown sub-recipe {name!r}")
+            if name in stack:
+                raise RecipeError(f"{where}: sub-recipe cycle {' -> '.join(stack + [name])}")
+            scoped = self.overrides(overrides, step.get("with") or {}, where)
+            return self.sequence(self.recipes[name], deps, f"recipes.{name}", prefix + [step.get("id", name)],
+                                 scoped, stack + [name])
+
+        if "do" in step:
+            return {self.node(step, deps, where, prefix, overrides)}
+
+        raise RecipeError(f"{where}: step needs one of do, parallel, repeat, for, call")
+
+    def overrides(self, current, extra, where):
+        try:
+            return {**current, **apply_overrides({}, extra, where)}
+        except SetupError as e:
+            raise RecipeError("; ".join(f"{where}: {message}" for _, _, message in e.problems))
+
+    def node(self, step, deps, where, prefix, overrides):
+        action = step["do"]
+        if action not in ACTIONS:
+            raise RecipeError(f"{where}: unknown action {action!r} (expected one of {', '.join(ACTIONS)})")
+        uses = step.get("uses", ACTIONS[action].uses)
+        unknown = set(uses) - set(RESOURCES)
+        if unknown:
+            raise RecipeError(f"{where}: unknown instruments {sorted(unknown)} in uses")
+        timeout = step.get("timeout")
+        if timeout is not None and (not isinstance(timeout, (int, float)) or timeout <= 0):
+            raise RecipeError(f"{where}: timeout must be a positive number of seconds")
+        settle = step.get("settle", ACTIONS[action].settle)
+        if settle is not None and not isinstance(settle, (int, float, str)):
+            raise RecipeError(f"{where}: settle must be a Step Delays name or seconds")
+        if action == "arb_upload" and "file" not in step.get("args", {}):
+            raise RecipeError(f"{where}: arb_upload needs args.file")
+        if action == "scpi" and step.get("args", {}).get("instrument") not in ("siggen", "specan"):
+            raise RecipeError(f"{where}: scpi needs args.instrument (siggen or specan)")
+
+        base = "/".join(prefix + [step.get("id", action)])
+        node_id = base
+        for n in itertools.count(2):
+            if node_id not in self.ids:
+                break
+            node_id = f"{base}#{n}"
+        self.ids.add(node_id)
+        if len(self.ids) > MAX_UNROLLED:
+            raise RecipeError(f"{where}: recipe unrolls to more than {MAX_UNROLLED} steps")
+        if action == "scpi":
+            uses = uses or (step["args"]["instrument"],)
+        self.nodes.append(Node(node_id, action, step.get("args", {}), set(deps), frozenset(uses),
+                               timeout, settle, overrides))
+        return node_id
+
+
+def check_safety(nodes, where="steps"):
+    # RF only after bias, and nothing that drives RF or bias may run unordered with a bias-off
+    ancestors = {}
+    for node in nodes:
+        ancestors[node.id] = set().union(*(ancestors[d] | {d} for d in node.deps)) if node.deps else set()
+    by_action = {}
+    for node in nodes:
+        by_action.setdefault(node.action, []).append(node.id)
+
+    def ordered(a, b):
+        return a in ancestors[b] or b in ancestors[a]
+
+    if by_action.get("bias_on"):
+        for rf in by_action.get("rf_on", []):
+            if not ancestors[rf] & set(by_action["bias_on"]):
+                raise RecipeError(f"{where}: {rf} can turn RF on before any bias_on")
+    for off in by_action.get("bias_off", []):
+        for other in by_action.get("rf_on", []) + by_action.get("bias_on", []):
+            if not ordered(off, other):
+                raise RecipeError(f"{where}: {other} and {off} may run at the same time")
+
+
+def compile_recipe(spec):
+    if not isinstance(spec, dict) or "steps" not in spec:
+        raise RecipeError("recipe: expected an object with a 'steps' list")
+    main = _Compiler(spec)
+    main.sequence(spec["steps"], set(), "steps", [], {}, [])
+    cleanup = _Compiler(spec)
+    cleanup.ids = set(main.ids)  # cleanup ids stay unique across the whole run
+    cleanup.sequence(spec.get("finally", []), set(), "finally", [], {}, [])
+    check_safety(main.nodes)
+    check_safety(cleanup.nodes, "finally")
+    return Recipe(spec.get("name", "recipe"), main.nodes, cleanup.nodes)
+
+
+def load_recipe(path):
+    with open(path) as f:
+        try:
+            spec = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RecipeError(f"{path}:{e.lineno}: {e.msg}")
+    try:
+        return compile_recipe(spec)
+    except RecipeError as e:
+        raise RecipeError(f"{path}: {e}")
+
+
+DEFAULT = compile_recipe(DEFAULT_RECIPE)
+
+
+# --- executor ------------------------------------------------------------------------------
+
+class RecipeExecutor:
+    # Runs compiled nodes on a small thread pool against a SequenceEngine (engine.bench, delays,
+    # log, status, wait_step, running, stop)
+    def __init__(self, engine, max_workers=8, grace_s=5.0):
+        self.engine = engine
+        self.max_workers = max_workers
+        self.grace_s = grace_s  # how long a failure waits for in-flight steps before giving up on them
+        self.counter = itertools.count(1)
+        self.t0 = time.perf_counter()
+
+    def instruments(self, resources):
+        bench = self.engine.bench
+        found = []
+        for resource in resources:
+            found.extend(bench.psu_instruments() if resource == "psu" else [getattr(bench, resource)])
+        return found
+
+    def run_node(self, node, cfg):
+        engine = self.engine
+        action = ACTIONS[node.action]
+        if node.overrides:
+            cfg = {**cfg, **node.overrides}
+        start = time.perf_counter()
+        if not action.quiet:
+            engine.log(f"Step {next(self.counter)}: {node.id}")
+            if action.status:
+                engine.status(action.status)
+        action.run(engine, node, cfg)
+        if node.settle is not None:
+            budget = engine.delays.get(node.settle, 0.0) if isinstance(node.settle, str) else float(node.settle)
+            if callable(action.wait_on):
+                action.wait_on(engine, node, cfg, budget)
+            else:
+                engine.wait_step(node.id, self.instruments(action.wait_on), budget)
+        engine.node_times[node.id] = {"start": start - self.t0, "elapsed": time.perf_counter() - start}
+        engine.node_done(node)
+
+    def run(self, nodes, cfg, done=()):
+        # True when every node finished, False when the engine was stopped; raises the first
+        # failure or timeout. done: ids finished by an earlier attempt, skipped here
+        engine = self.engine
+        done = set(done)
+        remaining = {node.id: set(node.deps) - done for node in nodes}
+        waiting = [node for node in nodes if node.id not in done]
+        running = {}  # future -> (node, start)
+        busy = set()
+        failure = None
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="recipe")
+        try:
+            while waiting or running:
+                if failure is None and engine.running:
+                    for node in list(waiting):
+                        if not remaining[node.id] and not busy & node.uses:
+                            waiting.remove(node)
+                            busy |= node.uses
+                            running[pool.submit(self.run_node, node, cfg)] = (node, time.perf_counter())
+                if not running:
+                    break
+
+                now = time.perf_counter()
+                deadlines = [start + node.timeout - now for node, start in running.values() if node.timeout]
+                done, _ = wait(list(running), timeout=max(min(deadlines + [0.1]), 0.0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, _ = running.pop(future)
+                    busy -= node.uses
+                    if future.exception() is not None:
+                        failure = failure or future.exception()
+                        continue
+                    for other in waiting:
+                        remaining[other.id].discard(node.id)
+
+                now = time.perf_counter()
+                for node, start in running.values():
+                    if failure is None and node.timeout and now - start > node.timeout:
+                        failure = TimeoutError(f"{node.id} did not finish within {node.timeout:g} s")
+
+                if failure is not None:
+                    # In-flight steps see the stop and wind down; one stuck on the bus is left behind
+                    engine.stop()
+                    wait(list(running), timeout=self.grace_s)
+                    stuck = [node.id for future, (node, _) in running.items() if not future.done()]
+                    if stuck:
+                        engine.log(f"   ⚠️ Still running after the failure: {', '.join(stuck)}")
+                    raise failure
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return not waiting and engine.running
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+
+
+class ResultStore:
+    # Append-only columnar store: one raw binary file per column plus a JSON schema, one
+    # directory per run. Rows go straight to disk, so memory stays flat for any run length,
+    # and read_run() maps the columns back with np.memmap.
+    def __init__(self, root="results", run_id=None, flush_every=16, resume_rows=None):
+        # resume_rows: continue the existing run root/run_id after its first resume_rows rows
+        base = run_id or time.strftime("run_%Y%m%d_%H%M%S")
+        self.run_id = base
+        suffix = 1
+        while resume_rows is None and os.path.exists(os.path.join(root, self.run_id, SCHEMA_FILE)):
+            # Never append into another run's columns
+            suffix += 1
+            self.run_id = f"{base}_{suffix}"
+        self.path = os.path.join(root, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+        self.flush_every = flush_every
+        self.columns = None  # name -> {'dtype': str, 'shape': [int, ...]}
+        self.files = {}
+        self.rows = 0
+        if resume_rows is not None:
+            self._reopen(resume_rows)
+
+    def _reopen(self, rows):
+        # Columns are cut back to `rows` complete rows; anything written after that checkpoint is dropped
+        schema_path = os.path.join(self.path, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            if rows:
+                raise ValueError(f"{self.path} has no schema but {rows} rows were expected")
+            return
+        with open(schema_path) as f:
+            self.columns = json.load(f)['columns']
+        for name, column in self.columns.items():
+            file_path = os.path.join(self.path, f"{name}.bin")
+            size = rows * np.dtype(column['dtype']).itemsize * int(np.prod(column['shape'], dtype=int))
+            if os.path.getsize(file_path) < size:
+                raise ValueError(f"Column '{name}' holds fewer than {rows} rows")
+            os.truncate(file_path, size)
+            self.files[name] = open(file_path, "ab")
+        self.rows = rows
+        self._write_schema()
+
+    def _define(self, record):
+        self.columns = {}
+        for name, value in record.items():
+            array = np.asarray(value)
+            dtype = array.dtype if array.dtype.kind in "fiub" else np.dtype(float)
+            self.columns[name] = {"dtype": dtype.newbyteorder("<").str, "shape": list(array.shape)}
+        for name in self.columns:
+            self.files[name] = open(os.path.join(self.path, f"{name}.bin"), "ab")
+        self._write_schema()
+
+    def append(self, record):
+        if self.columns is None:
+            self._define(record)
+        extra = set(record) - set(self.columns)
+        if extra:
+            raise ValueError(f"Columns not in run schema: {', '.join(sorted(extra))}")
+
+        for name, column in self.columns.items():
+            value = record.get(name)
+            if value is None:
+                value = np.full(column['shape'], np.nan)
+            array = np.asarray(value, dtype=column['dtype'])
+            if list(array.shape) != column['shape']:
+                raise ValueError(f"Column '{name}' expects shape {column['shape']}, got {list(array.shape)}")
+            self.files[name].write(array.tobytes())
+
+        self.rows += 1
+        if self.rows % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+        if self.columns is not None:
+            self._write_schema()
+
+    def sync(self):
+        # Column data out to the OS without rewriting the schema; returns each column's byte offset
+        for f in self.files.values():
+            f.flush()
+        return {name: f.tell() for name, f in self.files.items()}
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def _write_schema(self):
+        # Row count is written after the column data so readers never see a partial row
+        tmp = os.path.join(self.path, SCHEMA_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"run_id": self.run_id, "rows": self.rows, "columns": self.columns}, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, SCHEMA_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_run(path):
+    # Returns {column: read-only np.memmap of shape (rows, *shape)}
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    rows = schema['rows']
+    data = {}
+    for name, column in schema['columns'].items():
+        shape = (rows, *column['shape'])
+        if rows == 0:
+            data[name] = np.empty(shape, dtype=column['dtype'])
+            continue
+        data[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=column['dtype'], mode="r", shape=shape)
+    return data
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import threading
+
+# Checkpoints for sequencer runs. Each run directory gets journal.jsonl next to its columns: one
+# line when the run starts, one per finished recipe step and one per measured sweep point. Every
+# line records the result store's row count and byte offsets and the siggen/specan settings at
+# that moment. read_journal() turns the file back into what a resume needs: which steps to skip,
+# where each sweep left off, how many rows to keep and what state to put the bench back in.
+# Lines are flushed as they are written (not fsynced): a crash or a dropped bus loses at most
+# the point being measured.
+
+JOURNAL_FILE = "journal.jsonl"
+
+
+class RunJournal:
+    def __init__(self, run_path):
+        self.path = os.path.join(run_path, JOURNAL_FILE)
+        self.file = open(self.path, "a")
+        self.lock = threading.Lock()  # recipe steps finish on several threads
+
+    def write(self, entry):
+        entry["time"] = time.time()
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def start(self, cfg, recipe, resumed=False):
+        self.write({"type": "resume" if resumed else "start", "cfg": cfg, "recipe": recipe.name,
+                    "nodes": [node.id for node in recipe.nodes]})
+
+    def node(self, node, rows, offsets, shadows):
+        self.write({"type": "node", "id": node.id, "action": node.action, "overrides": node.overrides,
+                    "rows": rows, "offsets": offsets, "shadows": shadows})
+
+    def point(self, node_id, index, rows, offsets, shadows):
+        self.write({"type": "point", "node": node_id, "index": index, "rows": rows, "offsets": offsets,
+                    "shadows": shadows})
+
+    def end(self, status):
+        self.write({"type": "end", "status": status})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ResumeState:
+    def __init__(self):
+        self.cfg = {}
+        self.recipe = None
+        self.nodes = []  # node ids of the recipe the run started with
+        self.done = []  # ids of finished steps, in finishing order
+        self.points = {}  # sweep step id -> points already measured
+        self.rows = 0
+        self.shadows = {}  # "siggen"/"specan" -> {header: value}
+        self.bias = None  # setup overrides of the last bias_on still in effect, None if bias is off
+        self.rf = None  # likewise for rf_on
+        self.analyzer = False  # shared analyzer claimed and not yet released
+        self.status = None  # status of the last end line, None if the run never got that far
+
+
+def read_journal(run_path):
+    state = ResumeState()
+    path = os.path.join(run_path, JOURNAL_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"{run_path} has no {JOURNAL_FILE}; it cannot be resumed")
+    with open(path) as f:
+        lines = f.read().splitlines()
+    for number, line in enumerate(lines, start=1):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            if number == len(lines):
+                break  # torn last line from a crash mid-write
+            raise ValueError(f"{path}:{number}: not a journal entry")
+
+        kind = entry.get("type")
+        if kind == "start":
+            state.cfg, state.recipe, state.nodes = entry["cfg"], entry["recipe"], entry["nodes"]
+        elif kind == "resume":
+            state.status = None
+        elif kind == "end":
+            state.status = entry["status"]
+        elif kind == "point":
+            state.points[entry["node"]] = entry["index"] + 1
+        elif kind == "node":
+            if entry["id"] not in state.nodes:
+                continue  # cleanup ("finally") steps; a resume runs them again at its end
+            state.done.append(entry["id"])
+            state.points.pop(entry["id"], None)
+            action = entry["action"]
+            if action in ("bias_on", "bias_off"):
+                state.bias = entry["overrides"] if action == "bias_on" else None
+            elif action in ("rf_on", "rf_off"):
+                state.rf = entry["overrides"] if action == "rf_on" else None
+            elif action in ("claim_analyzer", "release_analyzer"):
+                state.analyzer = action == "claim_analyzer"
+        if kind in ("node", "point"):
+            state.rows = entry["rows"]
+            state.shadows = entry["shadows"]
+    if not state.nodes:
+        raise ValueError(f"{path}: no start entry")
+    return state
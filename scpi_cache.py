@@ -0,0 +1,130 @@
+import weakref
+
+
+def join_scpi(commands):
+    # ";:" returns the SCPI parser to the root, so every command keeps its absolute header.
+    # Common commands (*OPC, *CLS, ...) do not touch the header path and only need ";".
+    message = ""
+    for command in commands:
+        command = command.lstrip(":")
+        if message:
+            message += ";" if command.startswith("*") else ";:"
+        message += command
+    return message
+
+
+class ScpiWriteCache:
+    # Tracks the selected channel and last-written setpoints so redundant writes can be dropped
+    def __init__(self):
+        self.selected = None
+        self.setpoints = {}  # (channel, key) -> last value written
+        self.stats = {
+            "transactions": 0,
+            "bytes": 0,
+            "saved_transactions": 0,
+            "saved_bytes": 0,
+            "dropped_commands": 0,
+        }
+
+    def is_current(self, ch, key, value):
+        return (ch, key) in self.setpoints and self.setpoints[(ch, key)] == value
+
+    def store(self, ch, key, value):
+        self.setpoints[(ch, key)] = value
+
+    def forget(self, ch, key):
+        self.setpoints.pop((ch, key), None)
+
+    def invalidate(self):
+        # Call after reconnect, *RST or anything else that may change state behind our back
+        self.selected = None
+        self.setpoints.clear()
+
+    def account(self, baseline, sent, dropped=0):
+        # baseline/sent are lists of messages: what the uncached driver would write vs. what was written
+        baseline_bytes = sum(len(m) + 1 for m in baseline)
+        sent_bytes = sum(len(m) + 1 for m in sent)
+        self.stats["transactions"] += len(sent)
+        self.stats["bytes"] += sent_bytes
+        self.stats["saved_transactions"] += max(len(baseline) - len(sent), 0)
+        self.stats["saved_bytes"] += max(baseline_bytes - sent_bytes, 0)
+        self.stats["dropped_commands"] += dropped
+
+
+def _normalized(value):
+    # "1e9" and "1000000000.0" are the same setting; enums compare case-insensitively
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value).strip().strip("'\"").upper()
+
+
+class ShadowState:
+    # Last-confirmed value of each setting on one instrument, keyed by SCPI header.
+    # apply() sends only the settings that differ, plus any always-sent commands, as one message.
+    def __init__(self):
+        self.values = {}  # header -> normalized value
+        self.sent = {}  # header -> value exactly as last written, for replaying the state later
+        self.stats = {"applies": 0, "sent": 0, "skipped": 0, "transactions": 0}
+
+    def diff(self, settings):
+        # settings: [(header, value)] in send order; returns the ones that would change
+        return [(header, value) for header, value in settings
+                if self.values.get(header, object()) != _normalized(value)]
+
+    def commit(self, settings):
+        for header, value in settings:
+            self.values[header] = _normalized(value)
+            self.sent[header] = value
+
+    def forget(self, *headers):
+        for header in headers:
+            self.values.pop(header, None)
+            self.sent.pop(header, None)
+
+    def invalidate(self):
+        # Call after reconnect, *RST or anything else that may change state behind our back
+        self.values.clear()
+        self.sent.clear()
+
+    def restore(self, instrument, settings):
+        # Brings an instrument back to recorded settings: one query reads what it holds now and
+        # one write sends only what differs. If the query fails every setting is sent.
+        headers = [header for header, _ in settings]
+        try:
+            response = instrument.query(join_scpi([f"{header}?" for header in headers])).strip().split(";")
+            if len(response) != len(headers):
+                raise ValueError(f"expected {len(headers)} values, got {len(response)}")
+            self.values.update((header, _normalized(value)) for header, value in zip(headers, response))
+        except Exception:
+            self.forget(*headers)
+        return self.apply(instrument, settings)
+
+    def apply(self, instrument, settings, extra=()):
+        # extra: commands sent every time (output state, INIT, ...) appended after the settings
+        changes = self.diff(settings)
+        commands = [f"{header} {value}" for header, value in changes] + list(extra)
+        self.stats["applies"] += 1
+        self.stats["sent"] += len(changes)
+        self.stats["skipped"] += len(settings) - len(changes)
+        if not commands:
+            return changes
+        instrument.write(join_scpi(commands))
+        self.stats["transactions"] += 1
+        if any(command.upper().startswith("*RST") for command in extra):
+            self.invalidate()
+        else:
+            # Only recorded once the write went through
+            self.commit(changes)
+        return changes
+
+
+_shadows = weakref.WeakKeyDictionary()
+
+
+def shadow_for(instrument):
+    # One ShadowState per open session, shared by every tab and engine that writes to it
+    shadow = _shadows.get(instrument)
+    if shadow is None:
+        shadow = _shadows[instrument] = ShadowState()
+    return shadow
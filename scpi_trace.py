@@ -0,0 +1,202 @@
+import os
+import re
+import csv
+import json
+import time
+import threading
+import numpy as np
+
+# SCPI transaction tracing. Enable with SCPI_TRACE=true (or pass a TraceRecorder to
+# VisaSessionPool); every session the pool opens is then wrapped in a TracedInstrument.
+
+FIELDS = ("start", "end", "op", "instrument", "command", "bytes_out", "bytes_in")
+PERCENTILES = (50, 95, 99)
+_ARGS = re.compile(r"\s+[^;]*")
+_RAW_HEADER = re.compile(rb"[*:]?[A-Za-z][A-Za-z0-9:*?]*")
+
+
+def trace_enabled():
+    return os.environ.get("SCPI_TRACE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def command_key(command):
+    # "FREQ 1e9;:POW -10" -> "FREQ;:POW": groups transactions by what they do, not by their values
+    if isinstance(command, (bytes, bytearray, memoryview)):
+        # Raw writes: the SCPI header if there is one, otherwise a continuation chunk of a block
+        header = _RAW_HEADER.match(bytes(command[:64]))
+        return header.group(0).decode("ascii") if header else "<data>"
+    return _ARGS.sub("", command.strip()) or "?"
+
+
+def interface(resource_name):
+    # GPIB0::10::INSTR -> GPIB, TCPIP0::... -> TCPIP
+    return re.match(r"[A-Za-z]*", resource_name or "").group(0).upper() or "?"
+
+
+class TraceRecorder:
+    # Fixed-size ring of the most recent transactions. Recording is one lock and one tuple store;
+    # all aggregation happens when a summary, histogram or export is asked for.
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self._records = [None] * capacity
+        self._index = 0
+        self.total = 0
+        self._lock = threading.Lock()
+        # perf_counter() timestamps plus this offset give wall-clock time
+        self.epoch = time.time() - time.perf_counter()
+
+    def record(self, start, end, op, instrument, command, bytes_out, bytes_in=0):
+        with self._lock:
+            self._records[self._index] = (start, end, op, instrument, command, bytes_out, bytes_in)
+            self._index = (self._index + 1) % self.capacity
+            self.total += 1
+
+    def clear(self):
+        with self._lock:
+            self._records = [None] * self.capacity
+            self._index = 0
+            self.total = 0
+
+    def snapshot(self):
+        # Oldest to newest
+        with self._lock:
+            records = self._records[self._index:] + self._records[:self._index]
+        return [r for r in records if r is not None]
+
+    def summary(self, group_by="command"):
+        # group_by: "command" (op + command key), "instrument" or "interface"
+        groups = {}
+        for start, end, op, instrument, command, bytes_out, bytes_in in self.snapshot():
+            if group_by == "instrument":
+                key = instrument
+            elif group_by == "interface":
+                key = interface(instrument)
+            else:
+                key = f"{op} {command_key(command)}"
+            group = groups.setdefault(key, {"latencies": [], "bytes": 0})
+            group["latencies"].append(end - start)
+            group["bytes"] += bytes_out + bytes_in
+
+        rows = []
+        for key, group in groups.items():
+            latencies = np.array(group["latencies"]) * 1000
+            p50, p95, p99 = np.percentile(latencies, PERCENTILES)
+            rows.append({
+                "key": key, "count": len(latencies), "total_ms": float(latencies.sum()),
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                "max_ms": float(latencies.max()), "bytes": group["bytes"],
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def histogram(self, key, bins=20):
+        # Log-spaced latency histogram (ms) for one "op command-key" group
+        latencies = np.array([end - start for start, end, op, _, command, _, _ in self.snapshot()
+                              if f"{op} {command_key(command)}" == key]) * 1000
+        if not len(latencies):
+            return [], []
+        low, high = max(latencies.min(), 1e-3), max(latencies.max(), 1e-3)
+        counts, edges = np.histogram(latencies, bins=np.geomspace(low, high * 1.0001, bins + 1))
+        return counts.tolist(), edges.tolist()
+
+    def export(self, path):
+        # .json: summaries and histograms; anything else: one CSV row per transaction
+        if path.lower().endswith(".json"):
+            by_command = self.summary()
+            report = {
+                "transactions": self.total,
+                "retained": len(self.snapshot()),
+                "by_command": by_command,
+                "by_instrument": self.summary("instrument"),
+                "by_interface": self.summary("interface"),
+                "histograms": {row["key"]: dict(zip(("counts", "edges_ms"), self.histogram(row["key"])))
+                               for row in by_command},
+            }
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return path
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS + ("latency_ms",))
+            for start, end, op, instrument, command, bytes_out, bytes_in in self.snapshot():
+                if not isinstance(command, str):
+                    command = command_key(command)
+                writer.writerow([f"{self.epoch + start:.6f}", f"{self.epoch + end:.6f}", op, instrument,
+                                 command, bytes_out, bytes_in, f"{(end - start) * 1000:.3f}"])
+        return path
+
+
+class TracedInstrument:
+    # Stands in for a pyvisa resource; times each bus call and forwards everything else
+    def __init__(self, inner, recorder):
+        object.__setattr__(self, "_inner", inner)
+        object.__setattr__(self, "_recorder", recorder)
+        object.__setattr__(self, "_name", getattr(inner, "resource_name", None) or repr(inner))
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def __setattr__(self, name, value):
+        # timeout, send_end, terminations, ... belong to the real session
+        setattr(self._inner, name, value)
+
+    def write(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._inner.write(message, *args, **kwargs)
+        finally:
+            self._recorder.record(start, time.perf_counter(), "write", self._name, message, len(message))
+
+    def write_raw(self, data):
+        start = time.perf_counter()
+        try:
+            return self._inner.write_raw(data)
+        finally:
+            # Only the header is kept, not the payload
+            self._recorder.record(start, time.perf_counter(), "write_raw", self._name, command_key(data), len(data))
+
+    def query(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        response = ""
+        try:
+            response = self._inner.query(message, *args, **kwargs)
+            return response
+        finally:
+            self._recorder.record(start, time.perf_counter(), "query", self._name, message, len(message), len(response))
+
+    def query_binary_values(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        size = 0
+        try:
+            values = self._inner.query_binary_values(message, *args, **kwargs)
+            size = getattr(values, "nbytes", len(values))
+            return values
+        finally:
+            self._recorder.record(start, time.perf_counter(), "query_binary", self._name, message, len(message), size)
+
+    def read(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = ""
+        try:
+            response = self._inner.read(*args, **kwargs)
+            return response
+        finally:
+            self._recorder.record(start, time.perf_counter(), "read", self._name, "", 0, len(response))
+
+    def read_raw(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = b""
+        try:
+            response = self._inner.read_raw(*args, **kwargs)
+            return response
+        finally:
+            self._recorder.record(start, time.perf_counter(), "read_raw", self._name, "", 0, len(response))
+
+
+def format_summary(rows):
+    lines = [f"{'command':<44}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'total ms':>10}"]
+    for row in rows:
+        lines.append(f"{row['key'][:43]:<44}{row['count']:>7}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                     f"{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}{row['total_ms']:>10.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,81 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from scpi_trace import format_summary
+
+COLUMNS = ("count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_ms", "bytes")
+
+
+class ScpiTraceTab:
+    # Live per-command latency view over the pool's TraceRecorder (shown when SCPI_TRACE is on)
+    def __init__(self, parent, recorder, refresh_ms=1000):
+        self.recorder = recorder
+        self.refresh_ms = refresh_ms
+        self.frame = ttk.Frame(parent)
+        self.build_ui()
+        self.refresh()
+
+    def build_ui(self):
+        control_frame = ttk.Frame(self.frame)
+        control_frame.pack(padx=10, pady=10, fill='x')
+
+        ttk.Label(control_frame, text="Group by:").pack(side='left')
+        self.group_var = tk.StringVar(value="command")
+        group_combo = ttk.Combobox(control_frame, textvariable=self.group_var, state="readonly", width=12,
+                                   values=["command", "instrument", "interface"])
+        group_combo.pack(side='left', padx=5)
+        group_combo.bind("<<ComboboxSelected>>", lambda event: self.update_view())
+
+        self.live_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(control_frame, text="Live", variable=self.live_var).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="Export...", command=self.export).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="Clear", command=self.clear).pack(side='left', padx=5)
+
+        self.total_label = ttk.Label(control_frame, text="", foreground="gray")
+        self.total_label.pack(side='right', padx=10)
+
+        self.tree = ttk.Treeview(self.frame, columns=COLUMNS, show="tree headings")
+        self.tree.heading("#0", text="Command")
+        self.tree.column("#0", width=320)
+        for column in COLUMNS:
+            self.tree.heading(column, text=column.replace("_ms", " ms"))
+            self.tree.column(column, width=80, anchor='e')
+        self.tree.pack(padx=10, pady=5, fill='both', expand=True)
+
+    def refresh(self):
+        if self.live_var.get():
+            self.update_view()
+        self.frame.after(self.refresh_ms, self.refresh)
+
+    def update_view(self):
+        rows = self.recorder.summary(self.group_var.get())
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", "end", text=row["key"], values=(
+                row["count"], f"{row['p50_ms']:.2f}", f"{row['p95_ms']:.2f}", f"{row['p99_ms']:.2f}",
+                f"{row['max_ms']:.2f}", f"{row['total_ms']:.1f}", row["bytes"],
+            ))
+        self.total_label.config(text=f"{self.recorder.total} transactions traced")
+
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Summary + histograms", "*.json"), ("Raw transactions", "*.csv"), ("Text", "*.txt")],
+        )
+        if not path:
+            return
+        try:
+            if path.lower().endswith(".txt"):
+                with open(path, "w") as f:
+                    f.write(format_summary(self.recorder.summary()) + "\n")
+            else:
+                self.recorder.export(path)
+            messagebox.showinfo("Trace Exported", f"Saved to {path}")
+        except Exception as e:
+            messagebox.showerror("Export Failed", str(e))
+
+    def clear(self):
+        self.recorder.clear()
+        self.update_view()
+
+    def get_tab(self):
+        return self.frame
@@ -0,0 +1,451 @@
+import os
+import time
+from power_supply import PowerSupply
+from psu_driver import driver_for_idn
+from recipe import DEFAULT, STEP_NAMES, RecipeExecutor
+from ramp_profile import PAIR_ACTIVATE, PAIR_DEACTIVATE, SETPOINT, RampProfile
+from ramp_scheduler import RampScheduler, output_channel
+from result_store import ResultStore
+from run_journal import RunJournal, read_journal
+from scpi_cache import shadow_for
+from specan_trace import TraceReader
+from sweep_engine import SweepEngine, build_grid
+from sync_wait import CompletionWaiter
+from visa_pool import get_pool
+
+# Nothing in this module may import tkinter: it is shared by the GUI and the headless runner
+
+GATE_PINCH_OFF = -6.0
+GATE_CURRENT_LIMIT = 0.05  # A, when the setup has no IGDRV
+BIAS_TOLERANCE = (0.05, 0.01)  # V and fraction of setpoint: a readback this close counts as settled
+
+
+def bias_limits(cfg):
+    # (gate, drain) current limits
+    return cfg.get("IGDRV", GATE_CURRENT_LIMIT), cfg.get("IDDRV", 0)
+
+
+def ramp_outputs(scheduler, outputs, profile, setpoint, current):
+    # One profile on every output at once; raises the first failure
+    jobs = [{"key": (psu.name, output), "stages": [(psu, output, profile.bind(setpoint, current))]}
+            for psu, output in outputs]
+    results, _ = scheduler.run(jobs)
+    failed = [r for r in results if not r['ok']]
+    if failed:
+        raise Exception(f"{failed[0]['key']}: {failed[0]['error']}")
+
+
+def below(profile, level):
+    # Drops fixed intermediate levels at or above level, so a low VDDRV is never overshot
+    return RampProfile([s for s in profile.segments if s.target == SETPOINT or s.target < level])
+
+
+def check_outputs(gates, drains):
+    # Every role must name a channel its supply has (Output2 on a single-output supply would
+    # only fail halfway through biasing)
+    problems = [f"{psu.name} {output}: {psu.name} has only channel(s) {', '.join(map(str, psu.driver.channels))}"
+                for psu, output in gates + drains if output_channel(output) not in psu.driver.channels]
+    if problems:
+        raise Exception("; ".join(problems))
+
+
+def staged_bias_on(scheduler, gates, drains, cfg):
+    # The pair bring-up sequence on every output: gates pinched off, drains stepped 0 V -> 10 V
+    # -> VDDRV with a dwell at each level, then gates through -3 V to VGDRV
+    gate_current, drain_current = bias_limits(cfg)
+    gate_v, drain_v = cfg.get("VGDRV", GATE_PINCH_OFF), cfg.get("VDDRV", 0)
+    ramp_outputs(scheduler, gates, PAIR_ACTIVATE["gate_pinch"], gate_v, gate_current)
+    ramp_outputs(scheduler, drains, below(PAIR_ACTIVATE["drain_up"], drain_v), drain_v, drain_current)
+    ramp_outputs(scheduler, gates, PAIR_ACTIVATE["gate_release"], gate_v, gate_current)
+
+
+def staged_bias_off(scheduler, gates, drains, cfg):
+    # Gates pinched off, drains stepped down and off, then gates off
+    gate_current, drain_current = bias_limits(cfg)
+    ramp_outputs(scheduler, gates, PAIR_DEACTIVATE["gate_pinch"], GATE_PINCH_OFF, gate_current)
+    ramp_outputs(scheduler, drains, below(PAIR_DEACTIVATE["drain_down"], cfg.get("VDDRV", 0)), 0.0, drain_current)
+    for psu, output in drains + gates:
+        psu.driver.disable_output(output_channel(output))
+
+
+class InstrumentBench:
+    # Drives the instruments directly from setup-file values, without any tab widgets
+    def __init__(self, psus, assignments, siggen=None, specan=None):
+        self.psus = psus  # name -> PowerSupply with a driver
+        self.assignments = assignments  # [{'psu': 'PS1', 'output': 'Output1', 'role': 'Gate'}, ...]
+        self.siggen = siggen
+        self.specan = specan
+        self.trace_reader = TraceReader(specan) if specan is not None else None
+        self.scheduler = RampScheduler()
+
+    def outputs(self, role):
+        return [
+            (self.psus[a['psu']], a['output'])
+            for a in self.assignments
+            if a['role'].lower() == role and a['psu'] in self.psus and self.psus[a['psu']].driver is not None
+        ]
+
+    def psu_instruments(self):
+        return [psu.instrument for psu in self.psus.values() if psu.driver is not None]
+
+    def bias_on(self, cfg):
+        staged_bias_on(self.scheduler, self.outputs("gate"), self.outputs("drain"), cfg)
+
+    def bias_off(self, cfg):
+        staged_bias_off(self.scheduler, self.outputs("gate"), self.outputs("drain"), cfg)
+
+    def abort_targets(self):
+        return {'siggen': self.siggen, 'drains': self.outputs("drain"), 'gates': self.outputs("gate")}
+
+    def bias_outputs(self):
+        return self.outputs("gate"), self.outputs("drain")
+
+    def rf_on(self, cfg):
+        freq = cfg.get("LOSWPFREQMZ", 1000) * 1e6
+        power = cfg.get("LOSWPPWR", 10)
+        shadow_for(self.siggen).apply(self.siggen, [("FREQ", freq), ("POW", power)], ["OUTP ON"])
+
+    def rf_off(self, cfg):
+        self.siggen.write("OUTP OFF")
+
+    def start_sweep(self):
+        self.specan.write("INIT:IMM")
+
+
+def limits_from_setup(cfg, targets):
+    # OVPDRV / OCPDRV (optional) protect every drain output
+    limit = {'ovp': cfg.get("OVPDRV"), 'ocp': cfg.get("OCPDRV")}
+    if limit['ovp'] is None and limit['ocp'] is None:
+        return {}
+    return {(psu, output): dict(limit) for psu, output in targets['drains']}
+
+
+def connect_bench(device_map, pool=None):
+    # device_map: {'psus': {name: address}, 'siggen': address, 'specan': address, 'assignments': [...]}
+    pool = pool or get_pool()
+    psus = {}
+    for name, address in device_map.get('psus', {}).items():
+        psu = PowerSupply(name, address)
+        psu.connect(pool)
+        psu.driver = driver_for_idn(pool.idn(address))(psu.instrument)
+        psus[name] = psu
+    siggen = pool.acquire(device_map['siggen']) if device_map.get('siggen') else None
+    specan = pool.acquire(device_map['specan']) if device_map.get('specan') else None
+    for instrument in (siggen, specan):
+        if instrument is not None:
+            shadow_for(instrument).invalidate()
+    return InstrumentBench(psus, device_map.get('assignments', []), siggen, specan)
+
+
+class SequenceEngine:
+    # Runs a recipe (recipe.py; by default Bias ON -> RF ON -> Sweep -> Log -> RF OFF -> Bias OFF)
+    # against any bench object that provides bias_on/bias_off/rf_on/rf_off/start_sweep,
+    # psu_instruments(), abort_targets(), bias_outputs(), siggen, specan, trace_reader
+    def __init__(self, bench, delays=None, log=print, status=None, results_root="results", abort=None,
+                 analyzer_lock=None, telemetry=None):
+        self.bench = bench
+        self.abort = abort
+        self.telemetry = telemetry  # TelemetryPoller feeding abort.check; started by run() when idle
+        self.hardware_limits = {}  # programmed at run start, re-programmed after every bias on
+        self.analyzer_lock = analyzer_lock  # held from RF ON to RF OFF when the analyzer is shared
+        self.analyzer_wait = 0.0
+        self.analysis = None  # run summary from an "analyze" recipe step
+        self.analyzer_held = False
+        if abort is not None:
+            abort.listeners.append(self.stop)
+        self.delays = {step: 1.0 for step in STEP_NAMES}
+        self.delays.update(delays or {})
+        self.log = log
+        self.status = status or (lambda text, color="blue": None)
+        self.results_root = results_root
+        self.running = False
+        self.waiter = CompletionWaiter(should_stop=lambda: not self.running)
+        self.sweep_points = 0  # points measured by the last sweep step
+        self.last_point = None
+        self.step_times = {}
+        self.node_times = {}
+        self.store = None
+        self.journal = None
+        self.resume_points = {}  # sweep step id -> points an earlier attempt already measured
+        self.readback_outputs = []  # [(psu, channel)] whose V/I every sweep point records
+
+    def stop(self):
+        self.running = False
+
+    def bias_on(self, cfg):
+        # Biasing sets every drain's current limit to IDDRV, which on these supplies is also the
+        # OCP threshold; OCPDRV goes back in as soon as the outputs are up
+        self.bench.bias_on(cfg)
+        if self.hardware_limits and self.abort is not None:
+            self.abort.program_limits(self.hardware_limits)
+
+    def arm_protection(self, cfg):
+        limits = limits_from_setup(cfg, self.bench.abort_targets())
+        unsupported = self.abort.program_limits(limits)
+        self.hardware_limits = limits
+        watching = self.telemetry is not None
+        if watching and not self.telemetry.running():
+            self.telemetry.start()
+            self.log(f"   Telemetry watch started at {self.telemetry.rate_hz:g} Hz")
+        fallback = "telemetry watch only" if watching else "no telemetry watch either"
+        for name, ch, kind, _ in unsupported:
+            self.log(f"   ⚠️ {name} CH{ch}: no hardware {kind.upper()}, {fallback}")
+        if not limits:
+            self.log("   🛡 No OVPDRV/OCPDRV in the setup: ABORT button only")
+        else:
+            refused = {(name, ch) for name, ch, _, _ in unsupported}
+            self.log(f"   🛡 Hardware OVP/OCP on {len(limits) - len(refused)} of {len(limits)} drain outputs; "
+                     + ("telemetry OV/OC watch on" if watching else "no telemetry OV/OC watch"))
+        self.abort.arm()
+
+    def claim_analyzer(self):
+        # Other benches keep biasing their DUTs while this one waits for the shared analyzer
+        if self.analyzer_lock is None or self.analyzer_held:
+            return
+        start = time.perf_counter()
+        while not self.analyzer_lock.acquire(timeout=0.1):
+            if not self.running:
+                raise Exception("Stopped while waiting for the shared analyzer")
+        self.analyzer_held = True
+        self.analyzer_wait += time.perf_counter() - start
+        if time.perf_counter() - start >= 0.1:
+            self.log(f"   ⏱ Waited {time.perf_counter() - start:.3f} s for the shared analyzer")
+
+    def release_analyzer(self):
+        if self.analyzer_held:
+            self.analyzer_held = False
+            self.analyzer_lock.release()
+
+    def wait_step(self, step, instruments, budget=None):
+        # The configured delay is only an upper bound; instruments end the wait by reporting done
+        budget = self.delays[step] if budget is None else budget
+        instruments = [i for i in instruments if i is not None]
+        done, actual = True, 0.0
+        if instruments:
+            for instrument in instruments:
+                self.waiter.arm(instrument)
+            done, actual = self.waiter.wait_all(instruments, budget)
+        else:
+            # Nothing reports completion: the delay is a plain (interruptible) sleep
+            start = time.perf_counter()
+            while self.running and time.perf_counter() - start < budget:
+                time.sleep(min(0.05, max(budget - (time.perf_counter() - start), 0.0)))
+            actual = time.perf_counter() - start
+        self.report_wait(step, done, actual, budget)
+
+    def wait_bias(self, step, cfg, budget=None):
+        # Bias has settled when every gate and drain reads back within BIAS_TOLERANCE of its
+        # setpoint; command completion (*OPC) only says the supply parsed the ramp. The delay
+        # is the upper bound. Without a setup the setpoints are the tab's, so *OPC it is.
+        budget = self.delays[step] if budget is None else budget
+        if not cfg:
+            self.wait_step(step, self.bench.psu_instruments(), budget)
+            return
+        gates, drains = self.bench.bias_outputs()
+        setpoints = {}
+        for outputs, volts in ((gates, cfg.get("VGDRV", GATE_PINCH_OFF)), (drains, cfg.get("VDDRV", 0))):
+            for psu, output in outputs:
+                setpoints.setdefault(psu.name, (psu, {}))[1][output_channel(output)] = volts
+        absolute, relative = BIAS_TOLERANCE
+        start = time.perf_counter()
+        interval = self.waiter.initial_interval
+        while True:
+            done = True
+            for psu, channels in setpoints.values():
+                readings = psu.driver.measure_all()
+                done = done and all(abs(readings[ch][0] - volts) <= max(absolute, relative * abs(volts))
+                                    for ch, volts in channels.items())
+            elapsed = time.perf_counter() - start
+            if done or elapsed >= budget or not self.running:
+                break
+            time.sleep(min(interval, budget - elapsed))
+            interval = min(interval * 2, self.waiter.max_interval)
+        self.report_wait(step, done, time.perf_counter() - start, budget)
+
+    def report_wait(self, step, done, actual, budget):
+        self.step_times[step] = {"actual": actual, "budget": budget, "completed": done}
+        note = "" if done else " (budget reached)"
+        self.log(f"   ⏱ {step}: {actual:.3f} s actual / {budget:.3f} s budget{note}")
+
+    def run_sweep(self, cfg, node_id=None):
+        # Steps the generator over the setup-file grid, capturing one trace per point
+        grid = build_grid(cfg)
+        first = self.resume_points.pop(node_id, 0)
+        engine = SweepEngine(
+            self.bench.siggen,
+            self.bench.specan,
+            self.bench.trace_reader,
+            waiter=self.waiter,
+            sweep_timeout=self.delays["Sweep"],
+        )
+        mode = "list" if engine.use_list else "stepped"
+        if first:
+            self.log(f"   Resuming sweep at point {first + 1} of {len(grid)} ({mode} mode)")
+        else:
+            self.log(f"   Sweeping {len(grid)} points ({mode} mode)")
+        targets = self.bench.abort_targets()
+        self.readback_outputs = [(psu, output_channel(output)) for role in ("gates", "drains")
+                                 for psu, output in targets.get(role, []) if psu.driver is not None]
+        self.sweep_points, elapsed = engine.run(grid, on_point=lambda point: self.record_point(point, node_id),
+                                                should_stop=lambda: not self.running, first=first)
+        self.last_point = engine.last_point
+        self.log(f"   ⏱ Sweep: {self.sweep_points} points in {elapsed:.3f} s")
+
+    def record_point(self, point, node_id=None):
+        # Streams one measurement to the run's result store as soon as it is captured
+        freqs = point.get('freqs')
+        self.store.append({
+            "timestamp": time.time(),
+            "freq": point.get('freq'),
+            "power": point.get('power'),
+            "trace_start": freqs[0] if freqs is not None and len(freqs) else None,
+            "trace_stop": freqs[-1] if freqs is not None and len(freqs) else None,
+            "trace": point.get('levels'),
+            **self.psu_readback(),
+        })
+        if node_id is not None and point.get('index') is not None:
+            self.journal.point(node_id, point['index'], self.store.rows, self.store.sync(), self.shadow_snapshot())
+
+    def psu_readback(self):
+        # V/I of every bias output at this point: the telemetry buffers' newest row while the
+        # poller runs (no bus traffic), otherwise one measure_all per supply
+        polled = self.telemetry is not None and self.telemetry.running()
+        measured = {}
+        columns = {}
+        for psu, ch in self.readback_outputs:
+            volts = amps = None
+            if polled:
+                row = self.telemetry.latest(psu.name)
+                if row is not None:
+                    volts, amps = row[2 * ch - 1], row[2 * ch]
+            else:
+                if psu.name not in measured:
+                    try:
+                        measured[psu.name] = psu.driver.measure_all()
+                    except Exception:
+                        measured[psu.name] = {}
+                volts, amps = measured[psu.name].get(ch, (None, None))
+            columns[f"{psu.name}_ch{ch}_v"] = volts
+            columns[f"{psu.name}_ch{ch}_i"] = amps
+        return columns
+
+    def shadow_snapshot(self):
+        # Settings as last written to the generator and analyzer, for the run journal
+        return {name: dict(shadow_for(instrument).sent) for name, instrument in
+                (("siggen", self.bench.siggen), ("specan", self.bench.specan)) if instrument is not None}
+
+    def node_done(self, node):
+        # Called by RecipeExecutor after each finished step
+        self.journal.node(node, self.store.rows, self.store.sync(), self.shadow_snapshot())
+
+    def restore(self, state, cfg):
+        # Puts the bench back where the checkpoint left it, sending only settings that differ
+        if self.bench.trace_reader is not None:
+            self.bench.trace_reader.invalidate()
+        if state.analyzer:
+            self.claim_analyzer()
+        if state.bias is not None:
+            self.log("   Restoring bias")
+            self.bias_on({**cfg, **state.bias})
+        for name, settings in state.shadows.items():
+            instrument = getattr(self.bench, name)
+            if instrument is None or not settings:
+                continue
+            changes = shadow_for(instrument).restore(instrument, list(settings.items()))
+            self.log(f"   Restored {name}: {len(changes)} of {len(settings)} settings re-sent")
+        if state.rf is not None:
+            self.bench.siggen.write("OUTP ON")
+
+    def run(self, cfg, run_id=None, recipe=None, resume=None):
+        # Returns a machine-readable summary of the run; recipe is a compiled recipe.Recipe.
+        # resume: directory of an earlier run of the same recipe that failed or was stopped; its
+        # setup values are reused, finished steps and measured points are skipped, and the bench
+        # is restored to its last checkpoint first
+        recipe = recipe or DEFAULT
+        state = None
+        if resume is not None:
+            state = read_journal(resume)
+            if state.status == "complete":
+                raise ValueError(f"{resume} already completed")
+            if state.nodes != [node.id for node in recipe.nodes]:
+                raise ValueError(f"{resume} was run with recipe {state.recipe!r}; resume it with the same recipe")
+            cfg = state.cfg
+
+        self.running = True
+        self.sweep_points = 0
+        self.last_point = None
+        self.step_times = {}
+        self.node_times = {}
+        self.analyzer_wait = 0.0
+        self.analysis = None  # run summary from an "analyze" recipe step
+        if state is not None:
+            root, run_id = os.path.split(os.path.normpath(resume))
+            self.store = ResultStore(root, run_id, resume_rows=state.rows)
+            self.resume_points = dict(state.points)
+        else:
+            self.store = ResultStore(self.results_root, run_id)
+            self.resume_points = {}
+        self.journal = RunJournal(self.store.path)
+        self.journal.start(cfg, recipe, resumed=state is not None)
+        summary = {"run_id": self.store.run_id, "path": self.store.path, "status": "stopped", "error": None,
+                   "recipe": recipe.name}
+        if state is not None:
+            summary["resumed"] = {"rows": state.rows, "skipped_steps": len(state.done)}
+        start = time.perf_counter()
+        executor = RecipeExecutor(self)
+
+        try:
+            completed = False
+            try:
+                recipe.check(cfg)
+                check_outputs(*self.bench.bias_outputs())
+                if self.abort is not None:
+                    if self.abort.tripped.is_set():
+                        raise Exception(f"Abort active ({self.abort.reason}); clear it before running")
+                    self.arm_protection(cfg)
+
+                if state is not None:
+                    self.log(f"⏯ Resuming {self.store.run_id}: {len(state.done)} steps and {state.rows} rows kept")
+                    self.restore(state, cfg)
+                completed = executor.run(recipe.nodes, cfg, done=state.done if state else ())
+            except Exception as e:
+                self.status("Error", "red")
+                self.log(f"❌ Error: {str(e)}")
+                summary["status"] = "error"
+                summary["error"] = str(e)
+            finally:
+                self.release_analyzer()
+
+            if recipe.final and not (self.abort is not None and self.abort.tripped.is_set()):
+                # Cleanup runs after completion, stop and failure alike
+                self.running = True
+                try:
+                    executor.run(recipe.final, cfg)
+                except Exception as e:
+                    self.status("Error", "red")
+                    self.log(f"❌ Cleanup error: {str(e)}")
+                    completed = False
+                    if summary["error"] is None:
+                        summary["status"] = "error"
+                        summary["error"] = f"cleanup: {e}"
+
+            if completed and summary["status"] == "stopped":
+                self.status("Complete", "green")
+                self.log("✅ Test Complete")
+                summary["status"] = "complete"
+        finally:
+            self.store.close()
+            self.running = False
+            summary["rows"] = self.store.rows
+            summary["elapsed"] = time.perf_counter() - start
+            summary["steps"] = self.step_times
+            summary["nodes"] = self.node_times
+            summary["analyzer_wait"] = self.analyzer_wait
+            if self.analysis is not None:
+                summary["analysis"] = self.analysis
+            if self.abort is not None and self.abort.tripped.is_set():
+                summary["status"] = "aborted"
+                summary["abort"] = self.abort.report()
+            self.journal.end(summary["status"])
+            self.journal.close()
+        return summary
@@ -0,0 +1,199 @@
+import os
+import difflib
+import threading
+
+# Setup files: KEY = value lines, "#" or ";" comments, "include other.txt" (relative to the
+# including file). Later lines override earlier ones, so a short file can include a base setup
+# and change a few values. Files are validated against SCHEMA before anything touches a bench,
+# and compiled results are cached until one of the files involved changes on disk.
+
+# key -> (type, minimum, maximum, description)
+SCHEMA = {
+    "VGDRV": (float, -30.0, 30.0, "gate voltage (V)"),
+    "VDDRV": (float, 0.0, 80.0, "drain voltage (V)"),
+    "IDDRV": (float, 0.0, 20.0, "drain current limit (A)"),
+    "IGDRV": (float, 0.0, 20.0, "gate current limit (A)"),
+    "LOSWPFREQMZ": (float, 0.0, 110e3, "sweep start frequency (MHz)"),
+    "HISWPFREQMZ": (float, 0.0, 110e3, "sweep stop frequency (MHz)"),
+    "LOSWPPWR": (float, -150.0, 30.0, "sweep start power (dBm)"),
+    "HISWPPWR": (float, -150.0, 30.0, "sweep stop power (dBm)"),
+    "SWPFREQPTS": (int, 1, 100000, "frequency points"),
+    "SWPPWRPTS": (int, 1, 100000, "power points"),
+    "OVPDRV": (float, 0.0, 80.0, "drain over-voltage limit (V)"),
+    "OCPDRV": (float, 0.0, 20.0, "drain over-current limit (A)"),
+}
+
+ROLES = ("Gate", "Drain", "None")
+
+_cache = {}  # absolute path -> (signature, config)
+_cache_lock = threading.Lock()
+
+
+class SetupError(Exception):
+    # Every problem found in a file (and its includes), one "path:line: message" per line
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("\n".join(f"{path}:{line}: {message}" for path, line, message in problems))
+
+
+def _strip_comment(line):
+    for marker in ("#", ";"):
+        line = line.split(marker, 1)[0]
+    return line.strip()
+
+
+def _convert(key, text):
+    kind, low, high, description = SCHEMA[key]
+    try:
+        value = kind(float(text)) if kind is int and float(text).is_integer() else kind(text)
+    except ValueError:
+        raise ValueError(f"{key}: expected {kind.__name__} ({description}), got {text!r}")
+    if not low <= value <= high:
+        raise ValueError(f"{key}={value} outside {low}..{high} ({description})")
+    return value
+
+
+def _read(path, values, lines, problems, stack, files, origin=None):
+    # origin: (file, line) of the include that named this file
+    path = os.path.abspath(path)
+    origin = origin or (path, 0)
+    if path in stack:
+        problems.append((*origin, f"include cycle: {' -> '.join(stack + [path])}"))
+        return
+    try:
+        stat = os.stat(path)
+        with open(path, "r") as f:
+            text = f.read().splitlines()
+    except OSError as e:
+        problems.append((*origin, f"cannot read {path}: {e.strerror}"))
+        return
+    files.append((path, stat.st_mtime_ns, stat.st_size))
+
+    for number, raw in enumerate(text, start=1):
+        line = _strip_comment(raw)
+        if not line:
+            continue
+        if line.lower().startswith("include ") or line.lower().startswith("include\t"):
+            target = line[len("include"):].strip().strip('"\'')
+            _read(os.path.join(os.path.dirname(path), target), values, lines, problems, stack + [path], files, (path, number))
+            continue
+        key, sep, text_value = line.partition("=")
+        key, text_value = key.strip().upper(), text_value.strip()
+        if not sep or not key:
+            problems.append((path, number, f"expected KEY = value, got {raw.strip()!r}"))
+            continue
+        if key not in SCHEMA:
+            close = difflib.get_close_matches(key, SCHEMA, n=1)
+            hint = f" (did you mean {close[0]}?)" if close else ""
+            problems.append((path, number, f"unknown key {key}{hint}"))
+            continue
+        if not text_value:
+            problems.append((path, number, f"{key} has no value"))
+            continue
+        try:
+            values[key] = _convert(key, text_value)
+            lines[key] = (path, number)
+        except ValueError as e:
+            problems.append((path, number, str(e)))
+
+
+def _check(config, lines, problems):
+    # Checks that involve more than one key
+    low, high = config.get("LOSWPFREQMZ"), config.get("HISWPFREQMZ")
+    if low is not None and high is not None and high < low:
+        problems.append((*lines["HISWPFREQMZ"], f"HISWPFREQMZ={high} is below LOSWPFREQMZ={low}"))
+    if "OVPDRV" in config and "VDDRV" in config and config["VDDRV"] >= config["OVPDRV"]:
+        problems.append((*lines["OVPDRV"], f"OVPDRV={config['OVPDRV']} would trip at VDDRV={config['VDDRV']}"))
+
+
+def _signature_current(signature):
+    for path, mtime_ns, size in signature:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            return False
+    return True
+
+
+def load_setup(path, overrides=None):
+    # Returns {KEY: value}; raises SetupError listing every problem. overrides (a dict) win over
+    # the files and are validated the same way.
+    path = os.path.abspath(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached is not None and _signature_current(cached[0]):
+        config = dict(cached[1])
+    else:
+        values, lines, problems, files = {}, {}, [], []
+        _read(path, values, lines, problems, [], files)
+        if not problems:
+            _check(values, lines, problems)
+        if problems:
+            raise SetupError(problems)
+        with _cache_lock:
+            _cache[path] = (tuple(files), dict(values))
+        config = values
+
+    if overrides:
+        config = apply_overrides(config, overrides)
+    return config
+
+
+def apply_overrides(config, overrides, source="<overrides>"):
+    # Returns a copy of config with overrides (a dict) validated against SCHEMA and applied
+    config = dict(config)
+    problems = []
+    for key, value in overrides.items():
+        key = key.upper()
+        if key not in SCHEMA:
+            close = difflib.get_close_matches(key, SCHEMA, n=1)
+            hint = f" (did you mean {close[0]}?)" if close else ""
+            problems.append((source, 0, f"unknown key {key}{hint}"))
+            continue
+        try:
+            config[key] = _convert(key, str(value))
+        except ValueError as e:
+            problems.append((source, 0, str(e)))
+    if not problems:
+        _check(config, {key: (source, 0) for key in config}, problems)
+    if problems:
+        raise SetupError(problems)
+    return config
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def load_roles(path):
+    # PSU role file, one output per line: "PS1_Output1_Gate" or CSV "PS1,1,Gate[,label]".
+    # Returns [{'psu': 'PS1', 'output': 'Output1', 'role': 'Gate'}] in the App.assignment_data format.
+    roles, problems = [], []
+    with open(path, "r") as f:
+        text = f.read().splitlines()
+    for number, raw in enumerate(text, start=1):
+        line = _strip_comment(raw)
+        if not line:
+            continue
+        parts = [p.strip() for p in (line.split(",") if "," in line else line.split("_"))]
+        if parts[0].lower() == "psu":
+            continue  # CSV header
+        if len(parts) < 3 or ("," not in line and len(parts) != 3):
+            problems.append((path, number, f"expected PSU_OutputN_Role or psu,output,role, got {raw.strip()!r}"))
+            continue
+        psu, output, role = parts[:3]
+        channel = output.lower().replace("output", "").strip()
+        if channel not in ("1", "2"):
+            problems.append((path, number, f"unknown output {output!r}"))
+            continue
+        role = role.capitalize()
+        if role not in ROLES:
+            problems.append((path, number, f"unknown role {role!r} (expected {', '.join(ROLES)})"))
+            continue
+        roles.append({'psu': psu.upper(), 'output': f"Output{channel}", 'role': role})
+    if problems:
+        raise SetupError(problems)
+    return roles
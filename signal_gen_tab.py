@@ -1,8 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import pyvisa
 import os
 import ntpath
+from arb_transfer import ArbUploader, describe, parse_catalog
+from scpi_cache import shadow_for
 
 class SignalGeneratorTab:
     def __init__(self, parent, devices):
@@ -10,9 +11,10 @@ class SignalGeneratorTab:
         self.parent = parent
         self.frame = ttk.Frame(parent)
 
-        self.rm = pyvisa.ResourceManager()
         self.siggen = None
         self.connected = False
+        self.arb = None
+        self.shadow = None
 
         self.build_ui()
 
@@ -105,6 +107,10 @@ class SignalGeneratorTab:
             idn = self.siggen.query("*IDN?").strip()
             self.status_label.config(text=f"Connected: {idn}", foreground="green")
             self.connected = True
+            self.arb = ArbUploader(self.siggen)
+            # The instrument may have been changed while we were away
+            self.shadow = shadow_for(self.siggen)
+            self.shadow.invalidate()
 
     def on_waveform_change(self, event=None):
         if self.waveform_var.get() == "Choose My Own":
@@ -126,54 +132,52 @@ class SignalGeneratorTab:
             messagebox.showwarning("Not Connected", "Connect to the signal generator first.")
             return
 
+        values = self.snapshot()
         try:
-            freq_val = float(self.freq_val_var.get())
-            unit = self.freq_unit_var.get()
-            multiplier = {"Hz": 1, "kHz": 1e3, "GHz": 1e9}[unit]
-            freq = freq_val * multiplier
-
-            power = float(self.power_var.get())
-            wave = self.waveform_var.get()
-            rf_on = self.output_state.get()
-
-            self.siggen.write(f"FREQ {freq}")
-            self.siggen.write(f"POW {power}")
-
-            if wave == "Choose My Own":
-                filepath = self.arb_file_var.get()
-                if not filepath:
+            arb = None
+            if values["wave"] == "Choose My Own":
+                if not values["arb_file"]:
                     messagebox.showwarning("Missing File", "Please select a waveform file.")
                     return
 
                 try:
-                    filename = ntpath.basename(filepath)
-                    arb_name = "WAVE1"
-
-                    with open(filepath, 'rb') as f:
-                        file_contents = f.read()
-
-                    header = f"MMEM:DATA:LOAD '{arb_name}',#{len(str(len(file_contents)))}{len(file_contents)}"
-                    self.siggen.write_raw(header.encode('ascii') + file_contents)
-
-                    self.siggen.write(f"SOUR:ARB:WAV '{arb_name}'")
-                    self.siggen.write("SOUR:FUNC ARB")
-
-                    repeat_mode = self.repeat_mode_var.get()
-                    self.siggen.write("SOUR:ARB:REP ON" if repeat_mode == "Repeat" else "SOUR:ARB:REP OFF")
-
+                    # Skipped when this content is already on the instrument
+                    arb = self.arb.upload(values["arb_file"])
                 except Exception as e:
                     messagebox.showerror("ARB Upload Failed", str(e))
                     return
-            else:
-                self.siggen.write(f"FUNC {wave}")
 
-            self.siggen.write("OUTP ON" if rf_on else "OUTP OFF")
-            self.rf_status_led.config(foreground="green" if rf_on else "red")
+            self.send_settings(values, arb)
+            self.rf_status_led.config(foreground="green" if values["rf_on"] else "red")
 
-            messagebox.showinfo("Success", "Settings applied successfully.")
+            message = "Settings applied successfully."
+            if arb is not None:
+                message += "\n" + describe(arb)
+            messagebox.showinfo("Success", message)
         except Exception as e:
             messagebox.showerror("Command Error", str(e))
 
+    def snapshot(self):
+        # The form as it stands; read on the Tk thread, used by send_settings from any thread
+        return {
+            "freq": self.freq_val_var.get(), "unit": self.freq_unit_var.get(), "power": self.power_var.get(),
+            "wave": self.waveform_var.get(), "arb_file": self.arb_file_var.get(),
+            "repeat": self.repeat_mode_var.get(), "rf_on": self.output_state.get(),
+        }
+
+    def send_settings(self, values, arb=None, freq=None, power=None):
+        # No Tk: sends snapshot() values (freq/power in Hz/dBm override the form's); arb is the
+        # ArbUploader result when the waveform is a file. Raises on bad values.
+        if freq is None:
+            freq = float(values["freq"]) * {"Hz": 1, "kHz": 1e3, "GHz": 1e9}[values["unit"]]
+        settings = [("FREQ", freq), ("POW", float(values["power"]) if power is None else power)]
+        if values["wave"] == "Choose My Own":
+            settings += self.arb_settings(arb["name"], values["repeat"])
+        else:
+            settings.append(("FUNC", values["wave"]))
+        # Only changed settings go out; the output state is always sent, in the same message
+        self.shadow.apply(self.siggen, settings, ["OUTP ON" if values["rf_on"] else "OUTP OFF"])
+
     def list_waveforms(self):
         if not self.connected or not self.siggen:
             messagebox.showwarning("Not Connected", "Connect to the signal generator first.")
@@ -183,6 +187,8 @@ class SignalGeneratorTab:
             self.siggen.write("MMEM:CD '/var/user/Waveforms'")
             response = self.siggen.query(f'MMEM:CAT? "/var/user/Waveforms"')
             files = response.strip().split(',')
+            if self.arb is not None:
+                self.arb.known = parse_catalog(response)
 
             self.arb_listbox.delete(0, tk.END)
             for i in range(0, len(files), 2):
@@ -206,17 +212,23 @@ class SignalGeneratorTab:
             if not selected or selected.startswith("No ARB"):
                 return
 
-            self.siggen.write(f"SOUR:ARB:WAV '{selected}'")
-            self.siggen.write("SOUR:FUNC ARB")
-
-            repeat_mode = self.repeat_mode_var.get()
-            self.siggen.write("SOUR:ARB:REP ON" if repeat_mode == "Repeat" else "SOUR:ARB:REP OFF")
+            self.shadow.apply(self.siggen, self.arb_settings(selected, self.repeat_mode_var.get()))
 
             messagebox.showinfo("ARB Loaded", f"Waveform '{selected}' is now active.")
 
         except Exception as e:
             messagebox.showerror("Load Failed", str(e))
 
+    def arb_settings(self, arb_name, repeat_mode):
+        repeat = "ON" if repeat_mode == "Repeat" else "OFF"
+        return [("SOUR:ARB:WAV", f"'{arb_name}'"), ("FUNC", "ARB"), ("SOUR:ARB:REP", repeat)]
+
+    def set_frequency(self, freq):
+        self.shadow.apply(self.siggen, [("FREQ", freq)])
+
+    def set_power(self, power):
+        self.shadow.apply(self.siggen, [("POW", power)])
+
     def configure_from_setup(self, cfg):
 
         try:
@@ -0,0 +1,512 @@
+import time
+import threading
+import numpy as np
+
+# In-process stand-ins for the bench instruments so drivers, tabs and the sequencer can run
+# without hardware. Select with VISA_BACKEND=sim, or pass SimulatedResourceManager to
+# VisaSessionPool. Every transaction costs `latency` seconds; write_raw also costs bytes/throughput.
+
+
+class SimulatedInstrument:
+    idn = "SIM,GENERIC,0,1.0"
+
+    def __init__(self, address, latency=0.002, throughput=1e6):
+        self.address = address
+        self.resource_name = address
+        self.latency = latency
+        self.throughput = throughput  # bytes/s for write_raw payloads
+        self.timeout = 2000
+        self.open_timeout = 0
+        self.read_termination = "\n"
+        self.write_termination = "\n"
+        self.send_end = True
+        self.session = 1
+        self.transactions = 0
+        self.errors = []
+        self.esr = 0
+        self.opc_armed = False
+        self.busy_until = 0.0
+        self._output = []
+        self._pending = b""
+        self._lock = threading.Lock()
+
+    # --- VISA resource surface -------------------------------------------------
+
+    def write(self, message):
+        with self._lock:
+            self._transaction()
+            self._execute(message)
+
+    def query(self, message):
+        with self._lock:
+            self._transaction()
+            responses = self._execute(message)
+            if not responses:
+                raise TimeoutError(f"VI_ERROR_TMO: no response to {message!r}")
+            self._output = []
+            return ";".join(str(r) for r in responses) + "\n"
+
+    def read(self):
+        with self._lock:
+            self._transaction()
+            if not self._output:
+                raise TimeoutError("VI_ERROR_TMO: nothing to read")
+            return str(self._output.pop(0)) + "\n"
+
+    def read_raw(self):
+        with self._lock:
+            self._transaction()
+            if not self._output:
+                raise TimeoutError("VI_ERROR_TMO: nothing to read")
+            value = self._output.pop(0)
+            return value if isinstance(value, bytes) else (str(value) + "\n").encode("ascii")
+
+    def write_raw(self, data):
+        # With send_end False the bytes are held until a write that asserts END
+        with self._lock:
+            self._transaction(len(data))
+            self._pending += bytes(data)
+            if self.send_end:
+                data, self._pending = self._pending, b""
+                self._raw(data)
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list, **kwargs):
+        with self._lock:
+            self._transaction()
+            responses = self._execute(message)
+            block = responses[0]
+            length_digits = int(block[1:2])
+            length = int(block[2:2 + length_digits])
+            offset = 2 + length_digits
+            dtype = np.dtype(datatype).newbyteorder(">" if is_big_endian else "<")
+            values = np.frombuffer(block, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+            self._output = []
+            return values if container is np.ndarray else container(values)
+
+    def clear(self):
+        self._output = []
+
+    def close(self):
+        self.session = None
+
+    # --- SCPI engine -----------------------------------------------------------
+
+    def _transaction(self, payload_bytes=0):
+        if self.session is None:
+            raise Exception(f"Invalid session: {self.address} is closed")
+        self.transactions += 1
+        delay = self.latency + payload_bytes / self.throughput
+        if delay:
+            time.sleep(delay)
+
+    def _execute(self, message):
+        responses = []
+        for part in message.strip().split(";"):
+            part = part.strip().lstrip(":")
+            if not part:
+                continue
+            header, _, args = part.partition(" ")
+            response = self.handle(header.upper(), args.strip())
+            if response is not None:
+                responses.append(response)
+                self._output.append(response)
+        return responses
+
+    def _raw(self, data):
+        # Default: treat raw bytes as a plain message
+        self._execute(data.decode("ascii", errors="replace"))
+
+    def busy(self):
+        return time.perf_counter() < self.busy_until
+
+    def handle(self, header, args):
+        if header == "*IDN?":
+            return self.idn
+        if header == "*RST":
+            self.reset()
+            return None
+        if header == "*CLS":
+            self.esr = 0
+            self.errors = []
+            return None
+        if header == "*OPC":
+            self.opc_armed = True
+            return None
+        if header == "*OPC?":
+            remaining = self.busy_until - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            return "1"
+        if header == "*ESR?":
+            if self.opc_armed and not self.busy():
+                self.esr |= 0x01
+                self.opc_armed = False
+            value, self.esr = self.esr, 0
+            return str(value)
+        if header == "*TRG":
+            self.trigger()
+            return None
+        if header in ("STAT:OPER:COND?", "STAT:OPER?"):
+            return "8" if self.busy() else "0"
+        if header in ("SYST:ERR?", "SYST:ERR:NEXT?"):
+            return self.errors.pop(0) if self.errors else '+0,"No error"'
+        self.errors.append(f'-113,"Undefined header;{header}"')
+        return None
+
+    def reset(self):
+        self.esr = 0
+        self.opc_armed = False
+        self.busy_until = 0.0
+
+    def trigger(self):
+        pass
+
+
+class SimulatedPSU(SimulatedInstrument):
+    def __init__(self, address, model, channels=2, select_prefix="CH", latency=0.002, **kwargs):
+        super().__init__(address, latency, **kwargs)
+        self.model = model
+        self.idn = f"Keysight Technologies,{model},SIM{sum(address.encode()) % 100000:05d},1.0"
+        self.channels = channels
+        self.select_prefix = select_prefix
+        self.load_ohms = 100.0
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.selected = 1
+        self.state = {ch: {"volt": 0.0, "curr": 0.0, "output": False, "ovp": None, "tripped": False,
+                           "slew": None, "mode": "FIX", "list_volt": [], "list_dwell": [], "armed": False, "run": None}
+                      for ch in range(1, self.channels + 1)}
+
+    def channel_args(self, args):
+        # "1,2,(@1)" -> ("1,2", [1]); no channel list means the selected channel
+        if "(@" not in args:
+            return args, [self.selected]
+        values, _, chans = args.partition("(@")
+        return values.rstrip(", "), [int(c) for c in chans.rstrip(")").split(",")]
+
+    def level(self, state):
+        # Output voltage, following a running list (with slew) when in LIST mode
+        if state["mode"] != "LIST" or state["run"] is None:
+            return state["volt"]
+        started, level = state["run"]
+        elapsed = time.perf_counter() - started
+        for target, dwell in zip(state["list_volt"], state["list_dwell"]):
+            if elapsed < dwell:
+                if state["slew"] is None:
+                    return target
+                step = min(state["slew"] * elapsed, abs(target - level))
+                return level + step if target >= level else level - step
+            elapsed -= dwell
+            level = target
+        return level  # LIST:TERM:LAST ON
+
+    def handle(self, header, args):
+        header = header.replace("SOUR:", "")
+        ch = self.state[self.selected]
+        if header == "INST:SEL":
+            self.selected = int(args.upper().replace(self.select_prefix, "").replace("OUT", "").replace("CH", ""))
+            return None
+        if header == "VOLT":
+            ch["volt"] = float(args)
+            if ch["ovp"] is not None and abs(ch["volt"]) > ch["ovp"]:
+                ch["output"] = False
+                ch["tripped"] = True
+            return None
+        if header == "CURR":
+            ch["curr"] = float(args)
+            return None
+        if header == "APPL":
+            volt, _, curr = args.partition(",")
+            ch["volt"] = float(volt)
+            ch["curr"] = float(curr or 0)
+            return None
+        if header == "OUTP":
+            state, _, chans = args.partition(",")
+            targets = [int(c) for c in chans.strip("(@)").split(",")] if chans else [self.selected]
+            for target in targets:
+                self.state[target]["output"] = state.strip().upper() in ("ON", "1") and not self.state[target]["tripped"]
+            return None
+        if header == "VOLT:PROT":
+            ch["ovp"] = float(args)
+            return None
+        if header in ("VOLT:SLEW", "LIST:VOLT", "LIST:DWEL", "VOLT:MODE", "INIT:TRAN", "ABOR:TRAN"):
+            values, chans = self.channel_args(args)
+            for target in chans:
+                state = self.state[target]
+                if header == "VOLT:SLEW":
+                    state["slew"] = None if values.upper().startswith("MAX") else float(values)
+                elif header == "LIST:VOLT":
+                    state["list_volt"] = [float(v) for v in values.split(",")]
+                elif header == "LIST:DWEL":
+                    state["list_dwell"] = [float(v) for v in values.split(",")]
+                elif header == "VOLT:MODE":
+                    state["mode"] = values.upper()
+                    state["run"] = None
+                elif header == "INIT:TRAN":
+                    state["armed"] = True
+                else:
+                    state["armed"] = False
+                    state["run"] = None
+            return None
+        if header in ("LIST:CURR", "LIST:COUN", "LIST:STEP", "LIST:TERM:LAST", "CURR:MODE", "TRIG:TRAN:SOUR"):
+            return None
+        if header in ("VOLT:PROT:STAT", "CURR:PROT:STAT"):
+            return None
+        if header == "OUTP:PROT:CLE":
+            ch["tripped"] = False
+            return None
+        if header == "VOLT?":
+            return f"{ch['volt']:.6f}"
+        if header == "CURR?":
+            return f"{ch['curr']:.6f}"
+        if header == "OUTP?":
+            return "1" if ch["output"] else "0"
+        if header in ("MEAS:VOLT?", "MEAS:CURR?"):
+            index = 0 if header == "MEAS:VOLT?" else 1
+            if args.startswith("(@"):
+                chans = [int(c) for c in args.strip("(@)").split(",")]
+                return ",".join(f"{self.measured(c)[index]:.6f}" for c in chans)
+            return f"{self.measured(self.selected)[index]:.6f}"
+        return super().handle(header, args)
+
+    def trigger(self):
+        for state in self.state.values():
+            if state["armed"] and state["mode"] == "LIST":
+                state["run"] = (time.perf_counter(), state["volt"])
+                state["armed"] = False
+
+    def measured(self, ch):
+        # Resistive load model: I = |V| / load_ohms, clamped at the current limit
+        state = self.state[ch]
+        if not state["output"]:
+            return 0.0, 0.0
+        volts = self.level(state)
+        if state["ovp"] is not None and abs(volts) > state["ovp"]:
+            state["output"] = False
+            state["tripped"] = True
+            return 0.0, 0.0
+        current = min(abs(volts) / self.load_ohms, state["curr"])
+        return volts, current
+
+
+class SimulatedSignalGenerator(SimulatedInstrument):
+    idn = "Keysight Technologies,N5182B,SIM00001,1.0"
+
+    def reset(self):
+        super().reset()
+        self.freq = 1e9
+        self.power = -135.0
+        self.output = False
+        self.func = "SIN"
+        self.arb_name = None
+        self.arb_repeat = True
+        self.files = {}  # name -> bytes
+        self.list_freq = []
+        self.list_power = []
+        self.list_index = 0
+        self.freq_mode = "CW"
+
+    def __init__(self, address, latency=0.002, **kwargs):
+        super().__init__(address, latency, **kwargs)
+        self.reset()
+
+    def handle(self, header, args):
+        header = header.replace("SOUR:", "")
+        if header == "FREQ":
+            self.freq = float(args)
+            return None
+        if header == "POW":
+            self.power = float(args)
+            return None
+        if header in ("FUNC",):
+            self.func = args
+            return None
+        if header == "OUTP":
+            self.output = args.upper() in ("ON", "1")
+            return None
+        if header == "FREQ?":
+            return f"{self.freq:.6f}"
+        if header == "POW?":
+            return f"{self.power:.2f}"
+        if header == "OUTP?":
+            return "1" if self.output else "0"
+        if header == "FUNC?":
+            return self.func
+        if header == "ARB:WAV?":
+            return f'"{self.arb_name or ""}"'
+        if header == "ARB:WAV":
+            self.arb_name = args.strip("'\"")
+            return None
+        if header == "ARB:REP":
+            self.arb_repeat = args.upper() in ("ON", "1")
+            return None
+        if header == "MMEM:CD":
+            return None
+        if header == "MMEM:CAT?":
+            # <used>,<free>,"name,type,size",...
+            entries = [f'"{name},BIN,{len(data)}"' for name, data in self.files.items()]
+            return ",".join(["0", "0"] + entries)
+        if header == "LIST:FREQ":
+            self.list_freq = [float(v) for v in args.split(",")]
+            return None
+        if header == "LIST:POW":
+            self.list_power = [float(v) for v in args.split(",")]
+            return None
+        if header in ("LIST:TYPE", "LIST:TRIG:SOUR", "TRIG:SOUR", "INIT:CONT", "LIST:DWEL", "POW:MODE"):
+            return None
+        if header == "FREQ:MODE":
+            self.freq_mode = args.upper()
+            return None
+        if header == "INIT":
+            self.list_index = 0
+            self._apply_list_point()
+            return None
+        return super().handle(header, args)
+
+    def trigger(self):
+        if self.freq_mode == "LIST" and self.list_freq:
+            self.list_index = min(self.list_index + 1, len(self.list_freq) - 1)
+            self._apply_list_point()
+
+    def _apply_list_point(self):
+        if self.freq_mode == "LIST" and self.list_freq:
+            self.freq = self.list_freq[self.list_index]
+            if self.list_power:
+                self.power = self.list_power[min(self.list_index, len(self.list_power) - 1)]
+
+    def _raw(self, data):
+        # MMEM:DATA:LOAD '<name>',#<n><len><payload>
+        if data.startswith(b"MMEM:DATA"):
+            quote = data.index(b"'")
+            name_end = data.index(b"'", quote + 1)
+            name = data[quote + 1:name_end].decode("ascii")
+            hash_pos = data.index(b"#", name_end)
+            digits = int(data[hash_pos + 1:hash_pos + 2])
+            length = int(data[hash_pos + 2:hash_pos + 2 + digits])
+            start = hash_pos + 2 + digits
+            self.files[name] = data[start:start + length]
+            return
+        super()._raw(data)
+
+
+class SimulatedSpectrumAnalyzer(SimulatedInstrument):
+    idn = "Keysight Technologies,N9020A,SIM00002,A.1.0"
+
+    def __init__(self, address, latency=0.002, sweep_time=0.02, source=None, **kwargs):
+        super().__init__(address, latency, **kwargs)
+        self.sweep_time = sweep_time
+        self.source = source  # SimulatedSignalGenerator feeding the input, if any
+        self.rng = np.random.default_rng(0)
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.start = 10e6
+        self.stop = 3e9
+        self.points = 1001
+        self.ref_level = 0.0
+        self.rbw = 1e6
+        self.binary = False
+
+    def handle(self, header, args):
+        if header == "FREQ:STAR":
+            self.start = float(args)
+            return None
+        if header == "FREQ:STOP":
+            self.stop = float(args)
+            return None
+        if header == "SWE:POIN":
+            self.points = int(float(args))
+            return None
+        if header == "FREQ:STAR?":
+            return f"{self.start:.6f}"
+        if header == "FREQ:STOP?":
+            return f"{self.stop:.6f}"
+        if header == "SWE:POIN?":
+            return str(self.points)
+        if header == "DISP:TRAC:Y:RLEV?":
+            return f"{self.ref_level:.2f}"
+        if header == "BAND:RES?":
+            return f"{self.rbw:.6f}"
+        if header == "DISP:TRAC:Y:RLEV":
+            self.ref_level = float(args)
+            return None
+        if header == "BAND:RES":
+            self.rbw = float(args)
+            return None
+        if header in ("TRIG:SOUR", "INIT:CONT", "FORM:BORD"):
+            return None
+        if header == "FORM":
+            self.binary = args.upper().startswith("REAL")
+            return None
+        if header in ("INIT", "INIT:IMM"):
+            self.busy_until = time.perf_counter() + self.sweep_time
+            return None
+        if header == "ABOR":
+            self.busy_until = 0.0
+            return None
+        if header == "TRAC:DATA?":
+            trace = self.trace()
+            if not self.binary:
+                return ",".join(f"{v:.3f}" for v in trace)
+            payload = trace.astype("<f4").tobytes()
+            length = str(len(payload))
+            return f"#{len(length)}{length}".encode("ascii") + payload
+        return super().handle(header, args)
+
+    def trace(self):
+        remaining = self.busy_until - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        freqs = np.linspace(self.start, self.stop, self.points)
+        levels = -90.0 + self.rng.normal(0.0, 1.0, self.points)
+        if self.source is not None and self.source.output:
+            # Tone plus 2nd/3rd harmonics at the generator frequency, one-bin wide at RBW
+            width = max(self.rbw, (self.stop - self.start) / max(self.points - 1, 1))
+            for order, drop in ((1, 0.0), (2, 30.0), (3, 40.0)):
+                tone = self.source.freq * order
+                level = self.source.power - drop
+                levels = np.maximum(levels, level - 12.0 * ((freqs - tone) / width) ** 2)
+        return levels
+
+
+def default_bench(latency=0.002, sweep_time=0.02):
+    # Mirrors the addresses hard-coded in App.devices
+    siggen = SimulatedSignalGenerator("GPIB0::28::INSTR", latency)
+    return {
+        "GPIB0::10::INSTR": SimulatedPSU("GPIB0::10::INSTR", "E3648A", select_prefix="OUT", latency=latency),
+        "GPIB0::11::INSTR": SimulatedPSU("GPIB0::11::INSTR", "E36312A", latency=latency),
+        "GPIB0::15::INSTR": SimulatedPSU("GPIB0::15::INSTR", "E36234A", latency=latency),
+        "USB0::0x2A8D::0x3402::MY61002290::INSTR": SimulatedPSU(
+            "USB0::0x2A8D::0x3402::MY61002290::INSTR", "E36232A", channels=1, latency=latency),
+        "USB0::0x2A8D::0x1601::MY00000001::INSTR": SimulatedPSU(
+            "USB0::0x2A8D::0x1601::MY00000001::INSTR", "U2044XA", channels=1, latency=latency),
+        "GPIB0::28::INSTR": siggen,
+        "GPIB0::18::INSTR": SimulatedSpectrumAnalyzer("GPIB0::18::INSTR", latency, sweep_time, source=siggen),
+    }
+
+
+class SimulatedResourceManager:
+    def __init__(self, instruments=None, latency=0.002, open_latency=0.01, sweep_time=0.02):
+        self.instruments = instruments if instruments is not None else default_bench(latency, sweep_time)
+        self.open_latency = open_latency
+
+    def list_resources(self, query="?*::INSTR"):
+        prefix = query.split("?")[0].upper()
+        return tuple(a for a in self.instruments if a.upper().startswith(prefix))
+
+    def open_resource(self, address, open_timeout=None, **kwargs):
+        time.sleep(self.open_latency)
+        instrument = self.instruments.get(address)
+        if instrument is None:
+            # A dead address costs the whole open timeout on a real bus
+            time.sleep((open_timeout or 2000) / 1000)
+            raise Exception(f"VI_ERROR_RSRC_NFOUND: {address}")
+        instrument.session = 1
+        return instrument
+
+    def close(self):
+        for instrument in self.instruments.values():
+            instrument.close()
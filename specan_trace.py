@@ -0,0 +1,55 @@
+import numpy as np
+from scpi_cache import join_scpi
+
+
+class TraceReader:
+    # Reads analyzer traces as REAL,32 binary blocks straight into NumPy arrays
+    def __init__(self, instrument, trace=1):
+        self.instrument = instrument
+        self.trace = trace
+        self.binary = False
+        self._axis = None
+        self.listeners = []  # callables(freqs, levels), called after every acquire from the calling thread
+
+    def configure_binary(self):
+        # Little-endian floats so the block can be viewed in place on x86 hosts
+        self.instrument.write(join_scpi(["FORM REAL,32", "FORM:BORD SWAP"]))
+        self.binary = True
+
+    def invalidate(self):
+        # After reconnect or *RST the data format and span are unknown again
+        self.binary = False
+        self._axis = None
+
+    def invalidate_axis(self):
+        self._axis = None
+
+    def frequency_axis(self):
+        # Built once per start/stop/points configuration, not once per point
+        if self._axis is None:
+            response = self.instrument.query(join_scpi(["FREQ:STAR?", "FREQ:STOP?", "SWE:POIN?"]))
+            start, stop, points = (float(v) for v in response.strip().split(";"))
+            self._axis = np.linspace(start, stop, int(points))
+        return self._axis
+
+    def read_trace(self):
+        if not self.binary:
+            self.configure_binary()
+        # container=np.ndarray makes pyvisa wrap the received block with np.frombuffer (no copy)
+        return self.instrument.query_binary_values(
+            f"TRAC:DATA? TRACE{self.trace}",
+            datatype='f',
+            is_big_endian=False,
+            container=np.ndarray,
+        )
+
+    def acquire(self):
+        levels = self.read_trace()
+        freqs = self.frequency_axis()
+        if len(freqs) != len(levels):
+            # Point count changed on the instrument since the axis was built
+            self.invalidate_axis()
+            freqs = self.frequency_axis()
+        for listener in self.listeners:
+            listener(freqs, levels)
+        return freqs, levels
@@ -1,6 +1,11 @@
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pyvisa
+from specan_trace import TraceReader
+from scpi_cache import shadow_for
+from live_plot import LivePlot
+from trace_analysis import TraceBatch
+from ui_bus import UiEventBus
 
 class SpectrumAnalyzerTab:
     def __init__(self, parent, devices):
@@ -8,13 +13,20 @@ class SpectrumAnalyzerTab:
         self.parent = parent
         self.frame = ttk.Frame(parent)
 
-        self.rm = pyvisa.ResourceManager()
         self.specan = None
+        self.trace_reader = None
+        self.shadow = None
         self.connected = False
         self.sweeping = False
         self.armed_and_waiting = False
 
         self.build_ui()
+        # Traces arrive from whichever thread acquired them (sequencer, sweep, Read Trace);
+        # only the newest one per frame is drawn
+        self.ui = UiEventBus(self.frame)
+        self.ui.subscribe("trace", self.show_trace, latest_only=True)
+        self.ui.subscribe("error", lambda message: messagebox.showerror("Trace Error", message))
+        self.ui.start()
 
     def build_ui(self):
         # Connection Frame
@@ -83,6 +95,22 @@ class SpectrumAnalyzerTab:
 
         ttk.Button(button_frame, text="Start Sweep", command=self.start_sweep).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Stop Sweep", command=self.stop_sweep).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Read Trace", command=self.read_trace_async).pack(side='left', padx=5)
+
+        # Trace display
+        trace_frame = ttk.LabelFrame(self.frame, text="Trace")
+        trace_frame.pack(padx=10, pady=10, fill='both', expand=True)
+        self.trace_plot = LivePlot(trace_frame, width=700, height=260, x_label="MHz", y_label="dBm")
+        self.trace_plot.canvas.pack(fill='both', expand=True, padx=5, pady=5)
+
+        # Measurements on the displayed trace, computed on the host (no marker queries)
+        measure_frame = ttk.Frame(trace_frame)
+        measure_frame.pack(fill='x', padx=5, pady=(0, 5))
+        ttk.Label(measure_frame, text="Channel BW (Hz):").pack(side='left')
+        self.channel_bw_var = tk.StringVar(value="1e6")
+        ttk.Entry(measure_frame, textvariable=self.channel_bw_var, width=10).pack(side='left', padx=5)
+        self.measure_label = ttk.Label(measure_frame, text="", foreground="gray30")
+        self.measure_label.pack(side='left', padx=10)
 
     def connect(self):
         self.specan = self.devices["Spectrum Analyzer"]["instance"]
@@ -91,6 +119,10 @@ class SpectrumAnalyzerTab:
         else:
             idn = self.specan.query("*IDN?").strip()
             self.status_label.config(text=f"Connected: {idn}", foreground="green")
+            self.trace_reader = TraceReader(self.specan)
+            self.trace_reader.listeners.append(lambda freqs, levels: self.ui.post("trace", (freqs, levels)))
+            self.shadow = shadow_for(self.specan)
+            self.shadow.invalidate()
             self.connected = True
 
     def start_sweep(self):
@@ -99,34 +131,47 @@ class SpectrumAnalyzerTab:
             return
 
         try:
-            # Apply settings
-            self.specan.write(f"FREQ:STAR {self.start_freq_var.get()}")
-            self.specan.write(f"FREQ:STOP {self.stop_freq_var.get()}")
-            self.specan.write(f"DISP:TRAC:Y:RLEV {self.ref_level_var.get()}")
-            self.specan.write(f"BAND:RES {self.rbw_var.get()}")
-
-            trig_mode = self.trigger_var.get()
-            if trig_mode == "Free Run":
-                self.specan.write("TRIG:SOUR IMM")
-            elif trig_mode == "Video":
-                self.specan.write("TRIG:SOUR VID")
-            elif trig_mode == "External":
-                self.specan.write("TRIG:SOUR EXT")
-
-            # Arm and Wait
-            if self.arm_wait_var.get():
-                self.specan.write("INIT")  # Arm but wait for trigger
-                self.armed_and_waiting = True
-                self.sweep_led.config(foreground="orange")
-            else:
-                self.specan.write("INIT:IMM")  # Start immediately
-                self.sweeping = True
-                self.armed_and_waiting = False
-                self.sweep_led.config(foreground="green")
-
+            self.show_sweep(self.send_sweep(self.snapshot()))
         except Exception as e:
             messagebox.showerror("Sweep Error", str(e))
 
+    def snapshot(self):
+        # The form as it stands; read on the Tk thread, used by send_sweep from any thread
+        return {
+            "start": self.start_freq_var.get(), "stop": self.stop_freq_var.get(),
+            "ref_level": self.ref_level_var.get(), "rbw": self.rbw_var.get(),
+            "trigger": self.trigger_var.get(), "arm_only": self.arm_wait_var.get(),
+        }
+
+    def send_sweep(self, values):
+        # No Tk: applies snapshot() values and starts the sweep; returns True when only armed
+        trig_source = {"Free Run": "IMM", "Video": "VID", "External": "EXT"}.get(values["trigger"])
+        settings = [
+            ("FREQ:STAR", values["start"]),
+            ("FREQ:STOP", values["stop"]),
+            ("DISP:TRAC:Y:RLEV", values["ref_level"]),
+            ("BAND:RES", values["rbw"]),
+        ]
+        if trig_source:
+            settings.append(("TRIG:SOUR", trig_source))
+
+        # Arm and Wait: INIT arms and waits for the trigger, INIT:IMM starts immediately.
+        # Changed settings and the start go out as one message.
+        arm_only = values["arm_only"]
+        changes = self.shadow.apply(self.specan, settings, ["INIT" if arm_only else "INIT:IMM"])
+        if any(header in ("FREQ:STAR", "FREQ:STOP") for header, _ in changes):
+            self.trace_reader.invalidate_axis()
+        return arm_only
+
+    def show_sweep(self, arm_only):
+        if arm_only:
+            self.armed_and_waiting = True
+            self.sweep_led.config(foreground="orange")
+        else:
+            self.sweeping = True
+            self.armed_and_waiting = False
+            self.sweep_led.config(foreground="green")
+
     def stop_sweep(self):
         if self.specan and self.connected:
             try:
@@ -137,6 +182,43 @@ class SpectrumAnalyzerTab:
             except Exception as e:
                 messagebox.showerror("Stop Error", str(e))
 
+    def read_trace(self):
+        # Returns (frequency axis in Hz, trace levels) as NumPy arrays
+        if not self.connected or not self.trace_reader:
+            raise Exception("Spectrum analyzer not connected")
+        return self.trace_reader.acquire()
+
+    def read_trace_async(self):
+        # One acquisition off the Tk thread; the reader's listener delivers it to the plot
+        if not self.connected or not self.trace_reader:
+            messagebox.showwarning("Not Connected", "Connect to the spectrum analyzer first.")
+            return
+
+        def worker():
+            try:
+                self.trace_reader.acquire()
+            except Exception as e:
+                self.ui.post("error", str(e))
+
+        threading.Thread(target=worker, name="trace-read", daemon=True).start()
+
+    def show_trace(self, payload):
+        freqs, levels = payload
+        self.trace_plot.set_series("Trace 1", freqs / 1e6, levels)
+        try:
+            bandwidth = float(self.channel_bw_var.get())
+        except ValueError:
+            self.measure_label.config(text="Invalid channel BW")
+            return
+        batch = TraceBatch(levels, freqs[0], freqs[-1])
+        peak_freq, peak_level = batch.peak()
+        channel = batch.channel_power(peak_freq, bandwidth)[0]
+        second = batch.harmonics(peak_freq, 2)["dbc"][0, 1]
+        text = f"Peak {peak_level[0]:.2f} dBm @ {peak_freq[0] / 1e6:.3f} MHz | Channel {channel:.2f} dBm"
+        if second == second:  # NaN when 2 × peak is off screen
+            text += f" | H2 {second:.1f} dBc"
+        self.measure_label.config(text=text)
+
     def is_armed_and_waiting(self):
         return self.armed_and_waiting
 
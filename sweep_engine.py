@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from scpi_cache import join_scpi, shadow_for
+from sync_wait import CompletionWaiter
+
+# Generators that accept an instrument-side LIST table for frequency/power stepping
+LIST_MODE_MODELS = ("N5171B", "N5172B", "N5181", "N5182", "N5183", "E8257D", "E8267D", "E4438C", "E8663")
+
+
+def build_grid(cfg):
+    # Setup-file limits -> [(freq Hz, power dBm)], frequency stepping fastest
+    start = cfg.get("LOSWPFREQMZ", 1000) * 1e6  # MHz to Hz
+    stop = cfg.get("HISWPFREQMZ", 2000) * 1e6
+    low_power = cfg.get("LOSWPPWR", 10)  # dBm
+    high_power = cfg.get("HISWPPWR", low_power)
+    freq_points = int(cfg.get("SWPFREQPTS", 11))
+    power_points = int(cfg.get("SWPPWRPTS", 1 if high_power == low_power else 2))
+
+    freqs = np.linspace(start, stop, freq_points)
+    powers = np.linspace(low_power, high_power, power_points)
+    return [(float(f), float(p)) for p in powers for f in freqs]
+
+
+def supports_list_mode(idn):
+    return any(model in idn for model in LIST_MODE_MODELS)
+
+
+class SweepEngine:
+    def __init__(self, siggen, specan, trace_reader, waiter=None, use_list=None, sweep_timeout=5.0, settle_s=0.0):
+        self.siggen = siggen
+        self.specan = specan
+        self.trace_reader = trace_reader
+        self.waiter = waiter or CompletionWaiter()
+        self.sweep_timeout = sweep_timeout
+        self.settle_s = settle_s
+        if use_list is None:
+            use_list = supports_list_mode(siggen.query("*IDN?"))
+        self.use_list = use_list
+        self.count = 0  # points measured by the last run()
+        self.last_point = None
+
+    def upload_list(self, grid):
+        # One table upload replaces a FREQ/POW write per point; each *TRG then steps the list
+        freqs = ",".join(f"{f:.6f}" for f, _ in grid)
+        powers = ",".join(f"{p:.2f}" for _, p in grid)
+        self.siggen.write(join_scpi(["LIST:TYPE LIST", f"LIST:FREQ {freqs}", f"LIST:POW {powers}"]))
+        self.siggen.write(join_scpi([
+            "LIST:TRIG:SOUR BUS", "TRIG:SOUR IMM", "INIT:CONT OFF",
+            "FREQ:MODE LIST", "POW:MODE LIST", "INIT",
+        ]))
+
+    def restore_cw(self):
+        self.siggen.write(join_scpi(["FREQ:MODE CW", "POW:MODE FIX"]))
+
+    def measure(self):
+        self.specan.write("INIT:IMM")
+        self.waiter.arm(self.specan)
+        done, elapsed = self.waiter.wait(self.specan, self.sweep_timeout)
+        freqs, levels = self.trace_reader.acquire()
+        return {"freqs": freqs, "levels": levels, "sweep_time": elapsed, "completed": done}
+
+    def run(self, grid, on_point=None, should_stop=None, first=0):
+        # first: index of the first point to measure (resuming a run that already has the ones before it).
+        # Points go to on_point as they are measured; only the count and the last one are kept.
+        should_stop = should_stop or (lambda: False)
+        self.count = 0
+        self.last_point = None
+        start = time.perf_counter()
+        self.specan.write("INIT:CONT OFF")
+
+        if self.use_list:
+            self.upload_list(grid[first:])
+        try:
+            for index, (freq, power) in enumerate(grid[first:], first):
+                if should_stop():
+                    break
+                if self.use_list:
+                    if index > first:
+                        self.siggen.write("*TRG")  # the first point is output as soon as the list is armed
+                else:
+                    self.siggen.write(join_scpi([f"FREQ {freq}", f"POW {power}"]))
+                if self.settle_s:
+                    time.sleep(self.settle_s)
+
+                point = {"index": index, "freq": freq, "power": power}
+                point.update(self.measure())
+                self.count += 1
+                self.last_point = point
+                if on_point:
+                    on_point(point)
+        finally:
+            if self.use_list:
+                self.restore_cw()
+            # The generator is left at the last point, not at what the shadow last recorded
+            shadow_for(self.siggen).forget("FREQ", "POW")
+
+        return self.count, time.perf_counter() - start
@@ -0,0 +1,71 @@
+import time
+
+
+class CompletionWaiter:
+    # Waits for an instrument to report "done" instead of sleeping for a fixed delay.
+    # The caller's delay becomes an upper bound rather than the expected duration.
+    #   "esr"  - arm with *OPC, poll *ESR? bit 0 with exponential backoff (default, interruptible)
+    #   "oper" - poll STAT:OPER:COND? until the busy bits in oper_mask clear
+    #   "opc"  - block on *OPC? with the VISA timeout set to the remaining budget
+    def __init__(self, should_stop=None, initial_interval=0.002, max_interval=0.05, oper_mask=0x18):
+        self.should_stop = should_stop or (lambda: False)
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.oper_mask = oper_mask  # bit 3 sweeping, bit 4 measuring
+
+    def arm(self, instrument, method="esr"):
+        # Call right after the command whose completion you want to wait for
+        if method == "esr":
+            instrument.query("*ESR?")  # clears a stale operation-complete bit
+            instrument.write("*OPC")
+
+    def wait(self, instrument, budget_s, method="esr"):
+        # Returns (completed, elapsed seconds)
+        start = time.perf_counter()
+        if method == "opc":
+            done = self._wait_opc(instrument, budget_s)
+        else:
+            done = self._poll(instrument, budget_s, method, start)
+        return done, time.perf_counter() - start
+
+    def wait_all(self, instruments, budget_s, method="esr"):
+        # One shared deadline across several instruments
+        start = time.perf_counter()
+        done = True
+        for instrument in instruments:
+            remaining = max(budget_s - (time.perf_counter() - start), 0.0)
+            finished, _ = self.wait(instrument, remaining, method)
+            done = done and finished
+        return done, time.perf_counter() - start
+
+    def _poll(self, instrument, budget_s, method, start):
+        interval = self.initial_interval
+        deadline = start + budget_s
+        while True:
+            if method == "esr":
+                done = int(instrument.query("*ESR?").strip()) & 0x01
+            else:
+                done = not (int(float(instrument.query("STAT:OPER:COND?").strip())) & self.oper_mask)
+            if done:
+                return True
+            now = time.perf_counter()
+            if now >= deadline or self.should_stop():
+                return False
+            time.sleep(min(interval, deadline - now))
+            interval = min(interval * 2, self.max_interval)
+
+    def _wait_opc(self, instrument, budget_s):
+        previous_timeout = instrument.timeout
+        instrument.timeout = max(int(budget_s * 1000), 1)
+        try:
+            instrument.query("*OPC?")
+            return True
+        except Exception:
+            # The late "1" would otherwise be read as the answer to the next query
+            try:
+                instrument.clear()
+            except Exception:
+                pass
+            return False
+        finally:
+            instrument.timeout = previous_timeout
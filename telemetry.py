@@ -0,0 +1,113 @@
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Row layout of every telemetry buffer
+COLUMNS = ("time", "ch1_v", "ch1_i", "ch2_v", "ch2_i")
+
+
+class RingBuffer:
+    # Fixed-size history; appends never allocate, snapshots return oldest-to-newest copies
+    def __init__(self, capacity, width=len(COLUMNS)):
+        self.data = np.full((capacity, width), np.nan)
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+        self.total = 0  # rows ever appended; lets readers skip unchanged buffers
+        self.lock = threading.Lock()
+
+    def append(self, row):
+        with self.lock:
+            self.data[self.index] = row
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total += 1
+
+    def snapshot(self):
+        with self.lock:
+            if self.count < self.capacity:
+                return self.data[:self.count].copy()
+            return np.roll(self.data, -self.index, axis=0)
+
+    def tail(self, n):
+        # The newest n rows, oldest first; copies only what is asked for
+        with self.lock:
+            n = min(n, self.count)
+            start = self.index - n
+            if start >= 0:
+                return self.data[start:self.index].copy()
+            return np.concatenate((self.data[start:], self.data[:self.index]))
+
+    def latest(self):
+        with self.lock:
+            if not self.count:
+                return None
+            return self.data[(self.index - 1) % self.capacity].copy()
+
+
+class TelemetryPoller:
+    # Samples every connected PowerSupply in parallel, off the Tk thread, into per-PSU ring buffers.
+    # The GUI only ever reads snapshots; it never touches the bus for readback.
+    def __init__(self, power_supplies, rate_hz=5.0, capacity=144_000, max_workers=8):
+        self.power_supplies = power_supplies
+        self.rate_hz = rate_hz
+        self.buffers = {psu.name: RingBuffer(capacity) for psu in power_supplies}  # 4 h at 10 Hz
+        self.errors = {}  # name -> last polling error; (name, listener name) -> last listener error
+        self.listeners = []  # callables(name, row), called from the poller thread
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.max_workers = max_workers
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+    def sample(self, psu):
+        try:
+            readings = psu.driver.measure_all()
+        except Exception as e:
+            self.errors[psu.name] = e
+            return
+        self.errors.pop(psu.name, None)
+        row = [time.time(), np.nan, np.nan, np.nan, np.nan]
+        for ch, (volts, amps) in readings.items():
+            row[2 * ch - 1] = volts
+            row[2 * ch] = amps
+        self.buffers[psu.name].append(row)
+        for listener in self.listeners:
+            # A failing listener must not stop the sampling (or the other listeners)
+            key = (psu.name, getattr(listener, "__name__", repr(listener)))
+            try:
+                listener(psu.name, row)
+            except Exception as e:
+                self.errors[key] = e
+            else:
+                self.errors.pop(key, None)
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="telemetry") as pool:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                connected = [psu for psu in self.power_supplies if psu.driver is not None]
+                list(pool.map(self.sample, connected))
+                period = 1.0 / self.rate_hz
+                self.stop_event.wait(max(period - (time.perf_counter() - start), 0.0))
+
+    def snapshot(self, name):
+        return self.buffers[name].snapshot()
+
+    def latest(self, name):
+        return self.buffers[name].latest()
@@ -0,0 +1,208 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+from collections import Counter
+from setup_config import load_setup, SetupError
+from recipe import load_recipe, RecipeError
+
+# Multi-bench DUT scheduler. Each bench runs in its own worker process with its own VISA
+# sessions; DUT jobs are queued and picked up by whichever bench is free (or by the bench a job
+# names). An analyzer listed on several benches is shared through a cross-process lock held only
+# from RF ON to RF OFF, so the other benches bias and settle their DUTs while one is measuring.
+#
+#   python test_farm.py --farm farm.json --output farm.jsonl
+#
+# farm.json:
+#   {"benches": {"bench1": {"psus": {"PS1": "GPIB0::10::INSTR", ...}, "siggen": "GPIB0::28::INSTR",
+#                           "specan": "GPIB0::18::INSTR", "delays": {"Sweep": 2.0}, "telemetry_hz": 5},
+#                "bench2": {...}},
+#    "jobs": [{"dut": "SN001", "setup": "setup.txt", "bench": "bench1",   # bench is optional
+#              "overrides": {"VDDRV": 28}, "recipe": "recipe.json",                # optional
+#              "assignments": [{"psu": "PS1", "output": "Output1", "role": "Gate"}, ...]}, ...]}
+
+
+def shared_analyzers(benches):
+    # Analyzer addresses that more than one bench uses
+    counts = Counter(bench.get('specan') for bench in benches.values() if bench.get('specan'))
+    return [address for address, count in counts.items() if count > 1]
+
+
+def skip_pinned(name, pinned, results, reason):
+    # Reports every job still queued for this bench alone; nobody else would ever run them
+    while True:
+        job = pinned.get()
+        if job is None:
+            return
+        results.put({"bench": name, "dut": job['dut'], "status": "skipped", "error": reason})
+
+
+def bench_worker(name, bench, pinned, shared, results, analyzer_lock, results_root):
+    # Runs in a worker process: connects this bench once, then runs jobs until both queues end
+    from abort import AbortManager
+    from sequence_engine import SequenceEngine, connect_bench
+    from setup_config import load_setup
+    from recipe import load_recipe
+    from telemetry import TelemetryPoller
+    from visa_pool import get_pool
+
+    try:
+        instruments = connect_bench(dict(bench, assignments=[]))
+    except Exception as e:
+        results.put({"bench": name, "status": "error", "error": f"Bench connect failed: {e}", "dut": None})
+        skip_pinned(name, pinned, results, f"Bench connect failed: {e}")
+        return
+
+    abort = AbortManager(instruments.abort_targets)
+    poller = None
+    if bench.get('telemetry_hz'):
+        poller = TelemetryPoller(list(instruments.psus.values()), rate_hz=bench['telemetry_hz'])
+        poller.listeners.append(abort.check)
+        poller.start()
+    engine = SequenceEngine(instruments, bench.get('delays'), log=lambda message: None,
+                            results_root=results_root, abort=abort, analyzer_lock=analyzer_lock,
+                            telemetry=poller)
+
+    try:
+        for jobs in (pinned, shared):
+            while True:
+                job = jobs.get()
+                if job is None:
+                    break
+                if abort.tripped.is_set():
+                    # Never run another DUT on a bench that tripped; shared jobs go to the other benches
+                    results.put({"bench": name, "dut": job['dut'], "status": "skipped", "error": abort.reason})
+                    if jobs is pinned:
+                        skip_pinned(name, pinned, results, abort.reason)
+                    return
+                instruments.assignments = job['assignments']
+                try:
+                    cfg = load_setup(job['setup'], job.get('overrides'))
+                    recipe = load_recipe(job['recipe']) if job.get('recipe') else None
+                except Exception as e:
+                    results.put({"bench": name, "dut": job['dut'], "status": "error", "error": str(e)})
+                    continue
+                summary = engine.run(cfg, run_id=f"{job['dut']}_{name}", recipe=recipe)
+                summary.update({"bench": name, "dut": job['dut'], "setup": job['setup']})
+                results.put(summary)
+    finally:
+        if poller is not None:
+            poller.stop()
+        get_pool().close_all()
+
+
+class TestFarm:
+    def __init__(self, benches, results_root="results"):
+        self.benches = benches  # name -> bench device map (psus, siggen, specan, delays, telemetry_hz)
+        self.results_root = results_root
+
+    def run(self, jobs, emit=None):
+        # Returns (per-DUT summaries, farm summary)
+        unknown = {job['bench'] for job in jobs if job.get('bench') and job['bench'] not in self.benches}
+        if unknown:
+            raise ValueError(f"Jobs name unknown benches: {', '.join(sorted(unknown))}")
+        # Every setup file is checked before any bench is biased
+        problems = []
+        for job in jobs:
+            try:
+                load_setup(job['setup'], job.get('overrides'))
+            except SetupError as e:
+                problems.extend(e.problems)
+            try:
+                if job.get('recipe'):
+                    load_recipe(job['recipe'])
+            except (OSError, RecipeError) as e:
+                problems.append((job['recipe'], 0, str(e)))
+        if problems:
+            raise SetupError(problems)
+
+        locks = {address: multiprocessing.Lock() for address in shared_analyzers(self.benches)}
+        pinned = {name: multiprocessing.Queue() for name in self.benches}
+        shared = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+
+        for job in jobs:
+            (pinned[job['bench']] if job.get('bench') else shared).put(job)
+        for name in self.benches:
+            pinned[name].put(None)
+            shared.put(None)
+
+        start = time.perf_counter()
+        workers = []
+        for name, bench in self.benches.items():
+            worker = multiprocessing.Process(
+                target=bench_worker, name=f"bench-{name}",
+                args=(name, bench, pinned[name], shared, results, locks.get(bench.get('specan')), self.results_root),
+            )
+            worker.start()
+            workers.append(worker)
+
+        summaries = []
+        while any(worker.is_alive() for worker in workers) or not results.empty():
+            try:
+                summary = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            summaries.append(summary)
+            if emit:
+                emit(summary)
+        for worker in workers:
+            worker.join()
+
+        return summaries, self.farm_summary(summaries, time.perf_counter() - start, len(jobs))
+
+    def farm_summary(self, summaries, elapsed, queued):
+        complete = [s for s in summaries if s['status'] == "complete"]
+        by_bench = {}
+        for s in summaries:
+            entry = by_bench.setdefault(s['bench'], {"duts": 0, "complete": 0, "busy_s": 0.0, "analyzer_wait_s": 0.0})
+            entry["duts"] += 1
+            entry["complete"] += s['status'] == "complete"
+            entry["busy_s"] += s.get('elapsed', 0.0)
+            entry["analyzer_wait_s"] += s.get('analyzer_wait', 0.0)
+        for entry in by_bench.values():
+            entry["utilization"] = entry["busy_s"] / elapsed if elapsed else 0.0
+        return {
+            "farm": True,
+            "queued": queued,
+            "complete": len(complete),
+            "failed": len(summaries) - len(complete),
+            "elapsed": elapsed,
+            "duts_per_hour": len(complete) / elapsed * 3600 if elapsed else 0.0,
+            "by_bench": by_bench,
+            "shared_analyzers": shared_analyzers(self.benches),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run DUT jobs across several benches in parallel.")
+    parser.add_argument("--farm", required=True, help="JSON file with benches and jobs")
+    parser.add_argument("--results", default="results", help="root directory for result stores")
+    parser.add_argument("--output", help="write JSON-lines summaries here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with open(args.farm) as f:
+        farm = json.load(f)
+
+    out = open(args.output, "a") if args.output else sys.stdout
+
+    def emit(summary):
+        out.write(json.dumps(summary) + "\n")
+        out.flush()
+
+    try:
+        summaries, totals = TestFarm(farm['benches'], args.results).run(farm['jobs'], emit)
+        emit(totals)
+        print(f"{totals['complete']}/{totals['queued']} DUTs in {totals['elapsed']:.1f} s "
+              f"({totals['duts_per_hour']:.1f} DUTs/hour)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 0 if totals['failed'] == 0 and totals['complete'] == totals['queued'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
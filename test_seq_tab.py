@@ -1,25 +1,150 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
-import time
+from ramp_scheduler import RampScheduler
+from abort import format_abort
+from sequence_engine import SequenceEngine, STEP_NAMES, staged_bias_on, staged_bias_off
+from setup_config import load_setup, SetupError
+from recipe import load_recipe, RecipeError, DEFAULT
+from ui_bus import UiEventBus
+
+
+class TabBench:
+    # Adapts the instrument tabs to the SequenceEngine bench interface. Built on the Tk thread,
+    # it snapshots every form the run needs; the engine's worker thread then only talks to the
+    # drivers, and widget changes go back through post (the sequencer tab's UiEventBus).
+    def __init__(self, psu_tab, siggen_tab, specan_tab, post):
+        self.psu_tab = psu_tab
+        self.siggen_tab = siggen_tab
+        self.specan_tab = specan_tab
+        self.post = post
+        self.roles = {key: var.get() for key, var in psu_tab.output_roles.items()}
+        self.psu_values = psu_tab.snapshot()
+        self.siggen_values = siggen_tab.snapshot()
+        self.specan_values = specan_tab.snapshot()
+        self.scheduler = RampScheduler()
+
+    @property
+    def siggen(self):
+        return self.siggen_tab.siggen
+
+    @property
+    def specan(self):
+        return self.specan_tab.specan
+
+    @property
+    def trace_reader(self):
+        return self.specan_tab.trace_reader
+
+    def psu_instruments(self):
+        return [psu.instrument for psu in self.psu_tab.power_supplies if psu.driver is not None]
+
+    def abort_targets(self):
+        drains, gates = [], []
+        for psu in self.psu_tab.power_supplies:
+            for ch in (psu.driver.channels if psu.driver is not None else (1, 2)):
+                (drains if self.roles.get((psu.name, ch)) == "Drain" else gates).append((psu, ch))
+        return {'siggen': self.siggen, 'drains': drains, 'gates': gates}
+
+    def outputs(self, role):
+        return [(psu, ch) for psu in self.psu_tab.power_supplies if psu.driver is not None
+                for ch in (1, 2) if self.roles.get((psu.name, ch)) == role]
+
+    def bias_outputs(self):
+        return self.outputs("Gate"), self.outputs("Drain")
+
+    def bias_on(self, cfg):
+        # With a setup: the same staged sequence as the headless bench; without: the tab's values
+        if cfg:
+            staged_bias_on(self.scheduler, self.outputs("Gate"), self.outputs("Drain"), cfg)
+            return
+        failed = []
+        for psu in self.psu_tab.power_supplies:
+            if psu.driver is None:
+                continue
+            for ch in psu.driver.channels:
+                if (psu.name, ch) not in self.psu_values:
+                    continue
+                volts, milliamps = self.psu_values[(psu.name, ch)]
+                try:
+                    psu.driver.apply_output(ch, float(volts), float(milliamps) / 1000)
+                except Exception as e:
+                    failed.append(f"{psu.name} Output {ch}: {e}")
+        if failed:
+            raise Exception("; ".join(failed))
+
+    def rf_on(self, cfg):
+        # The tab's waveform and output state; a setup supplies the start frequency and power
+        if self.siggen_tab.siggen is None or not self.siggen_tab.connected:
+            raise Exception("Connect to the signal generator first")
+        values = self.siggen_values
+        arb = None
+        if values["wave"] == "Choose My Own":
+            if not values["arb_file"]:
+                raise Exception("No waveform file selected in the Signal Generator tab")
+            arb = self.siggen_tab.arb.upload(values["arb_file"])
+        if cfg:
+            self.siggen_tab.send_settings(values, arb, cfg.get("LOSWPFREQMZ", 1000) * 1e6, cfg.get("LOSWPPWR", 10))
+        else:
+            self.siggen_tab.send_settings(values, arb)
+        self.post("rf", values["rf_on"])
+
+    def start_sweep(self):
+        if self.specan_tab.specan is None or not self.specan_tab.connected:
+            raise Exception("Connect to the spectrum analyzer first")
+        self.post("sweep", self.specan_tab.send_sweep(self.specan_values))
+
+    def rf_off(self, cfg):
+        self.siggen.write("OUTP OFF")
+        self.post("rf", False)
+
+    def bias_off(self, cfg):
+        if cfg:
+            staged_bias_off(self.scheduler, self.outputs("Gate"), self.outputs("Drain"), cfg)
+            return
+        # Drains off before gates
+        for role in ("Drain", "Gate"):
+            for psu in self.psu_tab.power_supplies:
+                if psu.driver is None:
+                    continue
+                for ch in (1, 2):
+                    if self.roles.get((psu.name, ch)) == role:
+                        psu.driver.disable_output(ch)
+
 
 class TestSequencerTab:
-    def __init__(self, parent, devices, psu_controller, siggen_controller, specan_controller):
+    def __init__(self, parent, devices, psu_controller, siggen_controller, specan_controller, abort=None):
         self.parent = parent
+        self.abort = abort
         self.devices = devices
         self.psus = psu_controller
         self.siggen = siggen_controller
         self.specan = specan_controller
 
         self.running = False
+        self.engine = None
         self.delay_units = {}  # step -> 's' or 'ms'
         self.delay_values = {}  # step -> float
         self.test_config = {}  # parsed test setup file values
+        self.recipe = DEFAULT  # compiled recipe the next run executes
         self.config_vars = {}  # tk.StringVar for display
 
         self.frame = ttk.Frame(self.parent)
         self.build_ui()
 
+        # The engine runs on a worker thread; its log and status updates reach the widgets through here
+        self.ui = UiEventBus(self.frame)
+        self.ui.log_to("log", self.steps_box)
+        self.ui.subscribe("status", lambda status: self.status_label.config(text=status[0], foreground=status[1]), latest_only=True)
+        self.ui.subscribe("rf", lambda rf_on: self.siggen.rf_status_led.config(foreground="green" if rf_on else "red"),
+                          latest_only=True)
+        self.ui.subscribe("sweep", self.specan.show_sweep, latest_only=True)
+        self.ui.subscribe("abort_failed", lambda report: messagebox.showerror(
+            "Abort Incomplete", "Outputs may still be ON:\n" + "\n".join(report["failures"])))
+        if self.abort is not None:
+            self.abort.reporters.append(self.report_abort)
+        self.ui.start()
+
     def build_ui(self):
         control_frame = ttk.Frame(self.frame)
         control_frame.pack(pady=10, padx=10, fill='x')
@@ -30,13 +155,23 @@ class TestSequencerTab:
         self.stop_button = ttk.Button(control_frame, text="🛑 Stop", command=self.stop_sequence)
         self.stop_button.pack(side='left', padx=5)
 
+        if self.abort is not None:
+            self.abort_button = ttk.Button(control_frame, text="⚠ ABORT", command=self.abort_all)
+            self.abort_button.pack(side='left', padx=5)
+            ttk.Button(control_frame, text="Clear Abort", command=self.clear_abort).pack(side='left', padx=5)
+
+        ttk.Button(control_frame, text="📜 Load Recipe", command=self.load_recipe_file).pack(side='left', padx=5)
+        self.recipe_label = ttk.Label(control_frame, text=f"Recipe: {self.recipe.name}", foreground="gray")
+        self.recipe_label.pack(side='left', padx=5)
+        ttk.Button(control_frame, text="⏯ Resume Run", command=self.resume_run).pack(side='left', padx=5)
+
         self.status_label = ttk.Label(control_frame, text="Idle", foreground="gray")
         self.status_label.pack(side='right', padx=10)
 
         delay_frame = ttk.LabelFrame(self.frame, text="Step Delays")
         delay_frame.pack(padx=10, pady=5, fill='x')
 
-        self.step_names = ["Bias ON", "RF ON", "Sweep", "Log", "RF OFF", "Bias OFF"]
+        self.step_names = list(STEP_NAMES)
         for step in self.step_names:
             row = ttk.Frame(delay_frame)
             row.pack(fill='x', padx=5, pady=2)
@@ -69,14 +204,8 @@ class TestSequencerTab:
             return
 
         try:
-            with open(file_path, 'r') as f:
-                lines = f.readlines()
-
             self.test_config.clear()
-            for line in lines:
-                if '=' in line:
-                    key, value = line.strip().split('=')
-                    self.test_config[key] = float(value)
+            self.test_config.update(load_setup(file_path))
 
             self.config_display.config(state='normal')
             self.config_display.delete("1.0", tk.END)
@@ -85,97 +214,97 @@ class TestSequencerTab:
             self.config_display.config(state='disabled')
             self.log_step(f"✅ Loaded setup file: {file_path}")
 
+        except SetupError as e:
+            messagebox.showerror("Invalid Setup File", f"{len(e.problems)} problem(s):\n{e}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load setup file:\n{str(e)}")
 
+    def load_recipe_file(self):
+        file_path = filedialog.askopenfilename(title="Select Recipe", filetypes=[("Recipes", "*.json")])
+        if not file_path:
+            return
+        try:
+            self.recipe = load_recipe(file_path)
+        except RecipeError as e:
+            messagebox.showerror("Invalid Recipe", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load recipe:\n{str(e)}")
+            return
+        self.recipe_label.config(text=f"Recipe: {self.recipe.name}", foreground="black")
+        self.log_step(self.recipe.describe())
+
     def log_step(self, message):
-        self.steps_box.config(state='normal')
-        self.steps_box.insert(tk.END, f"{message}\n")
-        self.steps_box.see(tk.END)
-        self.steps_box.config(state='disabled')
+        # Safe from any thread
+        self.ui.post("log", message)
 
     def set_status(self, text, color="blue"):
-        self.status_label.config(text=text, foreground=color)
-        self.status_label.update()
+        self.ui.post("status", (text, color))
 
-    def run_sequence(self):
+    def run_sequence(self, resume=None):
         if self.running:
             return
         self.running = True
+        self.ui.drain()  # lines still queued from the last run must not land after the clear
         self.set_status("Running...", "green")
         self.steps_box.config(state='normal')
         self.steps_box.delete("1.0", tk.END)
         self.steps_box.config(state='disabled')
 
-        thread = threading.Thread(target=self._run_test_flow)
+        delays = {step: self.get_delay(step) for step in self.step_names}
+        bench = TabBench(self.psus, self.siggen, self.specan, self.ui.post)
+        if self.engine is not None and self.abort is not None and self.engine.stop in self.abort.listeners:
+            self.abort.listeners.remove(self.engine.stop)
+        telemetry = None
+        if self.abort is not None:
+            # The OV/OC watch listens on the readback poller; a protected run turns Live Readback on
+            telemetry = self.psus.telemetry
+            if not telemetry.running():
+                self.psus.monitor_var.set(True)
+                self.psus.toggle_monitor()
+        self.engine = SequenceEngine(bench, delays, log=self.log_step, status=self.set_status, abort=self.abort,
+                                     telemetry=telemetry)
+
+        thread = threading.Thread(target=self._run_test_flow, args=(resume,))
         thread.start()
 
+    def resume_run(self):
+        # Picks up a failed or stopped run from its journal, with the recipe loaded here
+        run_path = filedialog.askdirectory(title="Select Run to Resume")
+        if run_path:
+            self.run_sequence(resume=run_path)
+
     def stop_sequence(self):
         if self.running:
             self.running = False
+            self.engine.stop()
             self.set_status("Stopping...", "orange")
 
+    def abort_all(self):
+        self.abort.trigger("Operator abort")
+
+    def report_abort(self, report):
+        # Any thread: operator aborts and telemetry trips alike
+        self.set_status(f"ABORTED — safe in {report['time_to_safe_ms']:.1f} ms", "red")
+        self.log_step(format_abort(report))
+        if report["failures"]:
+            self.ui.post("abort_failed", report)
+
+    def clear_abort(self):
+        self.abort.clear()
+        self.set_status("Idle", "gray")
+
     def get_delay(self, step):
         val = self.delay_values[step].get()
         unit = self.delay_units[step].get()
         return val / 1000 if unit == 'ms' else val
 
-    def _run_test_flow(self):
+    def _run_test_flow(self, resume=None):
         try:
-            cfg = self.test_config
-
-            # Step 1: Bias ON
-            if not self.running: return
-            self.log_step("Step 1: Bias ON")
-            self.set_status("Biasing...")
-            if cfg:
-                self.psus.apply_bias_settings(cfg)
-            self.psus.apply_all()
-            time.sleep(self.get_delay("Bias ON"))
-
-            # Step 2: RF ON
-            if not self.running: return
-            self.log_step("Step 2: RF ON")
-            self.set_status("Enabling RF...")
-            if cfg:
-                self.siggen.configure_from_setup(cfg)
-            self.siggen.apply_settings()
-            time.sleep(self.get_delay("RF ON"))
-
-            # Step 3: Sweep
-            if not self.running: return
-            self.log_step("Step 3: Triggering Spectrum Analyzer Sweep")
-            self.set_status("Triggering Sweep...")
-            self.specan.start_sweep()
-            time.sleep(self.get_delay("Sweep"))
-
-            # Step 4: Log Data (placeholder)
-            if not self.running: return
-            self.log_step("Step 4: Logging Data")
-            self.set_status("Logging...")
-            # [Add logging logic here]
-            time.sleep(self.get_delay("Log"))
-
-            # Step 5: RF OFF
-            if not self.running: return
-            self.log_step("Step 5: RF OFF")
-            self.set_status("Disabling RF...")
-            self.siggen.apply_settings()
-            time.sleep(self.get_delay("RF OFF"))
-
-            # Step 6: Bias OFF
-            if not self.running: return
-            self.log_step("Step 6: Bias OFF")
-            self.set_status("Powering Down...")
-            self.psus.apply_all()
-            time.sleep(self.get_delay("Bias OFF"))
-
-            self.set_status("Complete", "green")
-            self.log_step("✅ Test Complete")
-
-        except Exception as e:
-            self.set_status("Error", "red")
-            self.log_step(f"❌ Error: {str(e)}")
+            self.engine.run(dict(self.test_config), recipe=self.recipe, resume=resume)
+        except ValueError as e:
+            self.log_step(f"❌ Cannot resume: {e}")
+            self.set_status("Idle", "gray")
         finally:
             self.running = False
 
@@ -0,0 +1,210 @@
+import numpy as np
+
+# Host-side measurements on batches of analyzer traces. A TraceBatch holds N traces of the same
+# point count as an (N, points) array in dBm, with each trace's frequency axis given by the
+# analyzer's start/stop settings. Every measurement works on the whole batch at once: band
+# powers come from one cumulative sum per batch, so channel power and ACPR cost the same for one
+# channel or a hundred, and nothing is asked of the instrument (no marker queries per trace).
+
+
+def to_dbm(milliwatts):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 10.0 * np.log10(milliwatts)
+
+
+class LimitLine:
+    # Piecewise-linear limit in dBm over frequency; frequencies outside the points are not checked
+    def __init__(self, points, upper=True):
+        points = sorted((float(f), float(level)) for f, level in points)
+        if not points:
+            raise ValueError("A limit line needs at least one (frequency, level) point")
+        self.freqs = np.array([f for f, _ in points])
+        self.levels = np.array([level for _, level in points])
+        self.upper = upper
+
+    def at(self, freqs):
+        freqs = np.asarray(freqs, dtype=float)
+        limit = np.interp(freqs.ravel(), self.freqs, self.levels).reshape(freqs.shape)
+        outside = (freqs < self.freqs[0]) | (freqs > self.freqs[-1])
+        limit[outside] = np.inf if self.upper else -np.inf
+        return limit
+
+
+class TraceBatch:
+    def __init__(self, levels, start, stop):
+        # levels: (N, points) or (points,) in dBm; start/stop in Hz, one value or one per trace
+        self.levels = np.atleast_2d(np.asarray(levels, dtype=float))
+        count, points = self.levels.shape
+        if points < 2:
+            raise ValueError("Traces need at least two points")
+        self.start = np.broadcast_to(np.asarray(start, dtype=float), (count,))
+        self.stop = np.broadcast_to(np.asarray(stop, dtype=float), (count,))
+        self.step = (self.stop - self.start) / (points - 1)
+        self._cumulative = None
+
+    @classmethod
+    def from_reader(cls, reader, levels):
+        # Traces read with a TraceReader under its current start/stop/points
+        axis = reader.frequency_axis()
+        return cls(levels, axis[0], axis[-1])
+
+    @classmethod
+    def from_run(cls, data):
+        # result_store.read_run() output; each row keeps the span it was captured with
+        return cls(data["trace"], data["trace_start"], data["trace_stop"])
+
+    def __len__(self):
+        return len(self.levels)
+
+    @property
+    def points(self):
+        return self.levels.shape[1]
+
+    def freqs(self):
+        return self.start[:, None] + self.step[:, None] * np.arange(self.points)
+
+    def _column(self, freq, first):
+        # Bin index of each frequency on its trace's axis; freq is (N,) or (N, k)
+        freq = np.asarray(freq, dtype=float)
+        start, step = self.start, self.step
+        if freq.ndim == 2:
+            start, step = start[:, None], step[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index = (freq - start) / step
+        index = np.ceil(index - 1e-9) if first else np.floor(index + 1e-9) + 1
+        return np.clip(np.nan_to_num(index), 0, self.points).astype(int)
+
+    def band_power(self, lo, hi, rbw=None):
+        # Summed power (mW) of the bins in [lo, hi]; lo/hi are scalars, (N,) or (N, k). Each bin
+        # reads the power in one RBW, so the sum is scaled by bin spacing / RBW when rbw is given.
+        count = len(self)
+        lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+        shape = np.broadcast_shapes(lo.shape, hi.shape)
+        if len(shape) < 2:
+            shape = np.broadcast_shapes(shape, (count,))
+        lo, hi = np.broadcast_to(lo, shape), np.broadcast_to(hi, shape)
+        if self._cumulative is None:
+            milliwatts = 10.0 ** (self.levels / 10.0)
+            self._cumulative = np.concatenate([np.zeros((count, 1)), np.cumsum(milliwatts, axis=1)], axis=1)
+        first, last = self._column(lo, True), self._column(hi, False)
+        squeeze = len(shape) == 1
+        if squeeze:
+            first, last = first[:, None], last[:, None]
+        power = np.take_along_axis(self._cumulative, last, 1) - np.take_along_axis(self._cumulative, first, 1)
+        power[last <= first] = np.nan  # band outside the span
+        if rbw is not None:
+            power = power * (self.step[:, None] / rbw)
+        return power[:, 0] if squeeze else power
+
+    def channel_power(self, center, bandwidth, rbw=None):
+        # dBm per trace in center ± bandwidth / 2
+        center = np.asarray(center, dtype=float)
+        return to_dbm(self.band_power(center - bandwidth / 2, center + bandwidth / 2, rbw))
+
+    def acpr(self, center, bandwidth, offsets, adjacent_bandwidth=None, rbw=None):
+        # Channel power (dBm, (N,)) and lower/upper adjacent channel powers relative to it
+        # (dBc, (N, len(offsets)))
+        center = np.broadcast_to(np.asarray(center, dtype=float), (len(self),))
+        offsets = np.asarray(offsets, dtype=float)
+        adjacent_bandwidth = bandwidth if adjacent_bandwidth is None else adjacent_bandwidth
+        main = self.band_power(center - bandwidth / 2, center + bandwidth / 2, rbw)
+        centers = np.concatenate([center[:, None] - offsets, center[:, None] + offsets], axis=1)
+        adjacent = self.band_power(centers - adjacent_bandwidth / 2, centers + adjacent_bandwidth / 2, rbw)
+        relative = to_dbm(adjacent / main[:, None])
+        return {"channel": to_dbm(main), "lower": relative[:, :len(offsets)], "upper": relative[:, len(offsets):]}
+
+    def peak(self, lo=None, hi=None):
+        # Highest bin per trace, optionally within [lo, hi]; (freq, level), NaN where the window is empty
+        levels = self.levels
+        if lo is not None or hi is not None:
+            columns = np.arange(self.points)
+            first = self._column(self.start if lo is None else np.broadcast_to(lo, (len(self),)), True)
+            last = self._column(self.stop if hi is None else np.broadcast_to(hi, (len(self),)), False)
+            inside = (columns >= first[:, None]) & (columns < last[:, None])
+            levels = np.where(inside, levels, -np.inf)
+        index = np.argmax(levels, axis=1)
+        level = np.take_along_axis(levels, index[:, None], 1)[:, 0]
+        freq = self.start + self.step * index
+        empty = ~np.isfinite(level)
+        return np.where(empty, np.nan, freq), np.where(empty, np.nan, level)
+
+    def harmonics(self, fundamental, count=5, span=None):
+        # Peak within span around each multiple of the fundamental (Hz, scalar or (N,)). Returns
+        # (N, count) freq/level arrays, order 1 first, and the levels relative to the fundamental
+        fundamental = np.broadcast_to(np.asarray(fundamental, dtype=float), (len(self),))
+        half = (5 * self.step) if span is None else np.full(len(self), span / 2)
+        freq = np.full((len(self), count), np.nan)
+        level = np.full((len(self), count), np.nan)
+        for order in range(1, count + 1):
+            target = fundamental * order
+            freq[:, order - 1], level[:, order - 1] = self.peak(target - half, target + half)
+        return {"freq": freq, "level": level, "dbc": level - level[:, :1]}
+
+    def limit_margin(self, limit, relative_to=None):
+        # Margin to a LimitLine or a flat level per bin (positive = passing); relative_to turns the
+        # limit into dBc of a per-trace reference level such as the carrier
+        if isinstance(limit, LimitLine):
+            values, upper = limit.at(self.freqs()), limit.upper
+        else:
+            values, upper = np.broadcast_to(np.asarray(limit, dtype=float), (len(self),))[:, None], True
+        if relative_to is not None:
+            values = values + np.asarray(relative_to, dtype=float).reshape(-1, 1)
+        return values - self.levels if upper else self.levels - values
+
+    def check_limit(self, limit, relative_to=None):
+        margin = self.limit_margin(limit, relative_to)
+        margin = np.where(np.isnan(margin), np.inf, margin)
+        index = np.argmin(margin, axis=1)
+        worst = np.take_along_axis(margin, index[:, None], 1)[:, 0]
+        return {"passed": worst >= 0, "margin": worst, "worst_freq": np.where(np.isfinite(worst),
+                                                                               self.start + self.step * index, np.nan)}
+
+    def spurs(self, limit, exclude=(), relative_to=None):
+        # Local maxima over a limit (dBm, LimitLine, or dBc with relative_to), outside the
+        # exclude windows: [(center Hz scalar or (N,), width Hz), ...] such as the carrier and
+        # its harmonics. Returns the spur bin mask, count and worst margin per trace.
+        levels = self.levels
+        local = np.zeros(levels.shape, dtype=bool)
+        local[:, 1:-1] = (levels[:, 1:-1] > levels[:, :-2]) & (levels[:, 1:-1] >= levels[:, 2:])
+        columns = np.arange(self.points)
+        for center, width in exclude:
+            center = np.broadcast_to(np.asarray(center, dtype=float), (len(self),))
+            first = self._column(center - width / 2, True)
+            last = self._column(center + width / 2, False)
+            local &= ~((columns >= first[:, None]) & (columns < last[:, None]))
+        margin = np.where(local, self.limit_margin(limit, relative_to), np.inf)
+        mask = margin < 0
+        index = np.argmin(margin, axis=1)
+        worst = np.take_along_axis(margin, index[:, None], 1)[:, 0]
+        return {"mask": mask, "count": mask.sum(axis=1), "margin": worst,
+                "worst_freq": np.where(np.isfinite(worst), self.start + self.step * index, np.nan)}
+
+
+def analyze_run(data, channel_bw=1e6, acpr_offsets=(), adjacent_bw=None, rbw=None, harmonics=3,
+                spur_limit=None, limit=None):
+    # Measurements for every captured point of a run (result_store.read_run() output), with the
+    # generator frequency of each row as the carrier. Returns (per-point arrays, run summary).
+    batch = TraceBatch.from_run(data)
+    carrier = np.asarray(data["freq"], dtype=float)
+    points = {"channel_power": batch.channel_power(carrier, channel_bw, rbw)}
+    summary = {"traces": len(batch), "channel_power_min": np.nanmin(points["channel_power"], initial=np.inf),
+               "channel_power_max": np.nanmax(points["channel_power"], initial=-np.inf)}
+    if len(acpr_offsets):
+        acpr = batch.acpr(carrier, channel_bw, acpr_offsets, adjacent_bw, rbw)
+        points["acpr_lower"], points["acpr_upper"] = acpr["lower"], acpr["upper"]
+        summary["acpr_worst"] = np.nanmax(np.concatenate([acpr["lower"], acpr["upper"]], axis=1), initial=-np.inf)
+    if harmonics > 1:
+        found = batch.harmonics(carrier, harmonics)
+        points["harmonic_freq"], points["harmonic_dbc"] = found["freq"], found["dbc"]
+        summary["harmonic_worst_dbc"] = np.nanmax(found["dbc"][:, 1:], initial=-np.inf)
+    if spur_limit is not None:
+        exclude = [(carrier * order, 2 * channel_bw) for order in range(1, max(harmonics, 1) + 1)]
+        spurs = batch.spurs(spur_limit, exclude, relative_to=points["channel_power"])
+        points["spur_count"], points["spur_margin"] = spurs["count"], spurs["margin"]
+        summary["spurs"] = int(spurs["count"].sum())
+    if limit is not None:
+        checked = batch.check_limit(limit if isinstance(limit, LimitLine) else LimitLine(limit))
+        points["limit_passed"], points["limit_margin"] = checked["passed"], checked["margin"]
+        summary["limit_failures"] = int((~checked["passed"]).sum())
+    summary = {key: float(value) if isinstance(value, np.floating) else value for key, value in summary.items()}
+    return points, summary
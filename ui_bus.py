@@ -0,0 +1,82 @@
+import queue
+import tkinter as tk
+
+
+class UiEventBus:
+    # Worker threads post() events; only the Tk thread touches widgets. The queue is drained from
+    # after() in batches, at most `fps` times a second, so a fast worker costs one redraw per frame
+    # rather than one per event.
+    def __init__(self, widget, fps=30, idle_ms=100, max_batch=1000):
+        self.widget = widget
+        self.frame_ms = max(int(1000 / fps), 1)
+        self.idle_ms = idle_ms
+        self.max_batch = max_batch
+        self.queue = queue.SimpleQueue()
+        self.handlers = {}  # kind -> (handler, latest_only)
+        self.logs = {}  # kind -> (Text widget, max_lines)
+        self.running = False
+
+    def subscribe(self, kind, handler, latest_only=False):
+        # latest_only: within one batch only the newest payload is delivered (status text, readings)
+        self.handlers[kind] = (handler, latest_only)
+
+    def log_to(self, kind, text, max_lines=5000):
+        # Every line posted under `kind` in a batch goes into `text` with a single insert
+        self.logs[kind] = (text, max_lines)
+
+    def post(self, kind, payload=None):
+        # Safe from any thread
+        self.queue.put((kind, payload))
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.widget.after(self.frame_ms, self._tick)
+
+    def stop(self):
+        self.running = False
+
+    def _tick(self):
+        if not self.running:
+            return
+        handled = self.drain()
+        self.widget.after(self.frame_ms if handled else self.idle_ms, self._tick)
+
+    def drain(self):
+        batch = []
+        try:
+            while len(batch) < self.max_batch:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not batch:
+            return 0
+
+        lines = {}
+        latest = {}
+        ordered = []
+        for kind, payload in batch:
+            if kind in self.logs:
+                lines.setdefault(kind, []).append(f"{payload}\n")
+            elif kind in self.handlers:
+                if self.handlers[kind][1]:
+                    latest[kind] = payload
+                else:
+                    ordered.append((kind, payload))
+
+        for kind, text_lines in lines.items():
+            self._insert(*self.logs[kind], "".join(text_lines))
+        for kind, payload in ordered + list(latest.items()):
+            try:
+                self.handlers[kind][0](payload)
+            except Exception as e:
+                print(f"⚠️ UI handler for {kind} failed: {e}")
+        return len(batch)
+
+    def _insert(self, text, max_lines, chunk):
+        text.config(state='normal')
+        text.insert(tk.END, chunk)
+        if max_lines and int(text.index('end-1c').split('.')[0]) > max_lines:
+            text.delete("1.0", f"end-{max_lines}l")
+        text.see(tk.END)
+        text.config(state='disabled')
@@ -0,0 +1,132 @@
+import os
+import threading
+from scpi_trace import TraceRecorder, TracedInstrument, trace_enabled
+
+
+class VisaSessionPool:
+    # One ResourceManager and one session per VISA address, shared by every tab
+    def __init__(self, backend=None, resource_manager=None, recorder=None):
+        self.backend = backend
+        self._rm = resource_manager
+        self.recorder = recorder  # TraceRecorder: sessions are opened wrapped in TracedInstrument
+        self._sessions = {}  # address -> {'instrument': resource, 'refs': int, 'idn': str or None}
+        self._lock = threading.Lock()
+        self._address_locks = {}  # address -> threading.Lock, serializes opens of the same address
+
+    @property
+    def resource_manager(self):
+        with self._lock:
+            if self._rm is None:
+                if self.backend == "sim":
+                    from sim_backend import SimulatedResourceManager
+                    self._rm = SimulatedResourceManager()
+                else:
+                    import pyvisa
+                    self._rm = pyvisa.ResourceManager(self.backend) if self.backend else pyvisa.ResourceManager()
+            return self._rm
+
+    def _address_lock(self, address):
+        with self._lock:
+            if address not in self._address_locks:
+                self._address_locks[address] = threading.Lock()
+            return self._address_locks[address]
+
+    def acquire(self, address, open_timeout=None):
+        # Returns the shared session for address, opening it only if it is not already open and alive
+        with self._address_lock(address):
+            entry = self._sessions.get(address)
+            if entry is not None:
+                if self._session_alive(entry['instrument']):
+                    entry['refs'] += 1
+                    return entry['instrument']
+                self._discard(address)
+
+            kwargs = {}
+            if open_timeout is not None:
+                kwargs['open_timeout'] = open_timeout
+            instrument = self.resource_manager.open_resource(address, **kwargs)
+            if self.recorder is not None:
+                instrument = TracedInstrument(instrument, self.recorder)
+            self._sessions[address] = {'instrument': instrument, 'refs': 1, 'idn': None}
+            return instrument
+
+    def release(self, address):
+        # Drops one reference; the session is closed once nobody holds it
+        with self._address_lock(address):
+            entry = self._sessions.get(address)
+            if entry is None:
+                return
+            entry['refs'] -= 1
+            if entry['refs'] <= 0:
+                self._discard(address)
+
+    def get(self, address):
+        entry = self._sessions.get(address)
+        return entry['instrument'] if entry else None
+
+    def refcount(self, address):
+        entry = self._sessions.get(address)
+        return entry['refs'] if entry else 0
+
+    def idn(self, address, refresh=False):
+        # *IDN? is cached per session so repeated connects do not touch the bus
+        entry = self._sessions.get(address)
+        if entry is None:
+            raise KeyError(f"No open session for {address}")
+        if refresh or entry['idn'] is None:
+            entry['idn'] = entry['instrument'].query("*IDN?").strip()
+        return entry['idn']
+
+    def check_health(self, address):
+        # Full round trip to the instrument; refreshes the cached IDN on success
+        entry = self._sessions.get(address)
+        if entry is None or not self._session_alive(entry['instrument']):
+            return False
+        try:
+            self.idn(address, refresh=True)
+            return True
+        except Exception:
+            return False
+
+    def close_all(self):
+        for address in list(self._sessions):
+            with self._address_lock(address):
+                self._discard(address)
+
+    def _session_alive(self, instrument):
+        # Local check only: a closed pyvisa resource raises when its session handle is read
+        try:
+            return instrument.session is not None
+        except Exception:
+            return False
+
+    def _discard(self, address):
+        entry = self._sessions.pop(address, None)
+        if entry is None:
+            return
+        try:
+            entry['instrument'].close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # VISA_BACKEND=sim swaps in the in-process simulated bench (sim_backend.py)
+            _pool = VisaSessionPool(
+                "sim" if os.environ.get("VISA_BACKEND", "").lower() == "sim" else None,
+                recorder=TraceRecorder() if trace_enabled() else None,
+            )
+        return _pool
+
+
+def set_pool(pool):
+    global _pool
+    with _pool_lock:
+        _pool = pool